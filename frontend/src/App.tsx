@@ -92,6 +92,8 @@ function App() {
       new_path: string[],
       total_distance_nm: number,
       waypoints_count: number,
+      flight_level: number,
+      level_change: number,
       original_start: string,
       original_goal: string
     }
@@ -483,6 +485,7 @@ function App() {
               <Typography>Route: {suggestDialog.result.new_path.join(" → ")}</Typography>
               <Typography>Total Distance: {suggestDialog.result.total_distance_nm.toFixed(2)} NM</Typography>
               <Typography>Waypoints: {suggestDialog.result.waypoints_count}</Typography>
+              <Typography>Flight Level: FL{suggestDialog.result.flight_level}{suggestDialog.result.level_change ? ` (${suggestDialog.result.level_change > 0 ? "+" : ""}${suggestDialog.result.level_change})` : ""}</Typography>
               <Typography>Original Start: {suggestDialog.result.original_start}</Typography>
               <Typography>Original Goal: {suggestDialog.result.original_goal}</Typography>
             </Alert>
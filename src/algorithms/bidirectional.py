@@ -0,0 +1,242 @@
+import heapq
+from typing import Dict, List, Optional
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.pathfinding import (
+    MAX_TURN_ANGLE, SearchStats, corridor_filter, departure_time, level_search
+)
+from algorithms.reservation_table import ReservationTable
+from algorithms.segment_index import SegmentIndex
+from models.geo import haversine
+from models.landmarks import INF
+
+def bidirectional_search(airspace, start, goal, flight, other_flights=None, segment_index=None,
+                         stats: Optional[SearchStats] = None, use_landmarks: bool = True,
+                         corridor_nm: Optional[float] = None,
+                         reservations: Optional[ReservationTable] = None,
+                         max_turn: float = MAX_TURN_ANGLE) -> Optional[List[str]]:
+    """
+    a_star_search from both ends at once, meeting in the middle: on long
+    routes the two frontiers together stay far smaller than one fanning
+    out from start.
+
+    Both searches run over edges (the edge a waypoint is reached or left
+    by) so the max_turn limit holds where they meet, and each is ordered by
+    the average of the bounds to goal and from start, which makes the
+    first meeting whose length the open sets cannot beat the shortest.
+    Forward, segments are checked for traffic at the time the flight
+    would fly them. Backward that time is not known, so only traffic
+    blocking a segment whenever it is flown (untimed reservations, or any
+    when the flight has no times) is checked, which can make the meeting
+    found shorter than the best route but never longer. The route found
+    is checked again forwards, and should it meet traffic (or come back
+    over a waypoint), the unidirectional search is run instead, counted
+    in stats.fallbacks. In busy timed traffic that is frequent enough for
+    a_star_search to be the faster choice.
+    corridor_nm skips waypoints farther than that off the great circle.
+    """
+    if start not in airspace.waypoints or goal not in airspace.waypoints:
+        return None
+    if start == goal:
+        return [start]
+    if reservations is None:
+        if segment_index is None:
+            segment_index = SegmentIndex(other_flights or [])
+        reservations = ReservationTable(segment_index, flight)
+    is_free = reservations.is_free
+    level = flight.flight_level
+    depart = departure_time(flight, start)
+    seconds_per_nm = 3600 / flight.speed if depart is not None else None
+
+    def backward_free(from_wp, to_wp):
+        """Whether the segment may be free whenever the flight reaches it"""
+        if depart is None:
+            return is_free(from_wp, to_wp, level)
+        return not reservations.blocked_at_any_time(from_wp, to_wp, level)
+
+    graph = airspace.compiled()
+    names, lat, lon = graph.names, graph.lat, graph.lon
+    offsets, sources, targets, distances = graph.offsets, graph.sources, graph.targets, graph.distances
+    rev_offsets, rev_edges = graph.rev_offsets, graph.rev_edges
+    turns = airspace.turns(max_turn)
+    turn_base, turn_ok = turns.base, turns.allowed
+    start_id, goal_id = graph.ids[start], graph.ids[goal]
+
+    landmarks = airspace.landmarks() if use_landmarks else None
+    to_goal = landmarks.heuristic(goal_id) if landmarks else None
+    from_start = landmarks.heuristic_from(start_id) if landmarks else None
+    inside = corridor_filter(graph, start_id, goal_id, corridor_nm) if corridor_nm is not None else None
+    bound_cache: Dict[int, tuple] = {}
+
+    def bounds(node):
+        """(lower bound to goal, lower bound from start) of node"""
+        b = bound_cache.get(node)
+        if b is None:
+            to = haversine(lat[node], lon[node], lat[goal_id], lon[goal_id])
+            since = haversine(lat[start_id], lon[start_id], lat[node], lon[node])
+            if landmarks:
+                to = max(to, to_goal(node))
+                since = max(since, from_start(node))
+            b = bound_cache[node] = (to, since)
+        return b
+
+    def timing(flown, distance):
+        if depart is None:
+            return None, None
+        enter = depart + flown * seconds_per_nm
+        return enter, enter + distance * seconds_per_nm
+
+    # Forward states are edges flown so far, backward states edges still to fly
+    forward_open, backward_open = [], []  # (g + potential, g, edge)
+    forward_g: Dict[int, float] = {}
+    backward_g: Dict[int, float] = {}
+    previous: Dict[int, Optional[int]] = {}  # forward edge -> edge flown before it
+    following: Dict[int, Optional[int]] = {}  # backward edge -> edge flown after it
+    forward_closed, backward_closed = set(), set()
+    best, meeting = INF, None  # Shortest route seen, as (forward edge, backward edge)
+
+    def reach_forward(edge, g, before):
+        nonlocal best, meeting
+        node = targets[edge]
+        to, since = bounds(node)
+        if to == INF:
+            return
+        forward_g[edge] = g
+        previous[edge] = before
+        heapq.heappush(forward_open, (g + (to - since) / 2, g, edge))
+        if node == goal_id:
+            if g < best:
+                best, meeting = g, (edge, None)
+            return
+        base = turn_base[edge]
+        for after in range(offsets[node], offsets[node + 1]):
+            rest = backward_g.get(after)
+            if rest is not None and g + rest < best and turn_ok[base + after]:
+                best, meeting = g + rest, (edge, after)
+
+    def reach_backward(edge, g, after):
+        nonlocal best, meeting
+        node = sources[edge]
+        to, since = bounds(node)
+        if since == INF:
+            return
+        backward_g[edge] = g
+        following[edge] = after
+        heapq.heappush(backward_open, (g + (since - to) / 2, g, edge))
+        if node == start_id:
+            if g < best:
+                best, meeting = g, (None, edge)
+            return
+        for k in range(rev_offsets[node], rev_offsets[node + 1]):
+            before = rev_edges[k]
+            flown = forward_g.get(before)
+            if flown is not None and flown + g < best and turn_ok[turn_base[before] + edge]:
+                best, meeting = flown + g, (before, edge)
+
+    for edge in range(offsets[start_id], offsets[start_id + 1]):
+        neighbor = targets[edge]
+        if inside is not None and not inside(neighbor):
+            continue
+        if is_free(start, names[neighbor], level, *timing(0.0, distances[edge])):
+            reach_forward(edge, distances[edge], None)
+    for k in range(rev_offsets[goal_id], rev_offsets[goal_id + 1]):
+        edge = rev_edges[k]
+        neighbor = sources[edge]
+        if inside is not None and not inside(neighbor):
+            continue
+        if backward_free(names[neighbor], goal):
+            reach_backward(edge, distances[edge], None)
+    if stats is not None:
+        stats.searches += 1
+        stats.pushes += len(forward_open) + len(backward_open)
+
+    while forward_open and backward_open and forward_open[0][0] + backward_open[0][0] < best:
+        if len(forward_open) <= len(backward_open):
+            _, g, edge = heapq.heappop(forward_open)
+            if edge in forward_closed or g > forward_g[edge]:
+                continue
+            forward_closed.add(edge)
+            current = targets[edge]
+            if current == goal_id:
+                continue
+            if stats is not None:
+                stats.record(len(forward_open) + len(backward_open) + 1,
+                             len(previous) + len(following))
+            base = turn_base[edge]
+            for after in range(offsets[current], offsets[current + 1]):
+                if after in forward_closed or not turn_ok[base + after]:
+                    continue
+                neighbor = targets[after]
+                if inside is not None and not inside(neighbor):
+                    continue
+                tentative_g = g + distances[after]
+                if tentative_g >= forward_g.get(after, INF):
+                    continue
+                if not is_free(names[current], names[neighbor], level, *timing(g, distances[after])):
+                    continue
+                reach_forward(after, tentative_g, edge)
+                if stats is not None:
+                    stats.pushes += 1
+        else:
+            _, g, edge = heapq.heappop(backward_open)
+            if edge in backward_closed or g > backward_g[edge]:
+                continue
+            backward_closed.add(edge)
+            current = sources[edge]
+            if current == start_id:
+                continue
+            if stats is not None:
+                stats.record(len(forward_open) + len(backward_open) + 1,
+                             len(previous) + len(following))
+            for k in range(rev_offsets[current], rev_offsets[current + 1]):
+                before = rev_edges[k]
+                if before in backward_closed or not turn_ok[turn_base[before] + edge]:
+                    continue
+                neighbor = sources[before]
+                if inside is not None and not inside(neighbor):
+                    continue
+                tentative_g = g + distances[before]
+                if tentative_g >= backward_g.get(before, INF):
+                    continue
+                if not backward_free(names[neighbor], names[current]):
+                    continue
+                reach_backward(before, tentative_g, edge)
+                if stats is not None:
+                    stats.pushes += 1
+
+    if meeting is not None:
+        edges = []
+        edge = meeting[0]
+        while edge is not None:
+            edges.append(edge)
+            edge = previous[edge]
+        edges.reverse()
+        edge = meeting[1]
+        while edge is not None:
+            edges.append(edge)
+            edge = following[edge]
+        path = [start_id] + [targets[edge] for edge in edges]
+        if len(set(path)) == len(path) and _flyable(edges, graph, is_free, level, timing):
+            return [names[node] for node in path]
+    elif not forward_open or not backward_open:
+        return None  # A search ran out, and neither skips a segment a route could fly
+
+    if stats is not None:
+        stats.fallbacks += 1
+    found = level_search(airspace, start, goal, flight, {level: 0}, None, stats,
+                         use_landmarks, reservations, corridor_nm, max_turn)
+    return found[0] if found else None
+
+def _flyable(edges, graph, is_free, level, timing) -> bool:
+    """Whether every edge is free of traffic at the time the flight reaches it"""
+    names, sources, targets, distances = graph.names, graph.sources, graph.targets, graph.distances
+    flown = 0.0
+    for edge in edges:
+        if not is_free(names[sources[edge]], names[targets[edge]], level,
+                       *timing(flown, distances[edge])):
+            return False
+        flown += distances[edge]
+    return True
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+class ConflictCache:
+    """
+    Conflict results keyed by (traffic/airspace version, request key).
+
+    Every change to flights or airspace must call bump(), which makes all
+    cached results stale. Concurrent requests for the same version and key
+    share a single computation, run off the event loop.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._entries: Dict[Tuple[int, Hashable], Any] = {}
+        self._pending: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+    def bump(self) -> int:
+        self.version += 1
+        self._entries.clear()
+        return self.version
+
+    async def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Cached result for key at the current version, computing it at most once"""
+        full_key = (self.version, key)
+        if full_key in self._entries:
+            return self._entries[full_key]
+        pending = self._pending.get(full_key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # This request was cancelled
+                # The request computing it was: take the computation over
+                return await self.get(key, compute)
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending[full_key] = future
+        try:
+            result = await loop.run_in_executor(None, compute)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; don't log it as unretrieved
+            raise
+        except BaseException:
+            future.cancel()  # Cancelled, e.g. the client went away: release the waiters
+            raise
+        finally:
+            del self._pending[full_key]
+
+        # Traffic may have changed meanwhile: serve the result, cache only if current
+        if full_key[0] == self.version:
+            self._entries[full_key] = result
+        future.set_result(result)
+        return result
@@ -1,139 +1,407 @@
-from typing import List
-from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+import heapq
 import sys
 import os
 
 # Add src directory to path to import airspace
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def detect_conflicts(flights: List):
+from algorithms.segment_index import SegmentIndex, SegmentOccupancy
+
+# Separation minima shared by every rule below
+SEPARATION_BUFFER = timedelta(minutes=10)  # Largest time buffer used by any rule
+VERTICAL_SEPARATION_FT = 1000
+FL_BAND = VERTICAL_SEPARATION_FT // 100    # Flight-level band width (FL units)
+
+# Order of the segment rules inside one pair's conflicts
+HEAD_ON, OVERTAKE = 1, 2
+
+def detect_conflicts(flights: List, mode: str = "sweep", airspace=None, segment_index=None):
+    """
+    Detect conflicts between flights.
+
+    mode="sweep" only checks pairs whose active windows overlap within
+    SEPARATION_BUFFER and whose levels are within VERTICAL_SEPARATION_FT,
+    runs head-on/overtake inside each segment of a SegmentIndex, and takes
+    lateral candidates from the airspace near-waypoint table.
+    mode="all_pairs" is the original O(n²) loop, kept as a reference.
+    Both modes return the same conflicts in the same order.
+    The lateral rule needs airspace and is skipped without it;
+    segment_index, if given, must index exactly these flights.
+    """
+    if mode not in ("sweep", "all_pairs"):
+        raise ValueError(f"Unknown conflict detection mode: {mode}")
+    near_pairs = airspace.near_waypoint_pairs() if airspace is not None else {}
+
+    if mode == "all_pairs":
+        conflicts = []
+        for i in range(len(flights)):
+            for j in range(i+1, len(flights)):
+                conflicts.extend(check_pair(flights[i], flights[j], near_pairs))
+        return conflicts
+
+    conflicts = []
+    for _, _, pair in sweep_conflicts(flights, near_pairs, segment_index):
+        conflicts.extend(pair)
+    return conflicts
+
+def sweep_conflicts(flights: List, near_pairs, segment_index=None):
+    """Yield (i, j, conflicts) for every conflicting pair, in (i, j) order"""
+    if segment_index is None:
+        segment_index = SegmentIndex(flights)
+    hits = segment_hits(segment_index, {id(f): i for i, f in enumerate(flights)})
+
+    for i, j in candidate_pairs(flights):
+        conflicts = pair_conflicts(flights[i], flights[j], hits.get((i, j)), near_pairs)
+        if conflicts:
+            yield i, j, conflicts
+
+def iter_conflicts(flights: List, airspace=None) -> Iterator[dict]:
+    """
+    Generator version of the sweep engine: yields each conflict as soon as
+    its pair is checked, in order of the later flight's start time.
+
+    Flights are swept by window start; only flights still active (within
+    SEPARATION_BUFFER) are kept, in per-band sets and in a SegmentIndex, so
+    memory is bounded by traffic density rather than the number of conflicts.
+    Within a pair, flight1 is the one that comes first in flights.
+    """
+    near_pairs = airspace.near_waypoint_pairs() if airspace is not None else {}
+
+    windows = []
+    for idx, flight in enumerate(flights):
+        window = active_window(flight)
+        if window:
+            windows.append((window[0], window[1], idx))
+    windows.sort()
+
+    order = {}
+    bands = {}         # band -> set of idx
+    ending = []        # heap of (end_time, idx) of active flights
+    segment_index = SegmentIndex()
+    for start, end, idx in windows:
+        # Retire flights that left the sector more than one buffer ago
+        while ending and ending[0][0] + SEPARATION_BUFFER <= start:
+            _, old = heapq.heappop(ending)
+            bands[flights[old].flight_level // FL_BAND].discard(old)
+            segment_index.remove_flight(flights[old])
+            del order[id(flights[old])]
+
+        flight = flights[idx]
+        order[id(flight)] = idx
+        hits = flight_segment_hits(flight, segment_index, order)
+        band = flight.flight_level // FL_BAND
+        for other in sorted(i for b in (band - 1, band, band + 1) for i in bands.get(b, ())):
+            other_flight = flights[other]
+            if abs(other_flight.flight_level - flight.flight_level) * 100 >= VERTICAL_SEPARATION_FT:
+                continue
+            first, second = (other_flight, flight) if other < idx else (flight, other_flight)
+            yield from pair_conflicts(first, second, hits.get(id(other_flight)), near_pairs)
+
+        bands.setdefault(band, set()).add(idx)
+        heapq.heappush(ending, (end, idx))
+        segment_index.add_flight(flight)
+
+def timeline(flight) -> List[Tuple[str, datetime]]:
+    """(waypoint, ETA) at every timed route position, in route order"""
+    return [(wp, t) for wp, t in zip(flight.route, flight.position_times) if t is not None]
+
+def active_window(flight) -> Optional[Tuple[datetime, datetime]]:
+    """Return (first ETA, last ETA) of a flight, or None if it has no timeline"""
+    times = [t for _, t in timeline(flight)]
+    if not times:
+        return None
+    return min(times), max(times)
+
+def candidate_pairs(flights: List) -> List[Tuple[int, int]]:
+    """
+    Sweep flights in order of their active window start, keeping one heap of
+    still-active flights per flight-level band. Returns sorted (i, j) index
+    pairs, i < j, that can possibly be in conflict.
+    """
+    windows = []
+    for idx, flight in enumerate(flights):
+        window = active_window(flight)
+        if window:
+            windows.append((window[0], window[1], idx))
+    windows.sort()
+
+    active = {}  # band -> heap of (end_time, idx)
+    pairs = []
+    for start, end, idx in windows:
+        fl = flights[idx].flight_level
+        band = fl // FL_BAND
+        for b in (band - 1, band, band + 1):
+            bucket = active.get(b)
+            if not bucket:
+                continue
+            # Drop flights that left the sector more than one buffer ago
+            while bucket and bucket[0][0] + SEPARATION_BUFFER <= start:
+                heapq.heappop(bucket)
+            for _, other in bucket:
+                if abs(flights[other].flight_level - fl) * 100 < VERTICAL_SEPARATION_FT:
+                    pairs.append((other, idx) if other < idx else (idx, other))
+        heapq.heappush(active.setdefault(band, []), (end, idx))
+
+    pairs.sort()
+    return pairs
+
+def may_conflict(window1, fl1, window2, fl2) -> bool:
+    """Cheap pre-check: can two flights with these windows and levels conflict?"""
+    if abs(fl1 - fl2) * 100 >= VERTICAL_SEPARATION_FT:
+        return False
+    return (window1[0] < window2[1] + SEPARATION_BUFFER and
+            window2[0] < window1[1] + SEPARATION_BUFFER)
+
+def segment_hits(segment_index: SegmentIndex, order: Dict[int, int]) -> Dict[Tuple[int, int], list]:
+    """
+    Head-on and overtake conflicts found by sweeping each segment's
+    occupancies in time order. order maps id(flight) -> position; returns
+    {(i, j): [(rule, idx1, idx2, conflict), ...]} with i < j.
+    """
+    hits = {}
+    for _, occupancies in segment_index.segments():
+        active = []  # heap of (hi, seq, occupancy)
+        for seq, occ in enumerate(occupancies):
+            if not occ.timed:
+                break  # untimed legs sort last
+            i = order.get(id(occ.flight))
+            if i is None:
+                continue
+            while active and active[0][0] + SEPARATION_BUFFER <= occ.lo:
+                heapq.heappop(active)
+            for _, _, other in active:
+                j = order[id(other.flight)]
+                if i == j:
+                    continue
+                first, second = (other, occ) if j < i else (occ, other)
+                found = segment_pair_conflicts(first, second)
+                if found:
+                    hits.setdefault((min(i, j), max(i, j)), []).extend(found)
+            heapq.heappush(active, (occ.hi, seq, occ))
+    return hits
+
+def flight_segment_hits(flight, segment_index: SegmentIndex, order: Dict[int, int]) -> Dict[int, list]:
+    """
+    Head-on and overtake conflicts between one flight and the other flights in
+    segment_index. Returns {id(other): [(rule, idx1, idx2, conflict), ...]},
+    oriented so that the flight with the lower order is flight1.
+    """
+    hits = {}
+    times = flight.position_times
+    for idx in range(len(flight.route) - 1):
+        from_wp, to_wp = flight.route[idx], flight.route[idx + 1]
+        own = SegmentOccupancy(flight, idx, from_wp, to_wp, times[idx],
+                               times[idx + 1], flight.flight_level, flight.callsign)
+        if not own.timed:
+            continue
+        for other in segment_index.occupancies(from_wp, to_wp):
+            if not other.timed or other.lo >= own.hi + SEPARATION_BUFFER:
+                break
+            if other.flight is flight or id(other.flight) not in order:
+                continue
+            if order[id(other.flight)] < order[id(flight)]:
+                found = segment_pair_conflicts(other, own)
+            else:
+                found = segment_pair_conflicts(own, other)
+            if found:
+                hits.setdefault(id(other.flight), []).extend(found)
+    return hits
+
+def segment_pair_conflicts(occ1: SegmentOccupancy, occ2: SegmentOccupancy) -> list:
+    """
+    Head-on / overtake rules for two occupancies of the same segment, occ1
+    belonging to flight1. Same conditions as the reference loops below.
+    """
+    found = []
+    if abs(occ1.flight_level - occ2.flight_level) * 100 >= 1000:
+        return found
+    f1, f2 = occ1.flight, occ2.flight
+    seg1 = (occ1.from_wp, occ1.to_wp)
+
+    # 2. Ngược chiều: seg2 đảo ngược, nên t2_start là ETA tại điểm ra của f2
+    if seg1 == (occ2.to_wp, occ2.from_wp):
+        t1_start, t1_end = occ1.enter, occ1.exit
+        t2_start, t2_end = occ2.exit, occ2.enter
+        if t1_start < t2_end and t2_start < t1_end:
+            found.append((HEAD_ON, occ1.position, occ2.position, {
+                'type': 'head-on',
+                'flight1': f1.callsign,
+                'flight2': f2.callsign,
+                'segment': seg1,
+                'start_time': max(t1_start, t2_start),
+                'end_time': min(t1_end, t2_end),
+                'flight_level1': f1.flight_level,
+                'flight_level2': f2.flight_level
+            }))
+
+    # 3. Cùng chiều
+    if seg1 == (occ2.from_wp, occ2.to_wp):
+        time_diff = abs((occ1.enter - occ2.enter).total_seconds()) / 60
+        if time_diff < 10:  # 10 phút
+            found.append((OVERTAKE, occ1.position, occ2.position, {
+                'type': 'overtake',
+                'flight1': f1.callsign,
+                'flight2': f2.callsign,
+                'segment': seg1,
+                'start_time': min(occ1.enter, occ2.enter),
+                'end_time': max(occ1.exit, occ2.exit),
+                'flight_level1': f1.flight_level,
+                'flight_level2': f2.flight_level,
+                'time_diff_minutes': time_diff
+            }))
+    return found
+
+def pair_conflicts(f1, f2, hits, near_pairs) -> List[dict]:
+    """
+    Conflicts of one pair in reference order: crossing, then the head-on and
+    overtake hits from the segment index, then lateral.
+    """
+    conflicts = _crossing_conflicts(f1, f2)
+    if hits:
+        conflicts.extend(hit[3] for hit in sorted(hits, key=lambda hit: hit[:3]))
+    conflicts.extend(_lateral_conflicts(f1, f2, near_pairs))
+    return conflicts
+
+def check_pair(f1, f2, near_pairs):
+    """
+    Run every conflict rule on one pair of flights, comparing every pair of
+    legs. near_pairs comes from Airspace.near_waypoint_pairs().
+    """
+    conflicts = _crossing_conflicts(f1, f2)
+    conflicts.extend(_head_on_conflicts(f1, f2))
+    conflicts.extend(_overtake_conflicts(f1, f2))
+
+    # 4. Đường song song, không giao cắt (lateral)
+    conflicts.extend(_lateral_conflicts(f1, f2, near_pairs))
+
+    return conflicts
+
+def _crossing_conflicts(f1, f2):
     conflicts = []
-    for i in range(len(flights)):
-        for j in range(i+1, len(flights)):
-            f1, f2 = flights[i], flights[j]
-            
-            # 1. Trường hợp giao nhau (crossing)
-            common_waypoints = set(f1.route) & set(f2.route)
-            for wp in common_waypoints:
-                t1 = f1.estimated_times.get(wp)
-                t2 = f2.estimated_times.get(wp)
-                if t1 and t2:
+    # 1. Trường hợp giao nhau (crossing)
+    # Duyệt theo thứ tự route để kết quả ổn định giữa các tiến trình;
+    # mỗi lần bay qua một waypoint được so sánh riêng
+    passes2 = {}
+    for wp, t2 in timeline(f2):
+        passes2.setdefault(wp, []).append(t2)
+    for wp, t1 in timeline(f1):
+        for t2 in passes2.get(wp, ()):
+            fl_diff = abs(f1.flight_level - f2.flight_level) * 100
+            if fl_diff < 1000:  # 1000ft
+                time_diff = abs((t1 - t2).total_seconds()) / 60
+                if time_diff < 10:  # 10 phút
+                    conflicts.append({
+                        'type': 'crossing',
+                        'flight1': f1.callsign,
+                        'flight2': f2.callsign,
+                        'waypoint': wp,
+                        'start_time': min(t1, t2),
+                        'end_time': max(t1, t2),
+                        'flight_level1': f1.flight_level,
+                        'flight_level2': f2.flight_level,
+                        'time_diff_minutes': time_diff
+                    })
+
+    return conflicts
+
+def _head_on_conflicts(f1, f2):
+    """Reference head-on rule: compare every pair of legs"""
+    conflicts = []
+    times1, times2 = f1.position_times, f2.position_times
+    # 2. Cùng đường bay, ngược chiều (head-on)
+    for idx1 in range(len(f1.route)-1):
+        seg1 = (f1.route[idx1], f1.route[idx1+1])
+        for idx2 in range(len(f2.route)-1):
+            seg2 = (f2.route[idx2+1], f2.route[idx2])  # đảo ngược để kiểm tra ngược chiều
+            if seg1 == seg2:
+                t1_start, t1_end = times1[idx1], times1[idx1+1]
+                t2_start, t2_end = times2[idx2+1], times2[idx2]
+
+                if t1_start and t1_end and t2_start and t2_end:
                     fl_diff = abs(f1.flight_level - f2.flight_level) * 100
-                    if fl_diff < 1000:  # 1000ft
-                        time_diff = abs((t1 - t2).total_seconds()) / 60
+                    if fl_diff < 1000:
+                        # Kiểm tra overlap thời gian
+                        if t1_start < t2_end and t2_start < t1_end:
+                            conflicts.append({
+                                'type': 'head-on',
+                                'flight1': f1.callsign,
+                                'flight2': f2.callsign,
+                                'segment': seg1,
+                                'start_time': max(t1_start, t2_start),
+                                'end_time': min(t1_end, t2_end),
+                                'flight_level1': f1.flight_level,
+                                'flight_level2': f2.flight_level
+                            })
+
+    return conflicts
+
+def _overtake_conflicts(f1, f2):
+    """Reference overtake rule: compare every pair of legs"""
+    conflicts = []
+    times1, times2 = f1.position_times, f2.position_times
+    # 3. Cùng đường bay, cùng chiều (overtake)
+    for idx1 in range(len(f1.route)-1):
+        seg1 = (f1.route[idx1], f1.route[idx1+1])
+        for idx2 in range(len(f2.route)-1):
+            seg2 = (f2.route[idx2], f2.route[idx2+1])
+            if seg1 == seg2:
+                t1_start, t1_end = times1[idx1], times1[idx1+1]
+                t2_start, t2_end = times2[idx2], times2[idx2+1]
+
+                if t1_start and t1_end and t2_start and t2_end:
+                    fl_diff = abs(f1.flight_level - f2.flight_level) * 100
+                    if fl_diff < 1000:
+                        # Kiểm tra thời gian cách nhau
+                        time_diff = abs((t1_start - t2_start).total_seconds()) / 60
                         if time_diff < 10:  # 10 phút
                             conflicts.append({
-                                'type': 'crossing',
+                                'type': 'overtake',
                                 'flight1': f1.callsign,
                                 'flight2': f2.callsign,
-                                'waypoint': wp,
-                                'start_time': min(t1, t2),
-                                'end_time': max(t1, t2),
+                                'segment': seg1,
+                                'start_time': min(t1_start, t2_start),
+                                'end_time': max(t1_end, t2_end),
                                 'flight_level1': f1.flight_level,
                                 'flight_level2': f2.flight_level,
                                 'time_diff_minutes': time_diff
                             })
-            
-            # 2. Cùng đường bay, ngược chiều (head-on)
-            for idx1 in range(len(f1.route)-1):
-                seg1 = (f1.route[idx1], f1.route[idx1+1])
-                for idx2 in range(len(f2.route)-1):
-                    seg2 = (f2.route[idx2+1], f2.route[idx2])  # đảo ngược để kiểm tra ngược chiều
-                    if seg1 == seg2:
-                        t1_start = f1.estimated_times.get(seg1[0])
-                        t1_end = f1.estimated_times.get(seg1[1])
-                        t2_start = f2.estimated_times.get(seg2[0])
-                        t2_end = f2.estimated_times.get(seg2[1])
-                        
-                        if t1_start and t1_end and t2_start and t2_end:
-                            fl_diff = abs(f1.flight_level - f2.flight_level) * 100
-                            if fl_diff < 1000:
-                                # Kiểm tra overlap thời gian
-                                if t1_start < t2_end and t2_start < t1_end:
-                                    conflicts.append({
-                                        'type': 'head-on',
-                                        'flight1': f1.callsign,
-                                        'flight2': f2.callsign,
-                                        'segment': seg1,
-                                        'start_time': max(t1_start, t2_start),
-                                        'end_time': min(t1_end, t2_end),
-                                        'flight_level1': f1.flight_level,
-                                        'flight_level2': f2.flight_level
-                                    })
-            
-            # 3. Cùng đường bay, cùng chiều (overtake)
-            for idx1 in range(len(f1.route)-1):
-                seg1 = (f1.route[idx1], f1.route[idx1+1])
-                for idx2 in range(len(f2.route)-1):
-                    seg2 = (f2.route[idx2], f2.route[idx2+1])
-                    if seg1 == seg2:
-                        t1_start = f1.estimated_times.get(seg1[0])
-                        t1_end = f1.estimated_times.get(seg1[1])
-                        t2_start = f2.estimated_times.get(seg2[0])
-                        t2_end = f2.estimated_times.get(seg2[1])
-                        
-                        if t1_start and t1_end and t2_start and t2_end:
-                            fl_diff = abs(f1.flight_level - f2.flight_level) * 100
-                            if fl_diff < 1000:
-                                # Kiểm tra thời gian cách nhau
-                                time_diff = abs((t1_start - t2_start).total_seconds()) / 60
-                                if time_diff < 10:  # 10 phút
-                                    conflicts.append({
-                                        'type': 'overtake',
-                                        'flight1': f1.callsign,
-                                        'flight2': f2.callsign,
-                                        'segment': seg1,
-                                        'start_time': min(t1_start, t2_start),
-                                        'end_time': max(t1_end, t2_end),
-                                        'flight_level1': f1.flight_level,
-                                        'flight_level2': f2.flight_level,
-                                        'time_diff_minutes': time_diff
-                                    })
-            
-            # 4. Đường song song, không giao cắt (lateral)
-            for wp1, t1 in f1.estimated_times.items():
-                for wp2, t2 in f2.estimated_times.items():
-                    if wp1 != wp2:  # Không phải cùng waypoint
-                        time_diff = abs((t1 - t2).total_seconds()) / 60
-                        if time_diff < 5:  # 5 phút
-                            fl_diff = abs(f1.flight_level - f2.flight_level) * 100
-                            if fl_diff < 1000:  # 1000ft
-                                # Kiểm tra khoảng cách thực tế giữa 2 waypoint
-                                try:
-                                    # Import airspace safely
-                                    from api import airspace
-                                    if wp1 in airspace.waypoints and wp2 in airspace.waypoints:
-                                        wp1_data = airspace.waypoints[wp1]
-                                        wp2_data = airspace.waypoints[wp2]
-                                        
-                                        # Tính khoảng cách bằng Haversine
-                                        from math import radians, sin, cos, sqrt, atan2
-                                        R = 3440.065  # Earth's radius in nautical miles
-                                        lat1, lon1, lat2, lon2 = map(radians, [
-                                            wp1_data.latitude, wp1_data.longitude,
-                                            wp2_data.latitude, wp2_data.longitude
-                                        ])
-                                        dlat = lat2 - lat1
-                                        dlon = lon2 - lon1
-                                        a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
-                                        c = 2 * atan2(sqrt(a), sqrt(1-a))
-                                        distance = R * c
-                                        
-                                        if distance < 10:  # Khoảng cách < 10 Nm
-                                            conflicts.append({
-                                                'type': 'lateral',
-                                                'flight1': f1.callsign,
-                                                'flight2': f2.callsign,
-                                                'wp1': wp1,
-                                                'wp2': wp2,
-                                                'time': t1,
-                                                'flight_level1': f1.flight_level,
-                                                'flight_level2': f2.flight_level,
-                                                'time_diff_minutes': time_diff,
-                                                'distance_nm': round(distance, 2)
-                                            })
-                                except Exception as e:
-                                    # Nếu không thể tính khoảng cách, bỏ qua
-                                    pass
-    
-    return conflicts 
\ No newline at end of file
+
+    return conflicts
+
+def _lateral_conflicts(f1, f2, near_pairs):
+    """Lateral rule restricted to waypoint pairs from the near-waypoint table"""
+    conflicts = []
+    fl_diff = abs(f1.flight_level - f2.flight_level) * 100
+    if fl_diff >= 1000:
+        return conflicts
+
+    # Waypoints of f2 that have at least one close neighbour, in timeline order
+    candidates = [(wp2, t2) for wp2, t2 in timeline(f2) if wp2 in near_pairs]
+    if not candidates:
+        return conflicts
+
+    for wp1, t1 in timeline(f1):
+        neighbours = near_pairs.get(wp1)
+        if not neighbours:
+            continue
+        for wp2, t2 in candidates:
+            distance = neighbours.get(wp2)
+            if distance is None:
+                continue
+            time_diff = abs((t1 - t2).total_seconds()) / 60
+            if time_diff < 5:  # 5 phút
+                conflicts.append({
+                    'type': 'lateral',
+                    'flight1': f1.callsign,
+                    'flight2': f2.callsign,
+                    'wp1': wp1,
+                    'wp2': wp2,
+                    'time': t1,
+                    'flight_level1': f1.flight_level,
+                    'flight_level2': f2.flight_level,
+                    'time_diff_minutes': time_diff,
+                    'distance_nm': round(distance, 2)
+                })
+    return conflicts
@@ -0,0 +1,205 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.conflict_detection import (
+    FL_BAND, SEPARATION_BUFFER, active_window, candidate_pairs,
+    flight_segment_hits, may_conflict, pair_conflicts, segment_hits
+)
+from algorithms.interval_tree import IntervalTree
+from algorithms.segment_index import SegmentIndex
+
+def conflict_span(conflict: dict) -> Tuple[datetime, datetime]:
+    """Time interval covered by a conflict (a single instant for lateral ones)"""
+    if 'start_time' in conflict:
+        return conflict['start_time'], conflict['end_time']
+    return conflict['time'], conflict['time']
+
+def conflict_matches(conflict: dict, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, callsign: Optional[str] = None,
+                     min_fl: Optional[int] = None, max_fl: Optional[int] = None) -> bool:
+    """
+    Whether a conflict overlaps [start, end], involves callsign and has at
+    least one flight between min_fl and max_fl. None disables a filter.
+    """
+    if callsign is not None and callsign not in (conflict['flight1'], conflict['flight2']):
+        return False
+    if min_fl is not None or max_fl is not None:
+        if not any((min_fl is None or level >= min_fl) and (max_fl is None or level <= max_fl)
+                   for level in (conflict['flight_level1'], conflict['flight_level2'])):
+            return False
+    if start is not None or end is not None:
+        first, last = conflict_span(conflict)
+        if (end is not None and first > end) or (start is not None and last < start):
+            return False
+    return True
+
+class ConflictStore:
+    """
+    Conflicts between the current flights, maintained incrementally.
+
+    Adding a flight only checks that flight against the existing traffic;
+    removing or amending one only drops the conflicts it was part of.
+    Reading the conflict list or the per-type counts never re-runs detection.
+    segment_index tracks which flights use each airway segment and is shared
+    with pathfinding; timeline is an interval tree over each flight's active
+    window, used to answer time-range queries from nearby flights only.
+    """
+
+    def __init__(self, flights: List = None, airspace=None):
+        self.reset(flights or [], airspace)
+
+    def reset(self, flights: List, airspace=None) -> None:
+        """
+        Rebuild the store from scratch for a whole traffic list.
+        airspace is used by the lateral rule, which is skipped without it.
+        """
+        self.airspace = airspace
+        self._seq = 0
+        self._order = {}       # id(flight) -> insertion sequence number
+        self._flights = {}     # id(flight) -> flight
+        self._windows = {}     # id(flight) -> (start, end) or None
+        self._levels = {}      # id(flight) -> flight level at registration
+        self._bands = {}       # FL band -> set of id(flight)
+        self._pairs = {}       # (id1, id2) -> list of conflicts, id1 inserted first
+        self._by_flight = {}   # id(flight) -> set of pair keys
+        self._by_callsign = {} # callsign -> set of id(flight)
+        self._type_counts = {}
+        self.segment_index = SegmentIndex()
+        self.timeline = IntervalTree()
+
+        for flight in flights:
+            self._register(flight)
+        # Bulk load uses the sweep instead of n incremental inserts
+        hits = segment_hits(self.segment_index, self._order)
+        for i, j in candidate_pairs(flights):
+            self._store_pair(flights[i], flights[j], hits.get((i, j)))
+
+    def __len__(self) -> int:
+        return sum(self._type_counts.values())
+
+    def add_flight(self, flight) -> None:
+        """Check one new flight against the existing traffic and merge its conflicts"""
+        self._register(flight)
+        self._check_against_traffic(flight)
+
+    def remove_flight(self, flight) -> None:
+        """Forget a flight and every conflict it was part of"""
+        key = id(flight)
+        if key not in self._flights:
+            return
+        for pair in self._by_flight.pop(key):
+            self._drop_pair(pair)
+        self.segment_index.remove_flight(flight)
+        self.timeline.remove(key)
+        callsigns = self._by_callsign[flight.callsign]
+        callsigns.discard(key)
+        if not callsigns:
+            del self._by_callsign[flight.callsign]
+        level = self._levels.pop(key)
+        if self._windows.pop(key):
+            self._bands[level // FL_BAND].discard(key)
+        del self._flights[key]
+        del self._order[key]
+
+    def update_flight(self, old_flight, new_flight) -> None:
+        """Replace an amended flight, keeping its place in the flight order"""
+        seq = self._order.get(id(old_flight))
+        self.remove_flight(old_flight)
+        self._register(new_flight, seq)
+        self._check_against_traffic(new_flight)
+
+    def conflicts(self) -> List[dict]:
+        """All current conflicts, grouped by flight pair"""
+        return [conflict for conflicts in self._pairs.values() for conflict in conflicts]
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              callsign: Optional[str] = None, min_fl: Optional[int] = None,
+              max_fl: Optional[int] = None) -> List[dict]:
+        """
+        Conflicts matching conflict_matches(), in flight order. Only flights
+        active within SEPARATION_BUFFER of [start, end] (or with the given
+        callsign) are looked at, so the cost follows local traffic, not the
+        total number of flights.
+        """
+        if callsign is not None:
+            keys = self._by_callsign.get(callsign, ())
+        elif start is not None or end is not None:
+            keys = self.timeline.overlapping(
+                start - SEPARATION_BUFFER if start is not None else None,
+                end + SEPARATION_BUFFER if end is not None else None,
+            )
+        else:
+            keys = self._flights
+
+        pairs = {pair for key in keys for pair in self._by_flight.get(key, ())}
+        ordered = sorted(pairs, key=lambda pair: (self._order[pair[0]], self._order[pair[1]]))
+        return [
+            conflict
+            for pair in ordered
+            for conflict in self._pairs[pair]
+            if conflict_matches(conflict, start, end, callsign, min_fl, max_fl)
+        ]
+
+    def type_counts(self) -> Dict[str, int]:
+        return {t: n for t, n in self._type_counts.items() if n}
+
+    def _register(self, flight, seq: int = None) -> None:
+        key = id(flight)
+        if seq is None:
+            seq = self._seq
+            self._seq += 1
+        self._order[key] = seq
+        self._flights[key] = flight
+        self._by_flight[key] = set()
+        self._by_callsign.setdefault(flight.callsign, set()).add(key)
+        window = active_window(flight)
+        self._windows[key] = window
+        self._levels[key] = flight.flight_level
+        self.segment_index.add_flight(flight)
+        if window:
+            self.timeline.add(key, window[0], window[1], key)
+            self._bands.setdefault(flight.flight_level // FL_BAND, set()).add(key)
+
+    def _check_against_traffic(self, flight) -> None:
+        key = id(flight)
+        window = self._windows[key]
+        if not window:
+            return
+        level = self._levels[key]
+        hits = flight_segment_hits(flight, self.segment_index, self._order)
+        band = level // FL_BAND
+        for b in (band - 1, band, band + 1):
+            for other_key in self._bands.get(b, ()):
+                if other_key == key:
+                    continue
+                if may_conflict(window, level, self._windows[other_key], self._levels[other_key]):
+                    other = self._flights[other_key]
+                    if self._order[other_key] < self._order[key]:
+                        self._store_pair(other, flight, hits.get(other_key))
+                    else:
+                        self._store_pair(flight, other, hits.get(other_key))
+
+    def _near_pairs(self):
+        return self.airspace.near_waypoint_pairs() if self.airspace is not None else {}
+
+    def _store_pair(self, f1, f2, hits) -> None:
+        conflicts = pair_conflicts(f1, f2, hits, self._near_pairs())
+        if not conflicts:
+            return
+        pair = (id(f1), id(f2))
+        self._pairs[pair] = conflicts
+        self._by_flight[pair[0]].add(pair)
+        self._by_flight[pair[1]].add(pair)
+        for conflict in conflicts:
+            self._type_counts[conflict['type']] = self._type_counts.get(conflict['type'], 0) + 1
+
+    def _drop_pair(self, pair: Tuple[int, int]) -> None:
+        for conflict in self._pairs.pop(pair, ()):
+            self._type_counts[conflict['type']] -= 1
+        for key in pair:
+            if key in self._by_flight:
+                self._by_flight[key].discard(pair)
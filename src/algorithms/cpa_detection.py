@@ -0,0 +1,249 @@
+from typing import Dict, List
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.conflict_detection import FL_BAND
+from models.airspace import LATERAL_SEPARATION_NM
+from models.flight_table import FlightTable
+from models.geo import NM_PER_DEGREE_LAT
+from models.timebase import from_epoch, to_epoch
+
+PAIR_CHUNK = 2_000_000  # Candidate segment pairs evaluated per NumPy batch
+
+def build_segment_arrays(flights: List, airspace) -> Dict[str, np.ndarray]:
+    """
+    Flatten every timed leg into columns: owning flight index, leg position,
+    start/end lat, lon, epoch time and flight level. Legs whose endpoints are
+    unknown to the airspace or that take no time are left out.
+    """
+    if isinstance(flights, FlightTable):
+        return _table_segment_arrays(flights, airspace)
+    columns = {name: [] for name in (
+        'flight', 'position', 'lat0', 'lon0', 't0', 'fl0', 'lat1', 'lon1', 't1', 'fl1'
+    )}
+    waypoints = airspace.waypoints
+    for idx, flight in enumerate(flights):
+        times = flight.position_times
+        route = flight.route
+        for pos in range(len(route) - 1):
+            wp0, wp1 = waypoints.get(route[pos]), waypoints.get(route[pos + 1])
+            t0, t1 = times[pos], times[pos + 1]
+            if wp0 is None or wp1 is None or t0 is None or t1 is None or t1 <= t0:
+                continue
+            columns['flight'].append(idx)
+            columns['position'].append(pos)
+            columns['lat0'].append(wp0.latitude)
+            columns['lon0'].append(wp0.longitude)
+            columns['t0'].append(to_epoch(t0))
+            columns['fl0'].append(flight.flight_level)
+            columns['lat1'].append(wp1.latitude)
+            columns['lon1'].append(wp1.longitude)
+            columns['t1'].append(to_epoch(t1))
+            columns['fl1'].append(flight.flight_level)
+
+    arrays = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+    arrays['flight'] = arrays['flight'].astype(np.int64)
+    arrays['position'] = arrays['position'].astype(np.int64)
+    return arrays
+
+def _table_segment_arrays(table: FlightTable, airspace) -> Dict[str, np.ndarray]:
+    """build_segment_arrays straight from the table's columns"""
+    rows = table.rows
+    offsets = table.route_offsets
+    starts = offsets[rows]
+    counts = np.maximum(offsets[rows + 1] - starts - 1, 0)
+    flight = np.repeat(np.arange(len(rows), dtype=np.int64), counts)
+    position = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    first = np.repeat(starts, counts) + position
+
+    waypoints = [airspace.waypoints.get(name) for name in table.names]
+    lat = np.array([wp.latitude if wp else np.nan for wp in waypoints], dtype=np.float64)
+    lon = np.array([wp.longitude if wp else np.nan for wp in waypoints], dtype=np.float64)
+    wp0, wp1 = table.route_ids[first], table.route_ids[first + 1]
+    t0, t1 = table.etas[first], table.etas[first + 1]
+    keep = ~np.isnan(lat[wp0]) & ~np.isnan(lat[wp1]) & (t1 > t0)  # False where an ETA is NaN
+    fl = table.flight_level[rows][flight].astype(np.float64)
+    return {
+        'flight': flight[keep],
+        'position': position[keep],
+        'lat0': lat[wp0][keep], 'lon0': lon[wp0][keep], 't0': t0[keep], 'fl0': fl[keep],
+        'lat1': lat[wp1][keep], 'lon1': lon[wp1][keep], 't1': t1[keep], 'fl1': fl[keep],
+    }
+
+def _overlapping_pairs(t0: np.ndarray, t1: np.ndarray):
+    """
+    Yield (i, j) index arrays of segments whose time spans overlap, in chunks
+    of at most PAIR_CHUNK pairs. Each unordered pair is produced once.
+    """
+    order = np.argsort(t0, kind='stable')
+    start = t0[order]
+    # Segments j > i (in start order) that start before segment i ends
+    stop = np.searchsorted(start, t1[order], side='left')
+    counts = np.maximum(stop - np.arange(len(order)) - 1, 0)
+
+    total = np.cumsum(counts)
+    first = 0
+    while first < len(order):
+        done = total[first - 1] if first else 0
+        last = max(int(np.searchsorted(total, done + PAIR_CHUNK, side='right')), first + 1)
+        chunk_counts = counts[first:last]
+        n = int(chunk_counts.sum())
+        if n:
+            rows = np.repeat(np.arange(first, last), chunk_counts)
+            offsets = np.arange(n) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            yield order[rows], order[rows + 1 + offsets]
+        first = last
+
+def candidate_segment_pairs(seg: Dict[str, np.ndarray], separation_nm: float):
+    """
+    Yield (i, j) index arrays of legs of different flights that are flown at
+    the same time, within one FL band of each other and whose horizontal
+    envelopes, padded by separation_nm, overlap. Each pair is produced once.
+    """
+    # Horizontal envelope of each leg (centre and half-size, longitude wrapped),
+    # padded by the separation minimum
+    lat_mid = (seg['lat0'] + seg['lat1']) / 2
+    lat_half = np.abs(seg['lat1'] - seg['lat0']) / 2
+    lon_span = (seg['lon1'] - seg['lon0'] + 180.0) % 360.0 - 180.0
+    lon_mid = seg['lon0'] + lon_span / 2
+    lon_half = np.abs(lon_span) / 2
+    lat_pad = separation_nm / NM_PER_DEGREE_LAT
+    max_lat = np.minimum(np.abs(lat_mid) + lat_half + lat_pad, 89.0)
+    lon_pad = lat_pad / np.cos(np.radians(max_lat))
+    band = np.floor(np.minimum(seg['fl0'], seg['fl1']) / FL_BAND).astype(np.int64)
+
+    for b in np.unique(band):
+        # Legs in bands b and b+1; a pair is handled by the lower of its bands
+        members = np.nonzero((band == b) | (band == b + 1))[0]
+        if len(members) < 2:
+            continue
+        for li, lj in _overlapping_pairs(seg['t0'][members], seg['t1'][members]):
+            i, j = members[li], members[lj]
+            keep = (np.minimum(band[i], band[j]) == b) & (seg['flight'][i] != seg['flight'][j])
+            keep &= np.abs(seg['fl0'][i] - seg['fl0'][j]) < 2 * FL_BAND
+            keep &= np.abs(lat_mid[i] - lat_mid[j]) <= lat_half[i] + lat_half[j] + lat_pad
+            dlon = np.abs((lon_mid[i] - lon_mid[j] + 180.0) % 360.0 - 180.0)
+            keep &= dlon <= lon_half[i] + lon_half[j] + np.maximum(lon_pad[i], lon_pad[j])
+            if keep.any():
+                yield i[keep], j[keep]
+
+def closest_approach(seg: Dict[str, np.ndarray], i: np.ndarray, j: np.ndarray,
+                     separation_nm: float):
+    """
+    Closest point of approach of segment pairs (i, j) over the time both are
+    flown. Positions are projected on a local equirectangular plane centred on
+    each pair. Returns (t_cpa, d_cpa, los_start, los_end, fl_i, fl_j); the loss
+    of separation interval is NaN when the pair never gets within separation_nm.
+    """
+    ta = np.maximum(seg['t0'][i], seg['t0'][j])
+    tb = np.minimum(seg['t1'][i], seg['t1'][j])
+
+    lat_ref = np.radians((seg['lat0'][i] + seg['lat1'][i] + seg['lat0'][j] + seg['lat1'][j]) / 4)
+    lon_ref = seg['lon0'][i]
+    x_scale = NM_PER_DEGREE_LAT * np.cos(lat_ref)
+
+    def position(k, t):
+        frac = (t - seg['t0'][k]) / (seg['t1'][k] - seg['t0'][k])
+        lat = seg['lat0'][k] + (seg['lat1'][k] - seg['lat0'][k]) * frac
+        dlon0 = (seg['lon0'][k] - lon_ref + 180.0) % 360.0 - 180.0
+        dlon1 = (seg['lon1'][k] - lon_ref + 180.0) % 360.0 - 180.0
+        x = (dlon0 + (dlon1 - dlon0) * frac) * x_scale
+        return x, lat * NM_PER_DEGREE_LAT
+
+    xi_a, yi_a = position(i, ta)
+    xj_a, yj_a = position(j, ta)
+    xi_b, yi_b = position(i, tb)
+    xj_b, yj_b = position(j, tb)
+
+    duration = tb - ta
+    dx, dy = xi_a - xj_a, yi_a - yj_a
+    vx = np.where(duration > 0, (xi_b - xj_b - dx) / np.where(duration > 0, duration, 1), 0.0)
+    vy = np.where(duration > 0, (yi_b - yj_b - dy) / np.where(duration > 0, duration, 1), 0.0)
+    vv = vx * vx + vy * vy
+    dv = dx * vx + dy * vy
+    dd = dx * dx + dy * dy
+    moving = vv > 0
+    safe_vv = np.where(moving, vv, 1.0)
+
+    s_cpa = np.where(moving, np.clip(-dv / safe_vv, 0.0, duration), 0.0)
+    cx, cy = dx + vx * s_cpa, dy + vy * s_cpa
+    d_cpa = np.sqrt(cx * cx + cy * cy)
+    t_cpa = ta + s_cpa
+
+    # Entry/exit of the separation circle: |d + v s|² = R²
+    disc = dv * dv - vv * (dd - separation_nm ** 2)
+    root = np.sqrt(np.maximum(disc, 0.0))
+    s_in = np.where(moving, np.clip((-dv - root) / safe_vv, 0.0, duration), 0.0)
+    s_out = np.where(moving, np.clip((-dv + root) / safe_vv, 0.0, duration), duration)
+    inside = d_cpa < separation_nm
+    los_start = np.where(inside, ta + s_in, np.nan)
+    los_end = np.where(inside, ta + s_out, np.nan)
+
+    def level(k):
+        frac = (t_cpa - seg['t0'][k]) / (seg['t1'][k] - seg['t0'][k])
+        return seg['fl0'][k] + (seg['fl1'][k] - seg['fl0'][k]) * frac
+
+    return t_cpa, d_cpa, los_start, los_end, level(i), level(j)
+
+def detect_conflicts_cpa(flights: List, airspace=None,
+                         separation_nm: float = LATERAL_SEPARATION_NM) -> List[dict]:
+    """
+    4D closest-point-of-approach detection.
+
+    Every pair of legs flown at the same time within 1000 ft is checked in
+    batched NumPy operations for the minimum horizontal distance over their
+    common time span, so aircraft crossing mid-segment are caught too.
+    Returns one 'cpa' conflict per flight pair with the time and distance of
+    closest approach and the interval during which separation is lost.
+    """
+    if airspace is None or not flights:
+        return []
+    seg = build_segment_arrays(flights, airspace)
+    if len(seg['t0']) < 2:
+        return []
+
+    found = []
+    for i, j in candidate_segment_pairs(seg, separation_nm):
+        t_cpa, d_cpa, los_start, los_end, fl_i, fl_j = closest_approach(seg, i, j, separation_nm)
+        hit = (d_cpa < separation_nm) & (np.abs(fl_i - fl_j) * 100 < 1000)
+        if hit.any():
+            found.append((i[hit], j[hit], t_cpa[hit], d_cpa[hit], los_start[hit], los_end[hit]))
+
+    if not found:
+        return []
+    i, j, t_cpa, d_cpa, los_start, los_end = (np.concatenate(col) for col in zip(*found))
+
+    # Orient pairs by flight order, then keep the closest approach per flight pair
+    swap = seg['flight'][i] > seg['flight'][j]
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+    f1, f2 = seg['flight'][i], seg['flight'][j]
+    order = np.lexsort((d_cpa, f2, f1))
+    i, j, f1, f2 = i[order], j[order], f1[order], f2[order]
+    t_cpa, d_cpa, los_start, los_end = t_cpa[order], d_cpa[order], los_start[order], los_end[order]
+    first = np.nonzero(np.r_[True, (f1[1:] != f1[:-1]) | (f2[1:] != f2[:-1])])[0]
+    start = np.minimum.reduceat(los_start, first)
+    end = np.maximum.reduceat(los_end, first)
+
+    conflicts = []
+    for k, g in enumerate(first):
+        flight1, flight2 = flights[f1[g]], flights[f2[g]]
+        p1, p2 = seg['position'][i[g]], seg['position'][j[g]]
+        conflicts.append({
+            'type': 'cpa',
+            'flight1': flight1.callsign,
+            'flight2': flight2.callsign,
+            'segment1': (flight1.route[p1], flight1.route[p1 + 1]),
+            'segment2': (flight2.route[p2], flight2.route[p2 + 1]),
+            'time': from_epoch(t_cpa[g]),
+            'start_time': from_epoch(start[k]),
+            'end_time': from_epoch(end[k]),
+            'flight_level1': flight1.flight_level,
+            'flight_level2': flight2.flight_level,
+            'distance_nm': round(float(d_cpa[g]), 2)
+        })
+    conflicts.sort(key=lambda c: c['time'])
+    return conflicts
@@ -0,0 +1,130 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, by_start, by_end, left, right):
+        self.center = center
+        self.by_start = by_start   # Intervals containing center, ascending start
+        self.by_end = by_end       # Same intervals, descending end
+        self.left = left           # Intervals entirely before center
+        self.right = right         # Intervals entirely after center
+
+def _build(intervals: List[Tuple]) -> Optional[_Node]:
+    if not intervals:
+        return None
+    endpoints = sorted(p for start, end, _ in intervals for p in (start, end))
+    center = endpoints[len(endpoints) // 2]
+    here, left, right = [], [], []
+    for interval in intervals:
+        if interval[1] < center:
+            left.append(interval)
+        elif interval[0] > center:
+            right.append(interval)
+        else:
+            here.append(interval)
+    return _Node(
+        center,
+        sorted(here, key=lambda iv: iv[0]),
+        sorted(here, key=lambda iv: iv[1], reverse=True),
+        _build(left),
+        _build(right),
+    )
+
+class _Unbounded:
+    """Query bound before (sign -1) or after (sign +1) every value"""
+    __slots__ = ('sign',)
+
+    def __init__(self, sign: int):
+        self.sign = sign
+
+    def __lt__(self, other):
+        return self.sign < 0
+
+    def __le__(self, other):
+        return self.sign < 0
+
+    def __gt__(self, other):
+        return self.sign > 0
+
+    def __ge__(self, other):
+        return self.sign > 0
+
+_BEFORE_ALL = _Unbounded(-1)
+_AFTER_ALL = _Unbounded(1)
+
+class IntervalTree:
+    """
+    Centered interval tree over closed intervals [start, end] keyed by an id.
+
+    Queries cost O(log n + k). Inserts go to a small pending list and removals
+    to a tombstone set; the tree is rebuilt once either grows past
+    REBUILD_FRACTION of its size, keeping updates amortised O(log n).
+    """
+
+    REBUILD_FRACTION = 0.1
+    MIN_REBUILD = 64
+
+    def __init__(self):
+        self._items: Dict[Hashable, Tuple] = {}   # key -> (start, end, value)
+        self._root = None
+        self._pending: Dict[Hashable, Tuple] = {}
+        self._removed = set()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, key: Hashable, start, end, value: Any = None) -> None:
+        if key in self._items:
+            self.remove(key)
+        interval = (start, end, (key, value))
+        self._items[key] = interval
+        self._pending[key] = interval
+        self._maybe_rebuild()
+
+    def remove(self, key: Hashable) -> None:
+        if key not in self._items:
+            return
+        del self._items[key]
+        if self._pending.pop(key, None) is None:
+            self._removed.add(key)
+        self._maybe_rebuild()
+
+    def overlapping(self, start=None, end=None) -> List[Any]:
+        """Values whose interval intersects [start, end]; None means unbounded"""
+        start = _BEFORE_ALL if start is None else start
+        end = _AFTER_ALL if end is None else end
+        found = []
+        self._query(self._root, start, end, found)
+        found.extend(value for s, e, (_, value) in self._pending.values()
+                     if s <= end and e >= start)
+        return found
+
+    def _query(self, node, start, end, found) -> None:
+        while node is not None:
+            if end < node.center:
+                for s, _, (key, value) in node.by_start:
+                    if s > end:
+                        break
+                    if key not in self._removed:
+                        found.append(value)
+                node = node.left
+            elif start > node.center:
+                for _, e, (key, value) in node.by_end:
+                    if e < start:
+                        break
+                    if key not in self._removed:
+                        found.append(value)
+                node = node.right
+            else:
+                found.extend(value for _, _, (key, value) in node.by_start
+                             if key not in self._removed)
+                self._query(node.left, start, end, found)
+                node = node.right
+
+    def _maybe_rebuild(self) -> None:
+        limit = max(self.MIN_REBUILD, int(len(self._items) * self.REBUILD_FRACTION))
+        if len(self._pending) > limit or len(self._removed) > limit:
+            self._root = _build(list(self._items.values()))
+            self._pending.clear()
+            self._removed.clear()
@@ -0,0 +1,310 @@
+import heapq
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.pathfinding import MAX_TURN_ANGLE, SearchStats, departure_time
+from algorithms.reservation_table import ReservationTable
+from algorithms.segment_index import SegmentIndex
+from models.geo import haversine
+from models.landmarks import INF
+
+@dataclass
+class RouteOption:
+    """One of the K shortest routes, with the conflicts flying it would cause"""
+    path: List[str]
+    distance_nm: float
+    conflicts: int
+    max_turn_deg: float = 0.0  # Sharpest turn along the route
+
+class ShortestPathTree:
+    """
+    Shortest routes to goal within the turn limit, for every edge a flight
+    may arrive by: the distance left after flying edge e, and next(e), the
+    edge to take after it. turns is the airspace's TurnTable for the
+    limit.
+
+    Grown backwards from goal by an A* towards start, ordered by distance
+    left plus a lower bound of the distance from start, and only as far as
+    the searches need. An edge it has not settled yet has at least the
+    frontier value minus that bound left, which serves as its estimate.
+    """
+
+    def __init__(self, graph, turns, goal: int, start: int,
+                 from_start: Optional[Callable[[int], float]] = None):
+        self.graph = graph
+        self.turns = turns
+        self.goal = goal
+        self.start = start
+        self._from_start = from_start
+        self._start_bounds: Dict[int, float] = {}
+        arriving = graph.rev_edges[graph.rev_offsets[goal]:graph.rev_offsets[goal + 1]]
+        self._remaining: Dict[int, float] = {edge: 0.0 for edge in arriving}
+        self._settled: Set[int] = set()
+        self._heap = [(self.from_start(goal), 0.0, edge) for edge in arriving]
+        heapq.heapify(self._heap)
+        self._next: Dict[int, int] = {}
+
+    def from_start(self, node: int) -> float:
+        """Lower bound of the distance from start to node"""
+        h = self._start_bounds.get(node)
+        if h is None:
+            graph, start = self.graph, self.start
+            h = haversine(graph.lat[start], graph.lon[start], graph.lat[node], graph.lon[node])
+            if self._from_start is not None:
+                h = max(h, self._from_start(node))
+            self._start_bounds[node] = h
+        return h
+
+    def settled(self, edge: int) -> bool:
+        return edge in self._settled
+
+    def bound(self, edge: int) -> float:
+        """Exact distance left after edge once it is settled, else a lower bound"""
+        if edge in self._settled:
+            return self._remaining[edge]
+        if not self._heap:
+            return INF
+        return max(self._heap[0][0] - self.from_start(self.graph.targets[edge]), 0.0)
+
+    def advance(self, edge: int, limit: float = INF) -> float:
+        """Grow the tree until edge is settled or its bound passes limit; returns bound(edge)"""
+        graph, settled, remaining, heap = self.graph, self._settled, self._remaining, self._heap
+        rev_offsets, rev_edges = graph.rev_offsets, graph.rev_edges
+        sources, distances = graph.sources, graph.distances
+        turn_base, turn_ok = self.turns.base, self.turns.allowed
+        target_bound = self.from_start(graph.targets[edge])
+        while heap and edge not in settled and heap[0][0] - target_bound <= limit:
+            _, d, current = heapq.heappop(heap)
+            if current in settled or d > remaining[current]:
+                continue
+            settled.add(current)
+            # Edges arriving where current starts may continue with it
+            nd = d + distances[current]
+            source = sources[current]
+            for k in range(rev_offsets[source], rev_offsets[source + 1]):
+                before = rev_edges[k]
+                if nd >= remaining.get(before, INF):
+                    continue
+                if turn_ok[turn_base[before] + current]:
+                    remaining[before] = nd
+                    self._next[before] = current
+                    settled.discard(before)  # Reopened should the bound be off by rounding
+                    heapq.heappush(heap, (nd + self.from_start(source), nd, before))
+        return self.bound(edge)
+
+    def next(self, edge: int) -> Optional[int]:
+        """Edge to fly after settled edge on its shortest route (None on arriving at goal)"""
+        return self._next.get(edge)
+
+def spur_search(graph, spur: int, tree: ShortestPathTree, blocked: bytearray,
+                blocked_edges: Set[Tuple[int, int]], arrival: Optional[int] = None,
+                stats: Optional[SearchStats] = None) -> Optional[List[int]]:
+    """
+    Edges of the shortest loopless route from spur to tree.goal avoiding
+    blocked waypoints and (from, to) edges, for a flight reaching spur by
+    edge arrival. A* over arrival edges: the tree distances are exact in
+    the full graph, hence a consistent bound however much is blocked, and
+    once the state taken off the open set can follow the tree to goal
+    unhindered, that completes an optimal route without further search.
+    States the tree has not reached yet get its frontier as their bound
+    and are looked at again when they come first.
+    """
+    offsets, targets, distances = graph.offsets, graph.targets, graph.distances
+    turn_ok = tree.turns.turn_ok
+    goal = tree.goal
+    if spur == goal:
+        return []
+
+    open_set = []  # (f, -g, edge): ties go deepest, i.e. along the tree
+    g_score: Dict[int, float] = {}
+    came_from: Dict[int, Optional[int]] = {}
+    for edge in range(offsets[spur], offsets[spur + 1]):
+        neighbor = targets[edge]
+        if blocked[neighbor] or (spur, neighbor) in blocked_edges:
+            continue
+        if arrival is not None and not turn_ok(arrival, edge):
+            continue
+        h = tree.bound(edge)
+        if h == INF:
+            continue
+        g_score[edge] = distances[edge]
+        came_from[edge] = None
+        heapq.heappush(open_set, (distances[edge] + h, -distances[edge], edge))
+    if stats is not None:
+        stats.searches += 1
+        stats.pushes += len(open_set)
+
+    closed = set()
+    while open_set:
+        f, current_g, edge = heapq.heappop(open_set)
+        current_g = -current_g
+        if edge in closed:
+            continue
+        if tree.settled(edge) or open_set:
+            # Grow the tree only as far as needed to tell whether edge still comes first
+            h = tree.advance(edge, open_set[0][0] - current_g if open_set else INF)
+            if h == INF:
+                continue
+            if current_g + h > f:
+                heapq.heappush(open_set, (current_g + h, -current_g, edge))
+                continue
+        # else it is the only state left: expand it rather than grow the tree to the end
+        closed.add(edge)
+        route = [edge]
+        while came_from[route[-1]] is not None:
+            route.append(came_from[route[-1]])
+        route.reverse()
+        current = targets[edge]
+        if current == goal:
+            return route
+        visited = {spur}
+        visited.update(targets[e] for e in route)
+
+        # Follow the tree when nothing blocks it
+        if tree.settled(edge):
+            node, after, tail = current, tree.next(edge), []
+            while after is not None:
+                target = targets[after]
+                if blocked[target] or target in visited or (node, target) in blocked_edges:
+                    break
+                visited.add(target)
+                tail.append(after)
+                node, after = target, tree.next(after)
+            else:
+                return route + tail
+            visited.difference_update(targets[e] for e in tail)
+
+        if stats is not None:
+            stats.record(len(open_set) + 1, len(came_from))
+        for after in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[after]
+            if blocked[neighbor] or neighbor in visited or (current, neighbor) in blocked_edges:
+                continue
+            if after in closed or not turn_ok(edge, after):
+                continue
+            h = tree.bound(after)
+            if h == INF:
+                continue
+            tentative_g = current_g + distances[after]
+            if tentative_g < g_score.get(after, INF):
+                g_score[after] = tentative_g
+                came_from[after] = edge
+                heapq.heappush(open_set, (tentative_g + h, -tentative_g, after))
+                if stats is not None:
+                    stats.pushes += 1
+
+    return None
+
+def k_shortest_routes(airspace, flight, start, goal, k: int, other_flights=None,
+                      segment_index=None, reservations: Optional[ReservationTable] = None,
+                      stats: Optional[SearchStats] = None,
+                      max_turn: float = MAX_TURN_ANGLE) -> List[RouteOption]:
+    """
+    Up to k loopless routes from start to goal with no turn sharper than
+    max_turn degrees (Yen's algorithm, spurring only past each route's
+    deviation as Lawler does), ranked by the conflicts each would cause at
+    the flight's level and times, then by distance.
+
+    All spur searches share one shortest-path tree to goal, grown on
+    demand: it is their exact heuristic, and most spurs join its routes
+    after a few expansions. Landmarks, if the airspace has them, steer the
+    tree towards start.
+    """
+    graph = airspace.compiled()
+    if k <= 0 or start not in graph.ids or goal not in graph.ids:
+        return []
+    if reservations is None:
+        if segment_index is None:
+            segment_index = SegmentIndex(other_flights or [])
+        reservations = ReservationTable(segment_index, flight)
+    start_id, goal_id = graph.ids[start], graph.ids[goal]
+    landmarks = airspace.landmarks()
+    turns = airspace.turns(max_turn)
+    tree = ShortestPathTree(graph, turns, goal_id, start_id,
+                            landmarks.heuristic_from(start_id) if landmarks else None)
+    names, targets, distances = graph.names, graph.targets, graph.distances
+
+    first = spur_search(graph, start_id, tree, bytearray(len(graph)), set(), stats=stats)
+    if first is None:
+        return []
+
+    def waypoints(edges: List[int]) -> List[int]:
+        return [start_id] + [targets[edge] for edge in edges]
+
+    # (waypoints, edges, index where the route left the one it was derived from)
+    accepted = [(waypoints(first), first, 0)]
+    candidates = []  # (distance, waypoints, edges, deviation)
+    seen = {tuple(accepted[0][0])}
+    blocked = bytearray(len(graph))
+    while len(accepted) < k:
+        last, last_edges, deviation = accepted[-1]
+        flown = sum(distances[edge] for edge in last_edges[:deviation])
+        for i in range(deviation, len(last) - 1):
+            root = last[:i + 1]
+            # Leave every accepted route sharing this root by another edge
+            blocked_edges = {(path[i], path[i + 1]) for path, _, _ in accepted
+                             if len(path) > i + 1 and path[:i + 1] == root}
+            for node in root[:-1]:
+                blocked[node] = 1
+            spur = spur_search(graph, last[i], tree, blocked, blocked_edges,
+                               last_edges[i - 1] if i else None, stats)
+            for node in root[:-1]:
+                blocked[node] = 0
+            if spur is not None:
+                edges = last_edges[:i] + spur
+                path = waypoints(edges)
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    distance = flown + sum(distances[edge] for edge in spur)
+                    heapq.heappush(candidates, (distance, path, edges, i))
+            flown += distances[last_edges[i]]
+        if not candidates:
+            break
+        _, path, edges, deviation = heapq.heappop(candidates)
+        accepted.append((path, edges, deviation))
+
+    options = [_score(graph, turns, reservations, flight, flight.flight_level, path, edges)
+               for path, edges, _ in accepted]
+    options.sort(key=lambda option: (option.conflicts, option.distance_nm))
+    return options
+
+def route_option(airspace, flight, path: List[str], flight_level: int,
+                 reservations: ReservationTable) -> RouteOption:
+    """
+    Any route (e.g. find_alternative_route's) scored as k_shortest_routes
+    scores its options, flown at flight_level; between two waypoints the
+    shortest airway is assumed.
+    """
+    graph = airspace.compiled()
+    nodes = [graph.ids[name] for name in path]
+    edges = [min((edge for edge in graph.edges(node) if graph.targets[edge] == after),
+                 key=lambda edge: graph.distances[edge])
+             for node, after in zip(nodes, nodes[1:])]
+    return _score(graph, airspace.turns(MAX_TURN_ANGLE), reservations, flight, flight_level,
+                  nodes, edges)
+
+def _score(graph, turns, reservations: ReservationTable, flight, flight_level: int,
+           path: List[int], edges: List[int]) -> RouteOption:
+    """Conflicts, distance and sharpest turn of the route path, flown by edges"""
+    names, distances = graph.names, graph.distances
+    depart = departure_time(flight, names[path[0]])
+    seconds_per_nm = 3600 / flight.speed if depart is not None else None
+    conflicts = 0
+    flown = 0.0
+    max_turn = 0.0
+    for idx, edge in enumerate(edges):
+        if idx:
+            max_turn = max(max_turn, turns.turn(edges[idx - 1], edge))
+        if depart is None:
+            enter = exit = None
+        else:
+            enter = depart + flown * seconds_per_nm
+            exit = depart + (flown + distances[edge]) * seconds_per_nm
+        conflicts += reservations.conflicts(names[path[idx]], names[path[idx + 1]],
+                                            flight_level, enter, exit)
+        flown += distances[edge]
+    return RouteOption([names[node] for node in path], flown, conflicts, max_turn)
@@ -0,0 +1,144 @@
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import List, Optional, Tuple
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.conflict_detection import (
+    SEPARATION_BUFFER, active_window, sweep_conflicts
+)
+from models.flight_table import NO_TIME, FlightTable, FlightView
+from models.timebase import MICROSECOND, from_micros, to_micros
+
+# Worker processes used by default (CONFLICT_WORKERS overrides the CPU count)
+DEFAULT_WORKERS = int(os.environ.get("CONFLICT_WORKERS", os.cpu_count() or 1))
+SHARDS_PER_WORKER = 4  # More windows than workers to even out busy hours
+
+# Long-lived pool, replaced when the worker count or the airspace changes
+_pool = None
+_pool_owner = None   # (workers, airspace, airspace version) the pool was started for
+_pool_lock = threading.Lock()
+
+# Near-waypoint table of one worker process, set by _init_worker
+_near_pairs = {}
+
+def _init_worker(near_pairs) -> None:
+    global _near_pairs
+    _near_pairs = near_pairs
+
+def _worker_pool(workers: int, airspace, near_pairs) -> ProcessPoolExecutor:
+    """
+    The shared pool for this worker count and airspace version. The
+    near-waypoint table goes to each worker once, when the pool starts.
+    """
+    global _pool, _pool_owner
+    version = airspace.version if airspace is not None else None
+    with _pool_lock:
+        owner = _pool_owner
+        if (_pool is None or owner[0] != workers or owner[1] is not airspace
+                or owner[2] != version):
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # Work already submitted still completes
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(near_pairs,))
+            _pool_owner = (workers, airspace, version)
+        return _pool
+
+def serialize_flight(flight) -> Tuple:
+    """
+    Compact picklable form: (callsign, route, speed, FL, entry µs, ETA µs
+    at each route position, None where there is none)
+    """
+    return (
+        flight.callsign,
+        tuple(flight.route),
+        flight.speed,
+        flight.flight_level,
+        to_micros(flight.entry_time),
+        tuple(None if t is None else to_micros(t) for t in flight.position_times),
+    )
+
+def deserialize_flights(traffic: List[Tuple]) -> List[FlightView]:
+    """Serialized flights as views of one FlightTable, keeping every pass over a waypoint"""
+    table = FlightTable()
+    return [
+        table.add_row(callsign, route, speed, flight_level, from_micros(entry_us),
+                      [NO_TIME if us is None else us / 1e6 for us in etas])
+        for callsign, route, speed, flight_level, entry_us, etas in traffic
+    ]
+
+def _detect_window(indices, shard, window_start, window_end, near_pairs=None):
+    """
+    Worker: run the sweep on one shard and keep only the pairs this window
+    owns, i.e. whose later-starting flight starts inside [window_start, window_end).
+    near_pairs defaults to the table the worker was started with.
+    """
+    if near_pairs is None:
+        near_pairs = _near_pairs
+    flights = deserialize_flights(shard)
+    starts = [min(us for us in data[5] if us is not None) for data in shard]
+    owned = []
+    for i, j, conflicts in sweep_conflicts(flights, near_pairs):
+        if window_start <= max(starts[i], starts[j]) < window_end:
+            owned.append((indices[i], indices[j], conflicts))
+    return owned
+
+def detect_conflicts_parallel(flights: List, airspace=None, workers: Optional[int] = None,
+                              window: Optional[timedelta] = None) -> List[dict]:
+    """
+    Same result as detect_conflicts(flights, mode="sweep"), computed on a
+    process pool.
+
+    The day is cut into windows; each worker gets every flight active in its
+    window or within SEPARATION_BUFFER before it, so any conflicting pair is
+    complete in the window where its later flight starts. That window alone
+    reports the pair, which removes duplicates at window boundaries.
+    The process pool is kept between calls (see _worker_pool).
+    """
+    near_pairs = airspace.near_waypoint_pairs() if airspace is not None else {}
+    workers = workers or DEFAULT_WORKERS
+
+    spans = []
+    for idx, flight in enumerate(flights):
+        span = active_window(flight)
+        if span:
+            spans.append((to_micros(span[0]), to_micros(span[1]), idx))
+    if not spans:
+        return []
+    spans.sort()
+    starts = [start for start, _, _ in spans]
+    longest = max(end - start for start, end, _ in spans)
+    serialized = {idx: serialize_flight(flights[idx]) for _, _, idx in spans}
+
+    first, last = starts[0], starts[-1] + 1
+    if window is None:
+        window = timedelta(microseconds=max((last - first) // (workers * SHARDS_PER_WORKER), 1))
+    step = max(window // MICROSECOND, 1)
+    buffer = SEPARATION_BUFFER // MICROSECOND
+
+    tasks = []
+    for window_start in range(first, last, step):
+        window_end = window_start + step
+        # Flights starting before the window ends and still active (plus buffer) at its start
+        lo = bisect_left(starts, window_start - longest - buffer)
+        hi = bisect_left(starts, window_end)
+        members = sorted(idx for _, end, idx in spans[lo:hi] if end + buffer > window_start)
+        if len(members) < 2:
+            continue
+        shard = [serialized[idx] for idx in members]
+        tasks.append((members, shard, window_start, window_end))
+
+    if workers <= 1:
+        results = [_detect_window(*task, near_pairs) for task in tasks]
+    else:
+        pool = _worker_pool(workers, airspace, near_pairs)
+        futures = [pool.submit(_detect_window, *task) for task in tasks]
+        results = [future.result() for future in futures]
+
+    pairs = [pair for result in results for pair in result]
+    pairs.sort(key=lambda pair: (pair[0], pair[1]))
+    return [conflict for _, _, conflicts in pairs for conflict in conflicts]
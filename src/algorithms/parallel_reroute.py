@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.parallel_detection import DEFAULT_WORKERS, deserialize_flights, serialize_flight
+from algorithms.pathfinding import find_alternative_route
+from algorithms.reservation_table import ReservationTable
+from algorithms.segment_index import SegmentIndex
+
+CHUNKS_PER_WORKER = 4  # Smaller batches than workers x 1 so slow searches even out
+
+# (callsign, start, goal) -> (callsign, path, flight level, level change, segments, seconds)
+RerouteTask = Tuple[str, str, str]
+RerouteResult = Tuple[str, Optional[List[str]], Optional[int], int, List[Tuple[str, str]], float]
+
+# Read-only snapshot of one worker process, set by _init_worker
+_airspace = None
+_segment_index = None
+_flights: Dict[str, object] = {}
+
+def _init_worker(airspace, traffic) -> None:
+    global _airspace, _segment_index, _flights
+    flights = deserialize_flights(traffic)
+    _airspace = airspace
+    _segment_index = SegmentIndex(flights)
+    _flights = {flight.callsign: flight for flight in flights}
+
+def _suggest_chunk(tasks: Sequence[RerouteTask]) -> List[RerouteResult]:
+    return suggest_routes(_airspace, _segment_index, _flights, tasks)
+
+def suggest_routes(airspace, segment_index: SegmentIndex, flights: Dict[str, object],
+                   tasks: Sequence[RerouteTask]) -> List[RerouteResult]:
+    """
+    find_alternative_route for each (callsign, start, goal), in order, with
+    the segments each suggestion depends on and the seconds it took.
+    """
+    results = []
+    for callsign, start, goal in tasks:
+        flight = flights[callsign]
+        started = time.perf_counter()
+        reservations = ReservationTable(segment_index, flight)
+        suggestion = find_alternative_route(airspace, flight, start, goal, None,
+                                            segment_index=segment_index,
+                                            reservations=reservations)
+        elapsed = time.perf_counter() - started
+        if suggestion:
+            results.append((callsign, suggestion.path, suggestion.flight_level,
+                            suggestion.level_change, list(reservations.segments), elapsed))
+        else:
+            results.append((callsign, None, None, 0, list(reservations.segments), elapsed))
+    return results
+
+def pool_size(tasks: int, workers: Optional[int] = None) -> int:
+    """Worker processes suggest_routes_parallel uses for tasks searches, 1 if run here"""
+    workers = workers or DEFAULT_WORKERS
+    if workers <= 1 or tasks <= 1:
+        return min(tasks, 1)
+    return min(workers, -(-tasks // max(tasks // (workers * CHUNKS_PER_WORKER), 1)))
+
+def suggest_routes_parallel(airspace, flights: List, tasks: Sequence[RerouteTask],
+                            workers: Optional[int] = None) -> List[RerouteResult]:
+    """
+    suggest_routes over a process pool. Every worker starts from the same
+    snapshot: the airspace with its compiled graph and landmarks already
+    built, and the traffic, from which it builds its own segment index.
+    Tasks are split into contiguous chunks, so results keep their order.
+    With one worker (or one task) the searches run in this process.
+    """
+    workers = workers or DEFAULT_WORKERS
+    if pool_size(len(tasks), workers) <= 1:
+        return suggest_routes(airspace, SegmentIndex(flights),
+                              {flight.callsign: flight for flight in flights}, tasks)
+
+    # Build once here rather than in every worker
+    airspace.compiled()
+    airspace.landmarks()
+    traffic = [serialize_flight(flight) for flight in flights]
+
+    chunk = max(len(tasks) // (workers * CHUNKS_PER_WORKER), 1)
+    chunks = [tasks[i:i + chunk] for i in range(0, len(tasks), chunk)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                             initargs=(airspace, traffic)) as pool:
+        futures = [pool.submit(_suggest_chunk, tasks) for tasks in chunks]
+        return [result for future in futures for result in future.result()]
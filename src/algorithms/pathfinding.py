@@ -1,218 +1,374 @@
 import heapq
-from math import radians, sin, cos, sqrt, atan2
-from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import sys
+import os
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points in nautical miles using Haversine formula"""
-    R = 3440.065  # Earth's radius in nautical miles
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
-
-def calculate_turn_angle(path, current, next_wp):
-    """Calculate turn angle between segments"""
-    if len(path) < 2:
-        return 0
-    
-    # Get coordinates for the three points
-    prev_wp = path[-2]
-    current_wp = current
-    next_wp = next_wp
-    
-    # Calculate bearings
-    def bearing(lat1, lon1, lat2, lon2):
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlon = lon2 - lon1
-        y = sin(dlon) * cos(lat2)
-        x = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(dlon)
-        return atan2(y, x)
-    
-    # Calculate turn angle
-    bearing1 = bearing(prev_wp.latitude, prev_wp.longitude, current_wp.latitude, current_wp.longitude)
-    bearing2 = bearing(current_wp.latitude, current_wp.longitude, next_wp.latitude, next_wp.longitude)
-    
-    angle = abs(bearing2 - bearing1)
-    if angle > 3.14159:  # pi
-        angle = 2 * 3.14159 - angle
-    
-    return angle * 180 / 3.14159  # Convert to degrees
-
-def a_star_search(airspace, start, goal, flight, other_flights, constraints=None):
-    """
-    Enhanced A* search with conflict avoidance and aviation constraints
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.segment_index import SegmentIndex
+from algorithms.reservation_table import ReservationTable
+from models.geo import arc_distance, haversine
+from models.landmarks import INF
+from models.timebase import to_epoch
+
+# Sharpest turn, in degrees, the searches allow by default (MAX_TURN_ANGLE=90
+# enforces the 90 degree limit). 180 lets every turn through, as the searches
+# always have: their 90 degree check raised on every call until the CSR port,
+# and enforcing it leaves filed flights (e.g. VJC1126, PIC772) without any route
+MAX_TURN_ANGLE = float(os.environ.get("MAX_TURN_ANGLE", 180))
+FL_STEP = 10  # 1000 ft
+LEVEL_CHANGE_COST_NM = 25  # Route length a 1000 ft level change is worth
+
+@dataclass
+class SearchStats:
+    """Work done by the searches it is passed to (counts add up across calls)"""
+    searches: int = 0
+    expansions: int = 0   # Nodes taken off the open set and expanded
+    pushes: int = 0       # Open set insertions
+    max_open: int = 0     # Largest open set size seen
+    max_tracked: int = 0  # Largest number of nodes holding a parent pointer
+    fallbacks: int = 0    # Bidirectional searches finished by the unidirectional one
+
+    def record(self, open_size: int, tracked: int) -> None:
+        self.expansions += 1
+        if open_size > self.max_open:
+            self.max_open = open_size
+        if tracked > self.max_tracked:
+            self.max_tracked = tracked
+
+def reconstruct_path(came_from: Dict[int, Optional[int]], state: int, names: List[str],
+                     node_of: Optional[Callable[[int], int]] = None) -> List[str]:
+    """
+    Waypoint names from the search start to state, following parent pointers.
+    States are waypoint ids, optionally offset by a multiple of the waypoint
+    count, unless node_of maps them to waypoint ids.
+    """
+    n = len(names)
+    path = []
+    while state is not None:
+        path.append(names[node_of(state) if node_of else state % n])
+        state = came_from[state]
+    path.reverse()
+    return path
+
+def departure_time(flight, start) -> Optional[float]:
+    """Epoch seconds at which flight leaves start: its ETA there, else its entry time"""
+    if flight is None or not flight.speed:
+        return None
+    # Its first pass over start, should the route come back over it
+    t = next((t for wp, t in zip(flight.route, flight.position_times) if wp == start and t),
+             None) or flight.entry_time
+    return to_epoch(t) if t else None
+
+def corridor_filter(graph, start: int, goal: int, corridor_nm: float) -> Callable[[int], bool]:
+    """Function node -> whether it lies within corridor_nm of the great circle from start to goal"""
+    lat, lon = graph.lat, graph.lon
+    inside: Dict[int, bool] = {}
+
+    def within(node: int) -> bool:
+        result = inside.get(node)
+        if result is None:
+            result = arc_distance(lat[node], lon[node], lat[start], lon[start],
+                                  lat[goal], lon[goal]) <= corridor_nm
+            inside[node] = result
+        return result
+
+    return within
+
+def a_star_search(airspace, start, goal, flight, other_flights, constraints=None,
+                  segment_index=None, stats: Optional[SearchStats] = None,
+                  use_landmarks: bool = True, corridor_nm: Optional[float] = None,
+                  max_turn: float = MAX_TURN_ANGLE):
+    """
+    Enhanced A* search with conflict avoidance and aviation constraints.
+    Runs on airspace.compiled(); segment_index (e.g. the API's shared one)
+    replaces scanning other_flights. A segment is unsafe if another flight
+    within 1000 ft is on it around the time this flight would be, i.e. its
+    departure from start plus distance flown / speed. stats, if given,
+    accumulates the work done. use_landmarks=False forces the plain
+    haversine heuristic even when the airspace has landmarks. corridor_nm,
+    if given, skips waypoints farther than that off the great circle from
+    start to goal. No turn along the path is sharper than max_turn degrees.
+    """
+    if segment_index is None:
+        segment_index = SegmentIndex(other_flights)
+    found = level_search(airspace, start, goal, flight, {flight.flight_level: 0},
+                         segment_index, stats, use_landmarks, corridor_nm=corridor_nm,
+                         max_turn=max_turn)
+    return found[0] if found else None
+
+def level_search(airspace, start, goal, flight, level_costs: Dict[int, float],
+                 segment_index, stats: Optional[SearchStats] = None,
+                 use_landmarks: bool = True,
+                 reservations: Optional[ReservationTable] = None,
+                 corridor_nm: Optional[float] = None,
+                 max_turn: float = MAX_TURN_ANGLE) -> Optional[Tuple[List[str], int]]:
+    """
+    A* over (waypoint, flight level) states. level_costs maps each flight
+    level the flight may fly the whole reroute at to the extra cost, in NM,
+    of choosing it. Every level is a start state, so one pass finds the
+    cheapest combination of route and level. Returns (path, flight level).
+    flight itself is never modified.
+
+    The heuristic is the haversine distance to goal, raised to the ALT
+    bound when airspace.landmarks() is available. Turns sharper than
+    max_turn degrees are skipped, looked up in airspace.turns(). Below 180
+    degrees a waypoint's way on depends on the edge it was reached by, so
+    states are (edge reached by, flight level) instead.
+    reservations, if given, is the flight's ReservationTable over
+    segment_index to reuse. corridor_nm bounds the search as in
+    a_star_search.
     """
     if start not in airspace.waypoints or goal not in airspace.waypoints:
         return None
-    
-    open_set = []
-    heapq.heappush(open_set, (0, 0, [start]))  # (f_score, g_score, path)
-    closed = set()
+    if reservations is None:
+        reservations = ReservationTable(segment_index, flight)
+    depart = departure_time(flight, start)
+    seconds_per_nm = 3600 / flight.speed if depart is not None else None
+
+    graph = airspace.compiled()
+    names, lat, lon = graph.names, graph.lat, graph.lon
+    offsets, targets, distances = graph.offsets, graph.targets, graph.distances
+    start_id, goal_id = graph.ids[start], graph.ids[goal]
+    goal_lat, goal_lon = lat[goal_id], lon[goal_id]
+    n = len(graph)
+    limited = max_turn < 180
+    if limited:
+        turns = airspace.turns(max_turn)
+        turn_base, turn_ok = turns.base, turns.allowed
+    # Keys within a layer: waypoint ids, or with the limit n + edge reached by
+    width = n + len(targets) if limited else n
+
+    def node_of(state):
+        key = state % width
+        return key if key < n else targets[key - n]
+    levels = list(level_costs)
+    layer_costs = [level_costs[level] for level in levels]
+
+    landmarks = airspace.landmarks() if use_landmarks else None
+    alt = landmarks.heuristic(goal_id) if landmarks else None
+    h_cache = {}
+    inside = corridor_filter(graph, start_id, goal_id, corridor_nm) if corridor_nm is not None else None
+
+    def heuristic(node):
+        h = h_cache.get(node)
+        if h is None:
+            h = haversine(lat[node], lon[node], goal_lat, goal_lon)
+            if alt is not None:
+                h = max(h, alt(node))
+            h_cache[node] = h
+        return h
+
+    # State id = layer * width + key; start states are keyed by start's id
+    open_set = []  # (f_score, g_score, state)
+    closed = bytearray(width * len(levels))
+    g_score = {}
     came_from = {}
-    g_score = {start: 0}
-    f_score = {start: haversine(
-        airspace.waypoints[start].latitude, airspace.waypoints[start].longitude,
-        airspace.waypoints[goal].latitude, airspace.waypoints[goal].longitude
-    )}
-    
+    h = heuristic(start_id)
+    if h == INF:
+        return None
+    for layer, cost in enumerate(layer_costs):
+        state = layer * width + start_id
+        g_score[state] = cost
+        came_from[state] = None
+        heapq.heappush(open_set, (cost + h, cost, state))
+    if stats is not None:
+        stats.searches += 1
+        stats.pushes += len(levels)
+
     while open_set:
-        current_f, current_g, path = heapq.heappop(open_set)
-        current = path[-1]
-        
-        if current == goal:
-            return path
-        
-        if current in closed:
+        current_f, current_g, state = heapq.heappop(open_set)
+        layer, key = divmod(state, width)
+        current = key if key < n else targets[key - n]
+
+        if current == goal_id:
+            return reconstruct_path(came_from, state, names, node_of), levels[layer]
+
+        if closed[state]:
             continue
-        
-        closed.add(current)
-        
-        # Get current waypoint object
-        current_wp = airspace.waypoints[current]
-        
+
+        closed[state] = 1
+        if stats is not None:
+            stats.record(len(open_set) + 1, len(came_from))
+        turns_from = turn_base[key - n] if key >= n else None
+        level = levels[layer]
+        flown = current_g - layer_costs[layer]
+        base = layer * width
+
         # Check all possible routes from current waypoint
-        for neighbor, distance, airway, direction in airspace.routes.get(current, []):
-            if neighbor in closed:
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            next_state = base + (n + edge if limited else neighbor)
+            if closed[next_state]:
                 continue
-            
-            # Check route direction constraint
-            if direction == "ONEWAY":
-                # For one-way routes, check if we're going in the right direction
-                # This is a simplified check - in real implementation you'd check airway direction
-                pass
-            
+
             # Check turn angle constraint - only if we have enough waypoints
-            if len(path) >= 2:
-                neighbor_wp = airspace.waypoints[neighbor]
-                try:
-                    turn_angle = calculate_turn_angle(path, current_wp, neighbor_wp)
-                    if turn_angle > 90:  # Maximum turn angle of 90 degrees
-                        continue
-                except Exception as e:
-                    # If turn angle calculation fails, continue anyway
-                    print(f"Warning: Turn angle calculation failed: {e}")
-                    pass
-            
-            # Check conflict avoidance
-            if not is_safe_route(airspace, current, neighbor, flight, other_flights):
+            if turns_from is not None and not turn_ok[turns_from + edge]:
                 continue
-            
-            tentative_g = g_score[current] + distance
-            
-            if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                came_from[neighbor] = current
-                g_score[neighbor] = tentative_g
-                
-                # Calculate heuristic (distance to goal)
-                neighbor_wp = airspace.waypoints[neighbor]
-                goal_wp = airspace.waypoints[goal]
-                h = haversine(
-                    neighbor_wp.latitude, neighbor_wp.longitude,
-                    goal_wp.latitude, goal_wp.longitude
-                )
-                
-                f_score[neighbor] = tentative_g + h
-                
+            if inside is not None and not inside(neighbor):
+                continue
+
+            # Check conflict avoidance at the time we would fly the segment
+            if depart is None:
+                enter = exit = None
+            else:
+                enter = depart + flown * seconds_per_nm
+                exit = depart + (flown + distances[edge]) * seconds_per_nm
+            if not reservations.is_free(names[current], names[neighbor], level, enter, exit):
+                continue
+
+            tentative_g = current_g + distances[edge]
+            if next_state not in g_score or tentative_g < g_score[next_state]:
+                # Calculate heuristic (distance to goal); INF means goal is unreachable
+                h = heuristic(neighbor)
+                if h == INF:
+                    continue
+                came_from[next_state] = state
+                g_score[next_state] = tentative_g
+
                 # Add to open set
-                new_path = path + [neighbor]
-                heapq.heappush(open_set, (f_score[neighbor], tentative_g, new_path))
-    
+                heapq.heappush(open_set, (tentative_g + h, tentative_g, next_state))
+                if stats is not None:
+                    stats.pushes += 1
+
     return None
 
-def is_safe_route(airspace, from_wp, to_wp, flight, other_flights):
+@dataclass
+class RouteSuggestion:
+    path: List[str]
+    flight_level: int       # Level to fly the new path at
+    level_change: int = 0   # flight_level minus the flight's current level
+
+def candidate_levels(flight_level: int, max_steps: int, change_cost: float) -> Dict[int, float]:
     """
-    Check if a route segment is safe from conflicts
+    Flight levels within max_steps FL_STEP steps of flight_level, mapped to
+    change_cost per step; the current level comes first and costs nothing
+    """
+    levels = {flight_level: 0}
+    for step in range(1, max_steps + 1):
+        for level in (flight_level + step * FL_STEP, flight_level - step * FL_STEP):
+            if level > 0:
+                levels[level] = step * change_cost
+    return levels
+
+def find_alternative_route(airspace, flight, start, goal, other_flights, max_attempts=5,
+                           segment_index=None, stats: Optional[SearchStats] = None,
+                           level_change_cost: float = LEVEL_CHANGE_COST_NM,
+                           reservations: Optional[ReservationTable] = None,
+                           max_turn: float = MAX_TURN_ANGLE) -> Optional[RouteSuggestion]:
     """
-    # Check if any other flight is using this route segment at the same time
-    for other_flight in other_flights:
-        # Check if other flight uses this route segment
-        for i in range(len(other_flight.route) - 1):
-            if (other_flight.route[i] == from_wp and other_flight.route[i+1] == to_wp) or \
-               (other_flight.route[i] == to_wp and other_flight.route[i+1] == from_wp):
-                
-                # Check if flight levels are too close
-                fl_diff = abs(flight.flight_level - other_flight.flight_level) * 100
-                if fl_diff < 1000:  # Less than 1000ft separation
-                    return False
-    
-    return True
+    Best conflict-free reroute, possibly at another flight level: one search
+    over (waypoint, level) for levels up to max_attempts steps of 1000 ft
+    away, each step costing level_change_cost NM. Falls back to the path with
+    the fewest conflicts at the current level, found without the turn
+    limit. flight is not modified.
+    Both searches share reservations, created if not given, so afterwards
+    its segments are all the traffic the suggestion depends on.
+    """
+    if segment_index is None:
+        segment_index = SegmentIndex(other_flights)
+    if reservations is None:
+        reservations = ReservationTable(segment_index, flight)
+
+    # Strategy 1: joint route and level search with conflict avoidance
+    levels = candidate_levels(flight.flight_level, max_attempts, level_change_cost)
+    found = level_search(airspace, start, goal, flight, levels, segment_index, stats,
+                         reservations=reservations, max_turn=max_turn)
+    if found:
+        path, level = found
+        return RouteSuggestion(path, level, level - flight.flight_level)
+
+    # Strategy 2: Find path with minimal conflicts
+    path = find_minimal_conflict_path(airspace, start, goal, flight, other_flights,
+                                      segment_index=segment_index, stats=stats,
+                                      reservations=reservations)
+    return RouteSuggestion(path, flight.flight_level) if path else None
 
-def find_alternative_path(airspace, flight, start, goal, other_flights, max_attempts=5):
+def find_alternative_path(airspace, flight, start, goal, other_flights, max_attempts=5,
+                          segment_index=None, stats: Optional[SearchStats] = None):
     """
     Find alternative path with multiple attempts and different strategies
+    (the path of find_alternative_route)
     """
-    # Strategy 1: Standard A* with conflict avoidance
-    path = a_star_search(airspace, start, goal, flight, other_flights)
-    if path:
-        return path
-    
-    # Strategy 2: Relaxed constraints (allow higher flight levels)
-    original_fl = flight.flight_level
-    for attempt in range(max_attempts):
-        # Try different flight levels
-        flight.flight_level = original_fl + (attempt + 1) * 1000  # Increase by 1000ft each attempt
-        path = a_star_search(airspace, start, goal, flight, other_flights)
-        if path:
-            flight.flight_level = original_fl  # Restore original
-            return path
-    
-    flight.flight_level = original_fl  # Restore original
-    
-    # Strategy 3: Find path with minimal conflicts
-    return find_minimal_conflict_path(airspace, start, goal, flight, other_flights)
-
-def find_minimal_conflict_path(airspace, start, goal, flight, other_flights):
-    """
-    Find path with minimal conflicts when no conflict-free path exists
-    """
-    # This is a simplified implementation
-    # In a real system, you'd implement more sophisticated conflict resolution
-    
-    # Try to find a path that minimizes the number of conflicts
+    suggestion = find_alternative_route(airspace, flight, start, goal, other_flights,
+                                        max_attempts, segment_index, stats)
+    return suggestion.path if suggestion else None
+
+def find_minimal_conflict_path(airspace, start, goal, flight, other_flights, segment_index=None,
+                               stats: Optional[SearchStats] = None,
+                               reservations: Optional[ReservationTable] = None):
+    """
+    Find path with minimal conflicts when no conflict-free path exists:
+    Dijkstra on (conflicts, distance), compared lexicographically. Conflicts
+    are counted at the time the flight would be on each segment.
+    """
+    if reservations is None:
+        if segment_index is None:
+            segment_index = SegmentIndex(other_flights)
+        reservations = ReservationTable(segment_index, flight)
+    depart = departure_time(flight, start)
+    seconds_per_nm = 3600 / flight.speed if depart is not None else None
+
+    graph = airspace.compiled()
+    if start not in graph.ids or goal not in graph.ids:
+        return None
+    names, offsets, targets, distances = graph.names, graph.offsets, graph.targets, graph.distances
+    start_id, goal_id = graph.ids[start], graph.ids[goal]
+
     open_set = []
-    heapq.heappush(open_set, (0, 0, [start]))  # (conflicts, distance, path)
-    closed = set()
-    
+    heapq.heappush(open_set, (0, 0, start_id))  # (conflicts, distance, node)
+    closed = bytearray(len(graph))
+    best = {start_id: (0, 0)}
+    came_from = {start_id: None}
+    if stats is not None:
+        stats.searches += 1
+        stats.pushes += 1
+
     while open_set:
-        conflicts, distance, path = heapq.heappop(open_set)
-        current = path[-1]
-        
-        if current == goal:
-            return path
-        
-        if current in closed:
+        conflicts, distance, current = heapq.heappop(open_set)
+
+        if current == goal_id:
+            return reconstruct_path(came_from, current, names)
+
+        if closed[current]:
             continue
-        
-        closed.add(current)
-        
-        for neighbor, dist, airway, direction in airspace.routes.get(current, []):
-            if neighbor in closed:
+
+        closed[current] = 1
+        if stats is not None:
+            stats.record(len(open_set) + 1, len(came_from))
+
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            if closed[neighbor]:
                 continue
-            
+
             # Count conflicts on this segment
-            segment_conflicts = count_segment_conflicts(current, neighbor, flight, other_flights)
-            
-            new_path = path + [neighbor]
-            new_conflicts = conflicts + segment_conflicts
-            new_distance = distance + dist
-            
-            heapq.heappush(open_set, (new_conflicts, new_distance, new_path))
-    
+            new_distance = distance + distances[edge]
+            if depart is None:
+                enter = exit = None
+            else:
+                enter = depart + distance * seconds_per_nm
+                exit = depart + new_distance * seconds_per_nm
+            segment_conflicts = count_segment_conflicts(names[current], names[neighbor], flight,
+                                                        reservations, enter, exit)
+            cost = (conflicts + segment_conflicts, new_distance)
+            if neighbor not in best or cost < best[neighbor]:
+                best[neighbor] = cost
+                came_from[neighbor] = current
+                heapq.heappush(open_set, (cost[0], cost[1], neighbor))
+                if stats is not None:
+                    stats.pushes += 1
+
     return None
 
-def count_segment_conflicts(from_wp, to_wp, flight, other_flights):
+def count_segment_conflicts(from_wp, to_wp, flight, reservations, enter=None, exit=None):
     """
-    Count number of conflicts on a route segment
+    Count number of conflicts on a route segment.
+    reservations: ReservationTable for flight (a SegmentIndex is wrapped in one);
+    enter/exit: epoch seconds flight would be on the segment, None for any time
     """
-    conflicts = 0
-    for other_flight in other_flights:
-        for i in range(len(other_flight.route) - 1):
-            if (other_flight.route[i] == from_wp and other_flight.route[i+1] == to_wp) or \
-               (other_flight.route[i] == to_wp and other_flight.route[i+1] == from_wp):
-                fl_diff = abs(flight.flight_level - other_flight.flight_level) * 100
-                if fl_diff < 1000:
-                    conflicts += 1
-    return conflicts
+    if isinstance(reservations, SegmentIndex):
+        reservations = ReservationTable(reservations, flight)
+    return reservations.conflicts(from_wp, to_wp, flight.flight_level, enter, exit)
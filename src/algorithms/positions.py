@@ -0,0 +1,86 @@
+from typing import Dict, List, Union
+from datetime import datetime
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.flight_table import FlightTable
+from models.timebase import to_epoch
+
+def flight_positions(flights: Union[FlightTable, List], airspace, t: datetime) -> Dict[str, np.ndarray]:
+    """
+    Position at time t of every flight airborne then, i.e. between its first
+    and last ETA, as columns: flight (index in flights), callsign, lat, lon,
+    flight_level and heading (course of the leg being flown, degrees true,
+    NaN for a flight with a single timed waypoint).
+
+    All flights are placed in one pass: a binary search run on every
+    flight's ETAs at once finds the leg it is on, and the position is
+    interpolated linearly in latitude and longitude along it, as the CPA
+    detection does. Waypoints without an ETA or unknown to the airspace are
+    passed over, the leg running between the timed waypoints around them.
+    """
+    table = flights if isinstance(flights, FlightTable) else FlightTable(flights)
+    rows = table.rows
+    offsets = table.route_offsets
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+
+    waypoints = [airspace.waypoints.get(name) for name in table.names]
+    name_lat = np.array([wp.latitude if wp else np.nan for wp in waypoints], dtype=np.float64)
+    name_lon = np.array([wp.longitude if wp else np.nan for wp in waypoints], dtype=np.float64)
+    wp = table.route_ids[index]
+    eta, lat, lon = table.etas[index], name_lat[wp], name_lon[wp]
+    timed = ~np.isnan(eta) & ~np.isnan(lat)
+    owner, eta, lat, lon = owner[timed], eta[timed], lat[timed], lon[timed]
+
+    # Timed waypoints of flight f are first[f]:first[f] + size[f] of eta, lat and lon
+    size = np.bincount(owner, minlength=len(rows))
+    first = np.cumsum(size) - size
+    when = to_epoch(t)
+    airborne = (size > 0)
+    airborne[airborne] = (eta[first[airborne]] <= when) & (when <= eta[(first + size - 1)[airborne]])
+    flight = np.flatnonzero(airborne)
+    lo, hi = first[flight], first[flight] + size[flight]
+
+    # Vectorised binary search: lo ends at the first waypoint with an ETA after t
+    while True:
+        searching = lo < hi
+        if not searching.any():
+            break
+        mid = (lo + hi) // 2
+        later = np.zeros(len(mid), dtype=bool)
+        later[searching] = eta[mid[searching]] > when
+        lo = np.where(searching & ~later, mid + 1, lo)
+        hi = np.where(searching & later, mid, hi)
+
+    # Leg i -> j being flown; a flight at its last waypoint ends its last leg
+    j = np.minimum(lo, first[flight] + size[flight] - 1)
+    i = np.maximum(j - 1, first[flight])
+    span = eta[j] - eta[i]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.where(span > 0, (when - eta[i]) / span, 1.0)
+    dlon = (lon[j] - lon[i] + 180.0) % 360.0 - 180.0
+    position_lon = (lon[i] + dlon * frac + 180.0) % 360.0 - 180.0
+
+    lat1, lat2, dlon_r = np.radians(lat[i]), np.radians(lat[j]), np.radians(dlon)
+    heading = np.degrees(np.arctan2(
+        np.sin(dlon_r) * np.cos(lat2),
+        np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon_r))) % 360.0
+    heading[i == j] = np.nan
+
+    row = rows[flight]
+    callsigns = table.callsigns
+    return {
+        'flight': flight,
+        'callsign': np.array([callsigns[c] for c in table.callsign[row].tolist()], dtype=object),
+        'lat': lat[i] + (lat[j] - lat[i]) * frac,
+        'lon': position_lon,
+        'flight_level': table.flight_level[row],
+        'heading': heading,
+    }
@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.conflict_detection import SEPARATION_BUFFER, VERTICAL_SEPARATION_FT
+from algorithms.segment_index import SegmentIndex, segment_key
+from models.timebase import to_epoch
+
+class ReservationTable:
+    """
+    Segment occupancies by every flight except one, for the searches routing
+    that flight.
+
+    Each undirected segment maps to its (enter, exit, flight_level)
+    reservations in epoch seconds, sorted by enter and built from the
+    SegmentIndex on first lookup. With the longest reservation known, the
+    ones that can overlap a time window are found by bisection in O(log k).
+    Reservations without ETAs block the segment at any time.
+    """
+
+    def __init__(self, segment_index: SegmentIndex, flight,
+                 buffer: timedelta = SEPARATION_BUFFER):
+        self.segment_index = segment_index
+        self.callsign = flight.callsign if flight is not None else None
+        self.buffer = buffer.total_seconds()
+        # segment -> (enter times, reservations, longest duration, untimed levels)
+        self._segments: Dict[Tuple[str, str], tuple] = {}
+
+    def _table(self, from_wp: str, to_wp: str) -> tuple:
+        key = segment_key(from_wp, to_wp)
+        table = self._segments.get(key)
+        if table is None:
+            timed: List[Tuple[float, float, int]] = []
+            untimed: List[int] = []
+            for occ in self.segment_index.occupancies(from_wp, to_wp):
+                if occ.callsign == self.callsign:
+                    continue
+                if occ.timed:
+                    timed.append((to_epoch(occ.lo), to_epoch(occ.hi), occ.flight_level))
+                else:
+                    untimed.append(occ.flight_level)
+            timed.sort()
+            longest = max((exit - enter for enter, exit, _ in timed), default=0.0)
+            table = ([enter for enter, _, _ in timed], timed, longest, untimed)
+            self._segments[key] = table
+        return table
+
+    def conflicts(self, from_wp: str, to_wp: str, flight_level: int,
+                  enter: Optional[float] = None, exit: Optional[float] = None,
+                  limit: Optional[int] = None) -> int:
+        """
+        Reservations of the segment within 1000 ft of flight_level that come
+        within the buffer of [enter, exit] (epoch seconds); without a time
+        window every reservation at that level counts. Stops at limit.
+        """
+        starts, timed, longest, untimed = self._table(from_wp, to_wp)
+        count = 0
+        for level in untimed:
+            if abs(flight_level - level) * 100 < VERTICAL_SEPARATION_FT:
+                count += 1
+                if count == limit:
+                    return count
+
+        if enter is None:
+            lo, hi, after = 0, len(timed), None
+        else:
+            after = enter - self.buffer
+            lo = bisect_left(starts, after - longest)
+            hi = bisect_left(starts, exit + self.buffer)
+        for idx in range(lo, hi):
+            _, end, level = timed[idx]
+            if after is not None and end <= after:
+                continue
+            if abs(flight_level - level) * 100 < VERTICAL_SEPARATION_FT:
+                count += 1
+                if count == limit:
+                    return count
+        return count
+
+    @property
+    def segments(self):
+        """Segments looked up so far: the only traffic a search's answers depended on"""
+        return self._segments.keys()
+
+    def is_free(self, from_wp: str, to_wp: str, flight_level: int,
+                enter: Optional[float] = None, exit: Optional[float] = None) -> bool:
+        return self.conflicts(from_wp, to_wp, flight_level, enter, exit, limit=1) == 0
+
+    def blocked_at_any_time(self, from_wp: str, to_wp: str, flight_level: int) -> bool:
+        """Whether an untimed reservation within 1000 ft blocks the segment whenever it is flown"""
+        _, _, _, untimed = self._table(from_wp, to_wp)
+        return any(abs(flight_level - level) * 100 < VERTICAL_SEPARATION_FT for level in untimed)
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set, Tuple
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.segment_index import segment_key
+
+Segment = Tuple[str, str]
+
+class RouteCache:
+    """
+    LRU cache of reroute suggestions with traffic-aware invalidation.
+
+    Each entry records the segments whose traffic its search looked at.
+    A flight added, amended or removed evicts only the entries depending on
+    a segment of its route; every other entry stays valid, since its search
+    would see the same traffic. Airspace changes must call clear().
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Tuple[Segment, ...]]]' = OrderedDict()
+        self._dependents: Dict[Segment, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0       # Least recently used entries dropped for capacity
+        self.invalidations = 0   # Entries dropped because traffic on their segments changed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def lookup(self, key: Hashable) -> Any:
+        """Result cached for key, which must be in the cache; counts a hit"""
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][0]
+
+    def put(self, key: Hashable, result: Any, segments: Iterable[Segment]) -> None:
+        """Cache result, computed after a miss, as depending on traffic on segments; counts the miss"""
+        self.misses += 1
+        if self.capacity <= 0:
+            return
+        if key in self._entries:
+            self._drop(key)
+        segments = tuple(segments)
+        self._entries[key] = (result, segments)
+        for segment in segments:
+            self._dependents.setdefault(segment, set()).add(key)
+        while len(self._entries) > self.capacity:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, key: Hashable, compute: Callable[[], Tuple[Any, Iterable[Segment]]]) -> Any:
+        """Cached result for key; compute() returns (result, segments it depends on)"""
+        if key in self._entries:
+            return self.lookup(key)
+        result, segments = compute()
+        self.put(key, result, segments)
+        return result
+
+    def _drop(self, key: Hashable) -> None:
+        _, segments = self._entries.pop(key)
+        for segment in segments:
+            keys = self._dependents.get(segment)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[segment]
+
+    def invalidate_flight(self, flight) -> int:
+        """Evict the entries depending on any segment of flight's route; returns how many"""
+        route = flight.route
+        stale = set()
+        for idx in range(len(route) - 1):
+            stale.update(self._dependents.get(segment_key(route[idx], route[idx + 1]), ()))
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._dependents.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
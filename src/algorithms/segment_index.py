@@ -0,0 +1,124 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+
+class SegmentOccupancy(NamedTuple):
+    """One flight flying one leg of its route"""
+    flight: object
+    position: int                # Index of the leg in flight.route
+    from_wp: str
+    to_wp: str
+    enter: Optional[datetime]    # ETA at from_wp
+    exit: Optional[datetime]     # ETA at to_wp
+    flight_level: int
+    callsign: str                # flight.callsign, for readers in other threads
+
+    @property
+    def direction(self) -> int:
+        """+1 when flown in segment_key order, -1 when flown against it"""
+        return 1 if self.from_wp <= self.to_wp else -1
+
+    @property
+    def timed(self) -> bool:
+        return self.enter is not None and self.exit is not None
+
+    @property
+    def lo(self) -> datetime:
+        return min(self.enter, self.exit)
+
+    @property
+    def hi(self) -> datetime:
+        return max(self.enter, self.exit)
+
+def segment_key(wp1: str, wp2: str) -> Tuple[str, str]:
+    """Undirected airway segment key"""
+    return (wp1, wp2) if wp1 <= wp2 else (wp2, wp1)
+
+class SegmentIndex:
+    """
+    Undirected airway segment -> flights using it.
+
+    Occupancies of a segment are kept sorted by the time the flight is on it
+    (legs without a timeline sort last), so time-based checks can stop early.
+    Shared by conflict detection and pathfinding; add/remove flights as
+    traffic changes. snapshot() gives searches running in other threads a
+    copy that later changes do not reach.
+    """
+
+    def __init__(self, flights: Iterable = ()):
+        self._segments: Dict[Tuple[str, str], List[SegmentOccupancy]] = {}
+        self._dirty = set()
+        self._shared = set()  # Segments whose list a snapshot also holds: copy before changing
+        for flight in flights:
+            self.add_flight(flight)
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def add_flight(self, flight) -> None:
+        times = flight.position_times
+        route = flight.route
+        callsign = flight.callsign
+        for idx in range(len(route) - 1):
+            from_wp, to_wp = route[idx], route[idx + 1]
+            key = segment_key(from_wp, to_wp)
+            occupancy = SegmentOccupancy(flight, idx, from_wp, to_wp, times[idx],
+                                         times[idx + 1], flight.flight_level, callsign)
+            occupancies = self._segments.get(key)
+            if occupancies is None:
+                self._segments[key] = [occupancy]
+            elif key in self._shared:
+                self._segments[key] = occupancies + [occupancy]
+                self._shared.discard(key)
+            else:
+                occupancies.append(occupancy)
+            self._dirty.add(key)
+
+    def remove_flight(self, flight) -> None:
+        route = flight.route
+        for idx in range(len(route) - 1):
+            key = segment_key(route[idx], route[idx + 1])
+            occupancies = self._segments.get(key)
+            if occupancies is None:
+                continue
+            remaining = [occ for occ in occupancies if occ.flight is not flight]
+            self._shared.discard(key)
+            if remaining:
+                self._segments[key] = remaining
+            else:
+                del self._segments[key]
+                self._dirty.discard(key)
+
+    def occupancies(self, wp1: str, wp2: str) -> List[SegmentOccupancy]:
+        """Occupancies of the segment wp1-wp2 in either direction, sorted by time"""
+        key = segment_key(wp1, wp2)
+        if key in self._dirty:
+            self._sort(key)
+        return self._segments.get(key, [])
+
+    def segments(self) -> Iterable[Tuple[Tuple[str, str], List[SegmentOccupancy]]]:
+        for key in list(self._dirty):
+            self._sort(key)
+        return self._segments.items()
+
+    def snapshot(self) -> 'SegmentIndex':
+        """
+        Copy of the index as it is now, in O(segments): the occupancy lists
+        are shared until this index changes one of them
+        """
+        for key in list(self._dirty):
+            self._sort(key)
+        copy = SegmentIndex()
+        copy._segments = dict(self._segments)
+        copy._shared = set(self._segments)
+        self._shared = set(self._segments)
+        return copy
+
+    def _sort(self, key) -> None:
+        occupancies = self._segments[key]
+        order = lambda occ: (not occ.timed, occ.lo if occ.timed else None)
+        if key in self._shared:
+            self._segments[key] = sorted(occupancies, key=order)
+            self._shared.discard(key)
+        else:
+            occupancies.sort(key=order)
+        self._dirty.discard(key)
@@ -1,15 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+import functools
 import json
+import math
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
+import time
+import numpy as np
 
 from models.waypoint import Waypoint, WaypointType
 from models.flight import Flight
+from models.flight_table import FlightTable, FlightView
 from models.airspace import Airspace
-from algorithms.conflict_detection import detect_conflicts
-from algorithms.pathfinding import a_star_search
+from models.geo import haversine
+from models.timebase import naive_utc
+from algorithms.conflict_detection import detect_conflicts, iter_conflicts
+from algorithms.cpa_detection import detect_conflicts_cpa
+from algorithms.positions import flight_positions
+from algorithms.parallel_detection import detect_conflicts_parallel
+from algorithms.conflict_store import ConflictStore, conflict_matches
+from algorithms.conflict_cache import ConflictCache
+from algorithms.pathfinding import (
+    RouteSuggestion, a_star_search, departure_time, find_alternative_route
+)
+from algorithms.reservation_table import ReservationTable
+from algorithms.route_cache import RouteCache
+from algorithms.k_shortest import k_shortest_routes, route_option
+from algorithms.parallel_reroute import pool_size, suggest_routes_parallel
+from algorithms.parallel_detection import DEFAULT_WORKERS
 
 app = FastAPI(title="Air Traffic Control API", version="1.0.0")
 
@@ -24,20 +45,17 @@ app.add_middleware(
 
 # Global state
 airspace = Airspace()
-flights: List[Flight] = []
+flights = FlightTable()
+conflict_store = ConflictStore(airspace=airspace)
+conflict_cache = ConflictCache()  # Bump on every traffic/airspace change
+route_cache = RouteCache(int(os.environ.get("ROUTE_CACHE_SIZE", 1024)))
+MAX_ROUTE_OPTIONS = 10  # Largest k accepted by /suggest_path
+MAX_NEAREST_WAYPOINTS = 1000  # Largest k accepted by /waypoints/nearest
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in nautical miles using Haversine formula"""
-    from math import radians, sin, cos, sqrt, atan2
-    
-    R = 3440.065  # Earth's radius in nautical miles
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
+# ALT landmarks for A* (ALT_LANDMARKS=0 disables them), cached next to the airspace data
+ALT_LANDMARKS = int(os.environ.get("ALT_LANDMARKS", 8))
+LANDMARK_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'data', 'cache')
 
 def load_data():
     """Load initial data from JSON files"""
@@ -84,6 +102,8 @@ def load_data():
             
             if source in waypoints and target in waypoints:
                 airspace.add_route(source, target, distance, "AUTO", "BIDIRECTIONAL")
+        airspace.enable_landmarks(ALT_LANDMARKS, LANDMARK_CACHE_DIR)
+        airspace.landmarks()
         
         # Load flight plans
         flight_file = os.path.join(project_root, 'data', 'flight_plans.json')
@@ -92,6 +112,7 @@ def load_data():
         
         base_time = datetime.strptime("2025-01-19", "%Y-%m-%d")
         
+        plans = []
         for plan in flight_plans:
             try:
                 # Parse route - handle both formats
@@ -113,34 +134,18 @@ def load_data():
                 hours, minutes = map(int, time_str.split(':'))
                 entry_time = base_time + timedelta(hours=hours, minutes=minutes)
                 
-                flight = Flight(
-                    callsign=plan['Tên tàu bay'],
-                    route=route,
-                    speed=float(plan['Tốc độ (Kts)']),
-                    flight_level=fl,
-                    entry_time=entry_time
-                )
-                
-                # Calculate estimated times using actual distances
-                distances = {}
-                for i in range(len(route)-1):
-                    wp1, wp2 = route[i], route[i+1]
-                    if wp1 in airspace.waypoints and wp2 in airspace.waypoints:
-                        wp1_data = airspace.waypoints[wp1]
-                        wp2_data = airspace.waypoints[wp2]
-                        dist = calculate_distance(
-                            wp1_data.latitude, wp1_data.longitude,
-                            wp2_data.latitude, wp2_data.longitude
-                        )
-                        distances[(wp1, wp2)] = dist
-                
-                flight.calculate_estimated_times(distances)
-                flights.append(flight)
+                plans.append((plan['Tên tàu bay'], route, float(plan['Tốc độ (Kts)']), fl, entry_time))
                 
             except Exception as e:
                 print(f"Error loading flight {plan.get('Tên tàu bay', 'Unknown')}: {e}")
                 continue
+        
+        # Timelines of all plans at once, from the waypoint coordinates
+        flights.extend_plans(plans, airspace)
                 
+        conflict_store.reset(flights, airspace)
+        conflict_cache.bump()
+        route_cache.clear()
         print(f"Loaded {len(airspace.waypoints)} waypoints and {len(flights)} flights from real database")
         
     except Exception as e:
@@ -168,7 +173,7 @@ def create_default_data():
         wp2_name = default_waypoints[i+1][0]
         wp1 = airspace.waypoints[wp1_name]
         wp2 = airspace.waypoints[wp2_name]
-        distance = calculate_distance(wp1.latitude, wp1.longitude, wp2.latitude, wp2.longitude)
+        distance = haversine(wp1.latitude, wp1.longitude, wp2.latitude, wp2.longitude)
         airspace.add_route(wp1_name, wp2_name, distance, "DEFAULT", "BIDIRECTIONAL")
 
 @app.on_event("startup")
@@ -211,90 +216,351 @@ async def get_airspace():
         "routes": routes
     }
 
-@app.get("/flights")
-async def get_flights():
-    """Get all flights with their routes and timelines"""
+def serialize_nearby(found) -> List[dict]:
     return [
         {
-            "callsign": f.callsign,
-            "route": f.route,
-            "speed": f.speed,
-            "flight_level": f.flight_level,
-            "entry_time": f.entry_time.isoformat(),
-            "timeline": {
-                wp: time.isoformat() 
-                for wp, time in f.estimated_times.items()
-            }
+            "name": wp.name,
+            "latitude": wp.latitude,
+            "longitude": wp.longitude,
+            "type": wp.type.value,
+            "distance_nm": round(distance, 3)
         }
-        for f in flights
+        for wp, distance in found
     ]
 
+def check_position(lat: float, lon: float) -> None:
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise HTTPException(status_code=400, detail="'lat' must be within ±90 and 'lon' within ±180")
+
+@app.get("/waypoints/nearest")
+async def nearest_waypoints(lat: float, lon: float, k: int = 1):
+    """The k waypoints nearest to (lat, lon), nearest first, with their distances in NM"""
+    check_position(lat, lon)
+    if not 1 <= k <= MAX_NEAREST_WAYPOINTS:
+        raise HTTPException(status_code=400,
+                            detail=f"'k' must be an integer from 1 to {MAX_NEAREST_WAYPOINTS}")
+    return serialize_nearby(airspace.nearest(lat, lon, k))
+
+@app.get("/waypoints/within")
+async def waypoints_within(lat: float, lon: float, radius_nm: float):
+    """Waypoints within radius_nm of (lat, lon), nearest first, with their distances in NM"""
+    check_position(lat, lon)
+    if not 0 <= radius_nm < math.inf:
+        raise HTTPException(status_code=400, detail="'radius_nm' must be a finite, non-negative number")
+    return serialize_nearby(airspace.within(lat, lon, radius_nm))
+
+@app.get("/flights")
+async def get_flights():
+    """Get all flights with their routes and timelines"""
+    return flights.records()
+
+def build_flight(flight_data: dict) -> FlightView:
+    """Build a flight with its timeline from a POST/PUT /flights payload, for adding to flights"""
+    route = flight_data['route']
+    if isinstance(route, str):
+        route = [wp.strip() for wp in route.split(',')]
+    
+    entry_time = datetime.fromisoformat(flight_data['entry_time'])
+    
+    # Validate route waypoints exist
+    for wp in route:
+        if wp not in airspace.waypoints:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Waypoint {wp} not found in airspace"
+            )
+    
+    plan = (flight_data['callsign'], route, float(flight_data['speed']),
+            int(flight_data['flight_level']), entry_time)
+    return FlightTable().extend_plans([plan], airspace)[0]
+
+def find_flight(callsign: str) -> FlightView:
+    flight = flights.find(callsign)
+    if not flight:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    return flight
+
 @app.post("/flights")
 async def add_flight(flight_data: dict):
     """Add a new flight to the system"""
     try:
-        route = flight_data['route']
-        if isinstance(route, str):
-            route = [wp.strip() for wp in route.split(',')]
-        
-        entry_time = datetime.fromisoformat(flight_data['entry_time'])
-        
-        # Validate route waypoints exist
-        for wp in route:
-            if wp not in airspace.waypoints:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Waypoint {wp} not found in airspace"
-                )
-        
-        new_flight = Flight(
-            callsign=flight_data['callsign'],
-            route=route,
-            speed=float(flight_data['speed']),
-            flight_level=int(flight_data['flight_level']),
-            entry_time=entry_time
-        )
-        
-        # Calculate distances for timeline
-        distances = {}
-        for i in range(len(route)-1):
-            wp1, wp2 = route[i], route[i+1]
-            wp1_data = airspace.waypoints[wp1]
-            wp2_data = airspace.waypoints[wp2]
-            dist = calculate_distance(
-                wp1_data.latitude, wp1_data.longitude,
-                wp2_data.latitude, wp2_data.longitude
-            )
-            distances[(wp1, wp2)] = dist
-            
-        new_flight.calculate_estimated_times(distances)
-        flights.append(new_flight)
+        new_flight = flights.append(build_flight(flight_data))
+        conflict_store.add_flight(new_flight)
+        conflict_cache.bump()
+        route_cache.invalidate_flight(new_flight)
         return {"message": "Flight added successfully", "callsign": new_flight.callsign}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.put("/flights/{callsign}")
+async def amend_flight(callsign: str, flight_data: dict):
+    """Amend an existing flight plan"""
+    old_flight = find_flight(callsign)
+    try:
+        new_flight = build_flight({**flight_data, 'callsign': callsign})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    new_flight = flights.replace(old_flight, new_flight)
+    conflict_store.update_flight(old_flight, new_flight)
+    conflict_cache.bump()
+    route_cache.invalidate_flight(old_flight)
+    route_cache.invalidate_flight(new_flight)
+    return {"message": "Flight amended successfully", "callsign": callsign}
+
+@app.delete("/flights/{callsign}")
+async def remove_flight(callsign: str):
+    """Remove a flight from the system"""
+    flight = find_flight(callsign)
+    flights.remove(flight)
+    conflict_store.remove_flight(flight)
+    conflict_cache.bump()
+    route_cache.invalidate_flight(flight)
+    return {"message": "Flight removed successfully", "callsign": callsign}
+
+@app.get("/positions")
+async def get_positions(t: datetime, format: str = "json"):
+    """
+    Position of every flight airborne at time t, interpolated along the leg
+    it is flying, with its flight level and heading (null when unknown).
+    format: "json" (one object per flight), "columnar" (one array per field)
+    or "binary": little-endian uint32 count n, then n float32 latitudes, n
+    float32 longitudes, n float32 headings (NaN when unknown), n int16
+    flight levels and the n callsigns in UTF-8, separated by newlines
+    """
+    if format not in ("json", "columnar", "binary"):
+        raise HTTPException(status_code=400, detail=f"Unknown positions format: {format}")
+    t = naive_utc(t)  # Flight times are naive UTC
+    positions = flight_positions(flights, airspace, t)
+    callsigns = positions['callsign'].tolist()
+
+    if format == "binary":
+        body = b"".join((
+            np.array([len(callsigns)], dtype='<u4').tobytes(),
+            positions['lat'].astype('<f4').tobytes(),
+            positions['lon'].astype('<f4').tobytes(),
+            positions['heading'].astype('<f4').tobytes(),
+            positions['flight_level'].astype('<i2').tobytes(),
+            "\n".join(callsigns).encode('utf-8'),
+        ))
+        return Response(content=body, media_type="application/octet-stream")
+
+    lat = np.round(positions['lat'], 5).tolist()
+    lon = np.round(positions['lon'], 5).tolist()
+    heading = [None if h != h else h for h in np.round(positions['heading'], 1).tolist()]
+    flight_level = positions['flight_level'].tolist()
+    if format == "columnar":
+        return {"time": t.isoformat(), "callsign": callsigns, "lat": lat, "lon": lon,
+                "flight_level": flight_level, "heading": heading}
+    return [
+        {"callsign": c, "lat": la, "lon": lo, "flight_level": fl, "heading": h}
+        for c, la, lo, fl, h in zip(callsigns, lat, lon, flight_level, heading)
+    ]
+
+def serialize_conflict(conflict: dict) -> dict:
+    """Copy of a conflict with datetime objects converted to ISO format strings"""
+    conflict = dict(conflict)
+    if 'start_time' in conflict:
+        conflict['start_time'] = conflict['start_time'].isoformat()
+    if 'end_time' in conflict:
+        conflict['end_time'] = conflict['end_time'].isoformat()
+    if 'time' in conflict:
+        conflict['time'] = conflict['time'].isoformat()
+    return conflict
+
+def parse_conflict_times(conflict: dict) -> dict:
+    """Inverse of serialize_conflict for the time fields"""
+    conflict = dict(conflict)
+    for field in ('start_time', 'end_time', 'time'):
+        if field in conflict:
+            conflict[field] = datetime.fromisoformat(conflict[field])
+    return conflict
+
 @app.get("/conflicts")
-async def get_conflicts():
-    """Detect all conflicts between current flights"""
-    conflicts = detect_conflicts(flights)
-    
-    # Convert datetime objects to ISO format strings
-    for conflict in conflicts:
-        if 'start_time' in conflict:
-            conflict['start_time'] = conflict['start_time'].isoformat()
-        if 'end_time' in conflict:
-            conflict['end_time'] = conflict['end_time'].isoformat()
-        if 'time' in conflict:
-            conflict['time'] = conflict['time'].isoformat()
-    
-    return conflicts
+async def get_conflicts(mode: str = "incremental", workers: Optional[int] = None,
+                        start: Optional[datetime] = Query(None, alias="from"),
+                        end: Optional[datetime] = Query(None, alias="to"),
+                        callsign: Optional[str] = None, min_fl: Optional[int] = None,
+                        max_fl: Optional[int] = None):
+    """
+    Get all conflicts between current flights.
+    mode: "incremental" (maintained store), "sweep" or "all_pairs" (full
+    recompute), "parallel" (sweep sharded over `workers` processes),
+    "cpa" (4D closest point of approach)
+    from/to, callsign, min_fl/max_fl: only conflicts overlapping the time
+    range, involving the flight or with a flight in the level range
+    """
+    # Flight times are naive UTC
+    start, end = (naive_utc(t) if t is not None else None for t in (start, end))
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    filters = (start, end, callsign, min_fl, max_fl)
+    if any(f is not None for f in filters):
+        if mode == "incremental":
+            # The store's interval tree only visits flights near the time range
+            return [serialize_conflict(conflict) for conflict in conflict_store.query(*filters)]
+        result = await cached_conflicts(mode, workers)
+        return [conflict for conflict in result["conflicts"]
+                if conflict_matches(parse_conflict_times(conflict), *filters)]
+    result = await cached_conflicts(mode, workers)
+    return result["conflicts"]
+
+@app.get("/conflicts/stream")
+async def stream_conflicts(format: str = "ndjson", limit: Optional[int] = None):
+    """
+    Stream conflicts as they are found, as NDJSON (one conflict per line) or
+    Server-Sent Events. Closing the connection or reaching `limit` stops detection.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"Unknown stream format: {format}")
+    snapshot, current_airspace = flights.snapshot(), airspace
+
+    def generate():
+        count = 0
+        for conflict in iter_conflicts(snapshot, current_airspace):
+            if limit is not None and count >= limit:
+                break
+            data = json.dumps(serialize_conflict(conflict), ensure_ascii=False)
+            if format == "sse":
+                yield f"event: conflict\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
+            count += 1
+        if format == "sse":
+            yield f"event: end\ndata: {json.dumps({'count': count})}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+async def cached_conflicts(mode: str = "incremental", workers: Optional[int] = None) -> dict:
+    """
+    Serialized conflicts for the current traffic version and mode, shared by
+    concurrent /conflicts requests. Full recomputes run off the event loop.
+    """
+    if mode == "incremental":
+        # Snapshot on the event loop: the store keeps changing under add_flight
+        snapshot = conflict_store.conflicts()
+        detect = lambda: snapshot
+    elif mode == "cpa":
+        detect = functools.partial(detect_conflicts_cpa, flights.snapshot(), airspace)
+    elif mode == "parallel":
+        detect = functools.partial(detect_conflicts_parallel, flights.snapshot(), airspace,
+                                   workers=workers)
+    elif mode in ("sweep", "all_pairs"):
+        detect = functools.partial(detect_conflicts, flights.snapshot(), mode=mode,
+                                   airspace=airspace)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown conflict mode: {mode}")
+
+    def compute():
+        return {"conflicts": [serialize_conflict(conflict) for conflict in detect()]}
+
+    # Parallel results don't depend on the worker count
+    return await conflict_cache.get(mode, compute)
+
+def route_key(flight: Flight, start: str, goal: str) -> tuple:
+    """Everything a reroute depends on besides traffic, which route_cache tracks per segment"""
+    return (airspace.version, flight.callsign, start, goal, flight.flight_level,
+            flight.speed, departure_time(flight, start))
+
+async def cached_route(flight: Flight, start: str, goal: str):
+    """
+    find_alternative_route against the shared segment index, through
+    route_cache. A miss searches off the event loop, over a snapshot of the
+    index taken when the request arrived and a copy of flight (flights may
+    compact and move its view meanwhile).
+    """
+    key = route_key(flight, start, goal)
+    if key in route_cache:
+        return route_cache.lookup(key)
+
+    segment_index = conflict_store.segment_index.snapshot()
+    flight = FlightTable([flight])[0]
+    def search():
+        reservations = ReservationTable(segment_index, flight)
+        suggestion = find_alternative_route(airspace, flight, start, goal, None,
+                                            segment_index=segment_index,
+                                            reservations=reservations)
+        return suggestion, reservations.segments
+
+    traffic_version = conflict_cache.version
+    loop = asyncio.get_event_loop()
+    suggestion, segments = await loop.run_in_executor(None, search)
+    # Cache only if no flight changed while the search ran
+    if traffic_version == conflict_cache.version:
+        route_cache.put(key, suggestion, segments)
+    return suggestion
+
+def path_distance(path: List[str]) -> float:
+    total_distance = 0
+    for i in range(len(path) - 1):
+        wp1_data = airspace.waypoints[path[i]]
+        wp2_data = airspace.waypoints[path[i + 1]]
+        total_distance += haversine(
+            wp1_data.latitude, wp1_data.longitude,
+            wp2_data.latitude, wp2_data.longitude
+        )
+    return total_distance
+
+def serialize_suggestion(path: List[str], flight_level: int, level_change: int,
+                         start: str, goal: str) -> dict:
+    return {
+        "new_path": path,
+        "total_distance_nm": round(path_distance(path), 2),
+        "waypoints_count": len(path),
+        "flight_level": flight_level,
+        "level_change": level_change,
+        "original_start": start,
+        "original_goal": goal
+    }
+
+async def cached_options(flight: Flight, start: str, goal: str, k: int, suggestion) -> list:
+    """
+    The suggestion scored as a route option, then up to k - 1 other
+    k_shortest_routes options, through route_cache. Searches run off the
+    event loop over a snapshot of the shared segment index and a copy of
+    flight, like cached_route.
+    """
+    key = route_key(flight, start, goal) + ("options", k, tuple(suggestion.path),
+                                            suggestion.flight_level)
+    if key in route_cache:
+        return route_cache.lookup(key)
+
+    segment_index = conflict_store.segment_index.snapshot()
+    flight = FlightTable([flight])[0]
+    def search():
+        reservations = ReservationTable(segment_index, flight)
+        primary = route_option(airspace, flight, suggestion.path, suggestion.flight_level,
+                               reservations)
+        others = [option for option in k_shortest_routes(airspace, flight, start, goal, k,
+                                                         reservations=reservations)
+                  if option.path != primary.path]
+        return [(primary, suggestion.flight_level)] + [
+            (option, flight.flight_level) for option in others[:k - 1]], reservations.segments
+
+    traffic_version = conflict_cache.version
+    loop = asyncio.get_event_loop()
+    options, segments = await loop.run_in_executor(None, search)
+    # Cache only if no flight changed while the searches ran
+    if traffic_version == conflict_cache.version:
+        route_cache.put(key, options, segments)
+    return options
 
 @app.post("/suggest_path")
 async def suggest_path(data: dict):
-    """Find an alternative path for a flight to avoid conflicts"""
+    """
+    Find an alternative path for a flight to avoid conflicts.
+    k (optional): also return up to k route options: the suggested path
+    first (possibly at another level), then the other loopless routes at
+    the flight's level, fewest conflicts first, then shortest.
+    """
     callsign = data['callsign']
     start = data['start']
     goal = data['goal']
+    k = data.get('k')
+    if k is not None and (isinstance(k, bool) or not isinstance(k, int)
+                          or not 1 <= k <= MAX_ROUTE_OPTIONS):
+        raise HTTPException(status_code=400,
+                            detail=f"'k' must be an integer from 1 to {MAX_ROUTE_OPTIONS}")
     
     # Validate waypoints
     if start not in airspace.waypoints or goal not in airspace.waypoints:
@@ -304,39 +570,116 @@ async def suggest_path(data: dict):
         )
     
     # Find the flight
-    flight = next((f for f in flights if f.callsign == callsign), None)
-    if not flight:
-        raise HTTPException(status_code=404, detail="Flight not found")
-    
-    # Get other flights for conflict checking
-    other_flights = [f for f in flights if f.callsign != callsign]
-    
-    # Try to find alternative path using enhanced A* search
-    from algorithms.pathfinding import find_alternative_path
+    flight = find_flight(callsign)
     
-    new_path = find_alternative_path(airspace, flight, start, goal, other_flights)
+    # Try to find alternative path (and flight level) using enhanced A* search
+    suggestion = await cached_route(flight, start, goal)
     
-    if not new_path:
+    if not suggestion:
         raise HTTPException(status_code=404, detail="No alternative path found")
-    
-    # Calculate total distance of the new path
-    total_distance = 0
-    for i in range(len(new_path) - 1):
-        wp1, wp2 = new_path[i], new_path[i+1]
-        wp1_data = airspace.waypoints[wp1]
-        wp2_data = airspace.waypoints[wp2]
-        dist = calculate_distance(
-            wp1_data.latitude, wp1_data.longitude,
-            wp2_data.latitude, wp2_data.longitude
-        )
-        total_distance += dist
-    
+    result = serialize_suggestion(suggestion.path, suggestion.flight_level,
+                                  suggestion.level_change, start, goal)
+    if k is not None:
+        options = await cached_options(flight, start, goal, k, suggestion)
+        result["options"] = [{
+            "path": option.path,
+            "total_distance_nm": round(path_distance(option.path), 2),
+            "waypoints_count": len(option.path),
+            "flight_level": level,
+            "conflicts": option.conflicts,
+            "max_turn_deg": round(option.max_turn_deg, 1)
+        } for option, level in options]
+    return result
+
+def batch_result(callsign: str, suggestion, start: str, goal: str, cached: bool,
+                 elapsed: float) -> dict:
+    result = {"callsign": callsign, "cached": cached, "elapsed_ms": round(elapsed * 1000, 3)}
+    if suggestion:
+        result.update(serialize_suggestion(suggestion.path, suggestion.flight_level,
+                                           suggestion.level_change, start, goal))
+    else:
+        result["error"] = "No alternative path found"
+    return result
+
+@app.post("/suggest_paths")
+async def suggest_paths(data: dict):
+    """
+    Find alternative paths for many flights in one request.
+    callsigns: list of callsigns or {"callsign", "start", "goal"} objects
+    (start/goal default to the ends of the flight's route); omitted or
+    "conflicted" means every flight currently in conflict.
+    workers: process pool size (default CONFLICT_WORKERS / CPU count)
+    Searches missing from the route cache run on a process pool over a
+    snapshot of the airspace and traffic; each result has its own timing.
+    """
+    requested = data.get('callsigns', "conflicted")
+    if requested == "conflicted":
+        requested = sorted({conflict[key] for conflict in conflict_store.conflicts()
+                            for key in ('flight1', 'flight2')})
+    if not isinstance(requested, list):
+        raise HTTPException(status_code=400, detail="'callsigns' must be a list or \"conflicted\"")
+    items = []
+    for item in requested:
+        if isinstance(item, dict):
+            item = (item.get('callsign'), item.get('start'), item.get('goal'))
+        else:
+            item = (item, None, None)
+        if not isinstance(item[0], str) or not all(wp is None or isinstance(wp, str)
+                                                   for wp in item[1:]):
+            raise HTTPException(status_code=400, detail=(
+                "Each 'callsigns' item must be a callsign or an object with a string "
+                "'callsign' and optional string 'start' and 'goal'"))
+        items.append(item)
+    workers = data.get('workers', DEFAULT_WORKERS)
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise HTTPException(status_code=400, detail="'workers' must be a positive integer")
+    started = time.perf_counter()
+
+    by_callsign = {f.callsign: f for f in flights}
+    results: List[Optional[dict]] = []
+    tasks, keys, positions = [], [], []
+    for callsign, start, goal in items:
+        flight = by_callsign.get(callsign)
+        if flight is None:
+            results.append({"callsign": callsign, "error": "Flight not found"})
+            continue
+        if not flight.route and not (start and goal):
+            results.append({"callsign": callsign, "error": "Flight has no route"})
+            continue
+        start = start or flight.route[0]
+        goal = goal or flight.route[-1]
+        if start not in airspace.waypoints or goal not in airspace.waypoints:
+            results.append({"callsign": callsign, "error": "Invalid start or goal waypoint"})
+            continue
+        key = route_key(flight, start, goal)
+        if key in route_cache:
+            results.append(batch_result(callsign, route_cache.lookup(key), start, goal, True, 0.0))
+            continue
+        positions.append(len(results))
+        results.append(None)
+        tasks.append((callsign, start, goal))
+        keys.append(key)
+
+    # Snapshot on the event loop: traffic may change while the pool runs
+    search = functools.partial(suggest_routes_parallel, airspace, flights.snapshot(), tasks,
+                               workers=workers)
+    traffic_version = conflict_cache.version
+    loop = asyncio.get_event_loop()
+    computed = await loop.run_in_executor(None, search) if tasks else []
+
+    for position, key, (callsign, start, goal), found in zip(positions, keys, tasks, computed):
+        _, path, level, level_change, segments, elapsed = found
+        suggestion = RouteSuggestion(path, level, level_change) if path else None
+        # Cache only if no flight changed while the searches ran
+        if traffic_version == conflict_cache.version:
+            route_cache.put(key, suggestion, segments)
+        results[position] = batch_result(callsign, suggestion, start, goal, False, elapsed)
+
     return {
-        "new_path": new_path,
-        "total_distance_nm": round(total_distance, 2),
-        "waypoints_count": len(new_path),
-        "original_start": start,
-        "original_goal": goal
+        "results": results,
+        "searched": len(tasks),
+        "workers": pool_size(len(tasks), workers),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
     }
 
 @app.post("/load_test_data")
@@ -345,7 +688,7 @@ async def load_test_data():
     global flights, airspace
     
     # Clear existing data
-    flights.clear()
+    flights = FlightTable()
     airspace = Airspace()
     
     # Import test functions
@@ -353,8 +696,12 @@ async def load_test_data():
     
     # Create test airspace and flights
     airspace = create_test_airspace()
+    airspace.enable_landmarks(ALT_LANDMARKS)
     test_flights = create_conflict_test_flights()
     flights.extend(test_flights)
+    conflict_store.reset(flights, airspace)
+    conflict_cache.bump()
+    route_cache.clear()
     
     return {
         "message": "Test data loaded successfully",
@@ -365,21 +712,14 @@ async def load_test_data():
 @app.get("/stats")
 async def get_stats():
     """Get system statistics"""
-    conflicts = detect_conflicts(flights)
-    
-    conflict_types = {}
-    for conflict in conflicts:
-        conflict_type = conflict['type']
-        if conflict_type not in conflict_types:
-            conflict_types[conflict_type] = 0
-        conflict_types[conflict_type] += 1
-    
+    # The store keeps its counts up to date: no need to list the conflicts
     return {
         "waypoints_count": len(airspace.waypoints),
         "flights_count": len(flights),
-        "conflicts_count": len(conflicts),
-        "conflict_types": conflict_types,
-        "routes_count": sum(len(routes) for routes in airspace.routes.values())
+        "conflicts_count": len(conflict_store),
+        "conflict_types": conflict_store.type_counts(),
+        "routes_count": sum(len(routes) for routes in airspace.routes.values()),
+        "route_cache": route_cache.stats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark the conflict detection engines on synthetic traffic.
+
+Prints one JSON document with wall time, pairs examined, conflicts found
+and peak memory per engine and traffic size, so runs can be diffed, and
+the memory the flights themselves take as Flight objects and as a
+FlightTable (cpa_table runs the cpa engine on the latter), and the time
+to load the same flight plans into a table with bulk ETA computation.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from algorithms.conflict_detection import candidate_pairs, detect_conflicts
+from algorithms.conflict_store import ConflictStore
+from algorithms.cpa_detection import (
+    build_segment_arrays, candidate_segment_pairs, detect_conflicts_cpa
+)
+from algorithms.parallel_detection import DEFAULT_WORKERS, detect_conflicts_parallel
+from models.airspace import LATERAL_SEPARATION_NM
+from models.flight_table import FlightTable
+from synthetic_traffic import AIRSPACE_FILE, generate_flights, load_airspace
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+ENGINES = ['all_pairs', 'sweep', 'incremental', 'parallel', 'cpa', 'cpa_table']
+MAX_ALL_PAIRS = 1000   # all_pairs is quadratic; larger sizes are skipped
+
+def _flight_pairs(flights, airspace) -> int:
+    return len(candidate_pairs(flights))
+
+def _segment_pairs(flights, airspace) -> int:
+    seg = build_segment_arrays(flights, airspace)
+    return sum(len(i) for i, _ in candidate_segment_pairs(seg, LATERAL_SEPARATION_NM))
+
+def engine_runner(engine: str, workers: int) -> Callable:
+    """Function (flights, airspace) -> number of conflicts found"""
+    if engine == 'all_pairs':
+        return lambda flights, airspace: len(detect_conflicts(flights, 'all_pairs', airspace))
+    if engine == 'sweep':
+        return lambda flights, airspace: len(detect_conflicts(flights, 'sweep', airspace))
+    if engine == 'incremental':
+        return lambda flights, airspace: len(ConflictStore(flights, airspace))
+    if engine == 'parallel':
+        return lambda flights, airspace: len(detect_conflicts_parallel(flights, airspace, workers))
+    if engine in ('cpa', 'cpa_table'):
+        return lambda flights, airspace: len(detect_conflicts_cpa(flights, airspace))
+    raise ValueError(f"Unknown engine: {engine}")
+
+# What "pairs examined" means per engine: flight pairs checked rule by rule,
+# or leg pairs sent to the closest-approach computation for cpa
+PAIR_COUNTERS = {
+    'all_pairs': lambda flights, airspace: len(flights) * (len(flights) - 1) // 2,
+    'sweep': _flight_pairs,
+    'incremental': _flight_pairs,
+    'parallel': _flight_pairs,
+    'cpa': _segment_pairs,
+    'cpa_table': _segment_pairs,
+}
+
+def storage(airspace, size: int, seed: int, hours: float) -> dict:
+    """Bytes the flights keep allocated as a list of Flight objects and as a FlightTable"""
+    def retained(build: Callable):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            kept = build()
+            return kept, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    flights, list_bytes = retained(lambda: generate_flights(airspace, size, seed, hours))
+    plans = [(f.callsign, f.route, f.speed, f.flight_level, f.entry_time) for f in flights]
+    del flights
+    table, table_bytes = retained(lambda: FlightTable(generate_flights(airspace, size, seed, hours)))
+    airspace.edge_lengths()
+    gc.collect()
+    started = time.perf_counter()
+    FlightTable().extend_plans(plans, airspace)
+    load_time = time.perf_counter() - started
+    return {'flights': size, 'list_bytes': list_bytes, 'table_bytes': table_bytes,
+            'table_column_bytes': table.memory_bytes(), 'bulk_load_s': round(load_time, 4)}
+
+def measure(run: Callable, flights, airspace, memory: bool = True) -> dict:
+    """Wall time of one run and, in a second traced run, peak Python heap use"""
+    gc.collect()
+    started = time.perf_counter()
+    conflicts = run(flights, airspace)
+    wall_time = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(flights, airspace)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'wall_time_s': round(wall_time, 4), 'conflicts': conflicts,
+            'peak_memory_bytes': peak}
+
+def run_benchmark(sizes: List[int], engines: List[str], seed: int = 0, hours: float = 24,
+                  workers: int = DEFAULT_WORKERS, max_all_pairs: int = MAX_ALL_PAIRS,
+                  memory: bool = True, airspace_file: str = AIRSPACE_FILE,
+                  log: Optional[Callable[[str], None]] = None) -> Dict:
+    airspace = load_airspace(airspace_file)
+    results, storage_results = [], []
+    for size in sizes:
+        flights = generate_flights(airspace, size, seed, hours)
+        table = FlightTable(flights) if any(e.endswith('_table') for e in engines) else None
+        for engine in engines:
+            if engine == 'all_pairs' and size > max_all_pairs:
+                continue
+            if log:
+                log(f"{engine} @ {size} flights")
+            result = {'engine': engine, 'flights': size}
+            traffic = table if engine.endswith('_table') else flights
+            result.update(measure(engine_runner(engine, workers), traffic, airspace, memory))
+            result['pairs_examined'] = PAIR_COUNTERS[engine](traffic, airspace)
+            results.append(result)
+        if memory:
+            if log:
+                log(f"storage @ {size} flights")
+            storage_results.append(storage(airspace, size, seed, hours))
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'hours': hours,
+            'workers': workers,
+            # tracemalloc only sees this process, not the parallel engine's workers
+            'peak_memory': 'tracemalloc' if memory else None,
+        },
+        'results': results,
+        'storage': storage_results,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hours', type=float, default=24,
+                        help="entry times are spread over this many hours")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--max-all-pairs', type=int, default=MAX_ALL_PAIRS)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the tracemalloc runs (halves the run time)")
+    parser.add_argument('--airspace', default=AIRSPACE_FILE)
+    parser.add_argument('--output', help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        args.sizes, args.engines, args.seed, args.hours, args.workers,
+        args.max_all_pairs, not args.no_memory, args.airspace,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
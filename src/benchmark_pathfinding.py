@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmark the airspace graph representation and pathfinding on synthetic
+airspaces.
+
+Prints one JSON document per run with memory of the name-keyed routes and
+of the compiled CSR graph, compile time, size and build time of the turn
+table, raw expansion speed of both representations, and query latency and
+work (expansions, open set and parent map sizes) of A* and bidirectional
+A*, with the haversine heuristic, within a corridor, with ALT landmarks
+and through synthetic traffic (where bidirectional A* counts how often it
+falls back to A*), and of the k shortest routes. Also measures the memory per
+waypoint of a large airspace loaded from JSON as the API loads one.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import gc
+import heapq
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from algorithms.bidirectional import bidirectional_search
+from algorithms.k_shortest import k_shortest_routes
+from algorithms.pathfinding import MAX_TURN_ANGLE, SearchStats, a_star_search
+from algorithms.segment_index import SegmentIndex
+from models.compiled_graph import CompiledGraph
+from models.flight import Flight
+from synthetic_traffic import (
+    BASE_TIME, airspace_data, airspace_from_data, generate_airspace, generate_flights
+)
+
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_QUERIES = 50
+DEFAULT_LANDMARKS = 16
+DEFAULT_K = 5
+DEFAULT_CORRIDOR_NM = 50
+DEFAULT_TRAFFIC = 2000  # Flights entering over TRAFFIC_HOURS for the runs with traffic
+TRAFFIC_HOURS = 2
+DEFAULT_DATABASE_SIZE = 200000  # Waypoints of a global database
+
+# Flight the searches route: the time and level only matter with traffic
+PROBE = Flight(callsign="BENCH", route=[], speed=450.0, flight_level=330, entry_time=BASE_TIME)
+
+def dijkstra_routes(airspace, start: str) -> int:
+    """Full Dijkstra over the name-keyed routes; returns waypoints settled"""
+    dist = {start: 0}
+    settled = set()
+    heap = [(0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        for neighbor, distance, _, _ in airspace.routes.get(node, ()):
+            nd = d + distance
+            if nd < dist.get(neighbor, float('inf')):
+                dist[neighbor] = nd
+                heapq.heappush(heap, (nd, neighbor))
+    return len(settled)
+
+def dijkstra_compiled(graph, start: int) -> int:
+    """Same search over the compiled CSR arrays"""
+    offsets, targets, distances = graph.offsets, graph.targets, graph.distances
+    dist = [float('inf')] * len(graph)
+    dist[start] = 0
+    settled = bytearray(len(graph))
+    count = 0
+    heap = [(0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        count += 1
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            nd = d + distances[edge]
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                heapq.heappush(heap, (nd, neighbor))
+    return count
+
+def traced(build: Callable):
+    """(result, bytes still allocated, peak bytes, seconds) of build()"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = build()
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak, elapsed
+
+def timed(run: Callable):
+    gc.collect()
+    started = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - started
+
+def benchmark_size(size: int, seed: int, queries: int, landmarks: int = DEFAULT_LANDMARKS,
+                   k: int = DEFAULT_K, corridor_nm: float = DEFAULT_CORRIDOR_NM,
+                   traffic: int = DEFAULT_TRAFFIC) -> Dict:
+    airspace, airspace_bytes, _, _ = traced(lambda: generate_airspace(size, seed))
+    _, compile_time = timed(lambda: CompiledGraph(airspace, airspace.version))
+    graph, graph_bytes, compile_peak, _ = traced(airspace.compiled)
+    turns, turn_time = timed(lambda: airspace.turns(MAX_TURN_ANGLE))
+
+    names = graph.names
+    settled, routes_time = timed(lambda: dijkstra_routes(airspace, names[0]))
+    _, compiled_time = timed(lambda: dijkstra_compiled(graph, 0))
+
+    rnd = random.Random(seed)
+    pairs = [(rnd.choice(names), rnd.choice(names)) for _ in range(queries)]
+    result = {
+        'waypoints': len(graph),
+        'edges': graph.edge_count,
+        'airspace_bytes': airspace_bytes,
+        'compiled_bytes': graph_bytes,
+        'compiled_array_bytes': graph.memory_bytes(),
+        'compile_peak_bytes': compile_peak,
+        'compile_time_s': round(compile_time, 4),
+        'turn_table': {
+            'pairs': len(turns),
+            'build_time_s': round(turn_time, 4),
+            'bytes': turns.memory_bytes(),
+        },
+        'expansions_per_s': {
+            'routes': round(settled / routes_time),
+            'compiled': round(settled / compiled_time),
+        },
+        'astar': astar_queries(airspace, pairs, use_landmarks=False),
+        'bidirectional': astar_queries(airspace, pairs, use_landmarks=False, bidirectional=True),
+    }
+    if corridor_nm:
+        for name, bidirectional in (('astar_corridor', False), ('bidirectional_corridor', True)):
+            result[name] = astar_queries(airspace, pairs, use_landmarks=False,
+                                         bidirectional=bidirectional, corridor_nm=corridor_nm)
+            result[name]['corridor_nm'] = corridor_nm
+    if landmarks:
+        airspace.enable_landmarks(landmarks, seed=seed)
+        table, landmark_time = timed(airspace.landmarks)
+        result['landmarks'] = {
+            'count': len(table),
+            'build_time_s': round(landmark_time, 4),
+            'bytes': table.memory_bytes(),
+        }
+        result['astar_alt'] = astar_queries(airspace, pairs, use_landmarks=True)
+        result['bidirectional_alt'] = astar_queries(airspace, pairs, use_landmarks=True,
+                                                    bidirectional=True)
+    if traffic:
+        index = SegmentIndex(generate_flights(airspace, traffic, seed, TRAFFIC_HOURS))
+        for name, bidirectional in (('astar_traffic', False), ('bidirectional_traffic', True)):
+            result[name] = astar_queries(airspace, pairs, use_landmarks=bool(landmarks),
+                                         bidirectional=bidirectional, segment_index=index)
+            result[name]['flights'] = traffic
+    if k:
+        result['k_shortest'] = k_shortest_queries(airspace, pairs, k)
+    return result
+
+def waypoint_memory(count: int, seed: int) -> Dict:
+    """Memory kept by an airspace of count waypoints after loading it from JSON"""
+    text = json.dumps(airspace_data(generate_airspace(count, seed)))
+    airspace, retained, _, load_time = traced(lambda: airspace_from_data(json.loads(text)))
+    return {
+        'waypoints': count,
+        'routes': sum(len(routes) for routes in airspace.routes.values()),
+        'bytes': retained,
+        'bytes_per_waypoint': round(retained / count, 1),
+        'load_time_s': round(load_time, 4),
+    }
+
+def astar_queries(airspace, pairs, use_landmarks: bool, bidirectional: bool = False,
+                  corridor_nm: Optional[float] = None,
+                  segment_index: Optional[SegmentIndex] = None) -> Dict:
+    """Latency and search work of A* between each (start, goal), with no traffic unless given"""
+    traffic = segment_index if segment_index is not None else SegmentIndex()
+    stats = SearchStats()
+    search = bidirectional_search if bidirectional else a_star_search
+    report = query_report(pairs, stats, lambda start, goal: search(
+        airspace, start, goal, PROBE, [], segment_index=traffic, stats=stats,
+        use_landmarks=use_landmarks, corridor_nm=corridor_nm))
+    if bidirectional:
+        report['fallbacks'] = stats.fallbacks
+    return report
+
+def k_shortest_queries(airspace, pairs, k: int) -> Dict:
+    """Same for the k shortest routes"""
+    no_traffic = SegmentIndex()
+    stats = SearchStats()
+    report = query_report(pairs, stats, lambda start, goal: k_shortest_routes(
+        airspace, PROBE, start, goal, k, segment_index=no_traffic, stats=stats))
+    report['k'] = k
+    report['spur_searches_mean'] = round(stats.searches / len(pairs), 1) if pairs else None
+    return report
+
+def query_report(pairs, stats: SearchStats, search: Callable) -> Dict:
+    latencies, found = [], 0
+    for start, goal in pairs:
+        path, elapsed = timed(lambda: search(start, goal))
+        latencies.append(elapsed * 1000)
+        found += bool(path)
+
+    queries = len(pairs)
+    return {
+        'queries': queries,
+        'found': found,
+        'ms': {
+            'mean': round(statistics.mean(latencies), 3) if latencies else None,
+            'median': round(statistics.median(latencies), 3) if latencies else None,
+            'max': round(max(latencies), 3) if latencies else None,
+        },
+        'expansions_mean': round(stats.expansions / queries, 1) if queries else None,
+        'pushes_mean': round(stats.pushes / queries, 1) if queries else None,
+        'max_open': stats.max_open,
+        'max_tracked': stats.max_tracked,
+    }
+
+def run_benchmark(sizes: List[int], seed: int = 0, queries: int = DEFAULT_QUERIES,
+                  landmarks: int = DEFAULT_LANDMARKS, k: int = DEFAULT_K,
+                  corridor_nm: float = DEFAULT_CORRIDOR_NM,
+                  database_size: int = DEFAULT_DATABASE_SIZE,
+                  traffic: int = DEFAULT_TRAFFIC,
+                  log: Optional[Callable[[str], None]] = None) -> Dict:
+    results = []
+    for size in sizes:
+        if log:
+            log(f"{size} waypoints")
+        results.append(benchmark_size(size, seed, queries, landmarks, k, corridor_nm, traffic))
+    database = None
+    if database_size:
+        if log:
+            log(f"{database_size} waypoint database")
+        database = waypoint_memory(database_size, seed)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+        },
+        'results': results,
+        'waypoint_memory': database,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--queries', type=int, default=DEFAULT_QUERIES)
+    parser.add_argument('--landmarks', type=int, default=DEFAULT_LANDMARKS,
+                        help="ALT landmarks for the second A* run (0 skips it)")
+    parser.add_argument('--k', type=int, default=DEFAULT_K,
+                        help="routes per query for the k-shortest run (0 skips it)")
+    parser.add_argument('--corridor', type=float, default=DEFAULT_CORRIDOR_NM,
+                        help="NM off the great circle for the corridor runs (0 skips them)")
+    parser.add_argument('--database', type=int, default=DEFAULT_DATABASE_SIZE,
+                        help="waypoints of the airspace whose memory is measured (0 skips it)")
+    parser.add_argument('--traffic', type=int, default=DEFAULT_TRAFFIC,
+                        help="flights for the runs with traffic (0 skips them)")
+    parser.add_argument('--output', help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.seed, args.queries, args.landmarks, args.k,
+                           args.corridor, args.database, args.traffic, log=lambda message: print(message, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,178 @@
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from .waypoint import Waypoint
+from .geo import EARTH_RADIUS_NM, NM_PER_DEGREE_LAT, haversine
+from .spatial_index import WaypointGrid
+from .compiled_graph import CompiledGraph
+from .landmarks import LandmarkTable
+from .turn_table import TurnTable
+from .edge_lengths import EdgeLengths
 import math
+import sys
+
+LATERAL_SEPARATION_NM = 10  # Lateral separation minimum between waypoints
+WIDE_QUERY_CELL_NM = 25  # Grid cell size for Airspace.within over more than 50 NM
+HALF_CIRCUMFERENCE_NM = math.pi * EARTH_RADIUS_NM  # No two points are farther apart
 
 class Airspace:
     def __init__(self):
         self.waypoints = {}  # name -> Waypoint
+        self._by_id: List[Waypoint] = []  # Waypoint.id -> Waypoint
         self.routes = {}     # name -> list of (neighbor_name, distance, airway_name, direction)
+        self._grids: Dict[float, WaypointGrid] = {}  # cell_nm -> grid, each built on first use
+        self._near_pairs = None  # name -> {name: distance_nm} within LATERAL_SEPARATION_NM
+        self.version = 0         # Bumped by every change to waypoints or routes
+        self._compiled = None    # CompiledGraph of some version, rebuilt on demand
+        self._landmark_config = None  # (count, cache_dir, seed) when ALT landmarks are enabled
+        self._landmarks = None        # LandmarkTable of some version, rebuilt on demand
+        self._turns = None            # TurnTable of some version, rebuilt on demand
+        self._edge_lengths = None     # EdgeLengths of some version, rebuilt on demand
         
     def add_waypoint(self, waypoint):
+        if waypoint.id >= 0 and not (waypoint.id < len(self._by_id)
+                                     and self._by_id[waypoint.id] is waypoint):
+            raise ValueError(f"Waypoint {waypoint.name} already belongs to another airspace")
+        self.version += 1
+        old = self.waypoints.get(waypoint.name)
+        # Ids follow insertion order, as the compiled graph's do; a replacement keeps the old id
+        if old is None:
+            waypoint.id = len(self._by_id)
+            self._by_id.append(waypoint)
+        else:
+            waypoint.id = old.id
+            self._by_id[old.id] = waypoint
         self.waypoints[waypoint.name] = waypoint
         if waypoint.name not in self.routes:
             self.routes[waypoint.name] = []
+        for grid in self._grids.values():
+            if old is not None:
+                grid.remove(old.name, old.latitude, old.longitude)
+            grid.insert(waypoint.name, waypoint.latitude, waypoint.longitude)
+        if old is not None:
+            self._forget_near_pairs(old.name)
+        self._add_near_pairs(waypoint)
+
+    def waypoint(self, wp_id: int) -> Waypoint:
+        """Waypoint by id (by name it is waypoints[name])"""
+        return self._by_id[wp_id]
 
     def add_route(self, from_wp, to_wp, distance, airway_name, direction="BIDIRECTIONAL"):
         # direction: "BIDIRECTIONAL", "ONEWAY"
+        self.version += 1
+        # Share the waypoints' interned names rather than keep a copy per route
+        from_wp, to_wp = sys.intern(from_wp), sys.intern(to_wp)
         self.routes[from_wp].append((to_wp, distance, airway_name, direction))
         if direction == "BIDIRECTIONAL":
             self.routes[to_wp].append((from_wp, distance, airway_name, direction))
+
+    def compiled(self) -> CompiledGraph:
+        """Integer-indexed CSR snapshot of the graph, recompiled after changes"""
+        if self._compiled is None or self._compiled.version != self.version:
+            self._compiled = CompiledGraph(self, self.version)
+        return self._compiled
+
+    def enable_landmarks(self, count: int, cache_dir: Optional[str] = None, seed: int = 0) -> None:
+        """
+        Let A* use the ALT bound of count landmarks (0 disables it). The table
+        is built on first use and again after the graph changes; with a
+        cache_dir it is stored there as a pickle keyed by the graph fingerprint.
+        """
+        self._landmark_config = (count, cache_dir, seed) if count else None
+        self._landmarks = None
+
+    def landmarks(self) -> Optional[LandmarkTable]:
+        """Landmark table of the current graph, or None when not enabled"""
+        if self._landmark_config is None:
+            return None
+        graph = self.compiled()
+        if self._landmarks is None or self._landmarks.version != graph.version:
+            count, cache_dir, seed = self._landmark_config
+            self._landmarks = LandmarkTable.load_or_build(graph, count, cache_dir, seed)
+        return self._landmarks
+
+    def turns(self, max_turn: float) -> TurnTable:
+        """Edge bearings and turn angles of the current graph, with the turns within max_turn"""
+        graph = self.compiled()
+        turns = self._turns
+        if turns is None or turns.version != graph.version or turns.max_turn != max_turn:
+            self._turns = turns = TurnTable(graph, max_turn)
+        return turns
+
+    def edge_lengths(self) -> EdgeLengths:
+        """Great-circle edge lengths of the current graph, for flight timelines"""
+        graph = self.compiled()
+        if self._edge_lengths is None or self._edge_lengths.version != graph.version:
+            self._edge_lengths = EdgeLengths(graph)
+        return self._edge_lengths
+
+    def spatial_grid(self, cell_nm: float = LATERAL_SEPARATION_NM) -> WaypointGrid:
+        """Grid index over all waypoints, built once per cell size and kept up to date by add_waypoint"""
+        grid = self._grids.get(cell_nm)
+        if grid is None:
+            grid = self._grids[cell_nm] = WaypointGrid(cell_nm)
+            for wp in self.waypoints.values():
+                grid.insert(wp.name, wp.latitude, wp.longitude)
+        return grid
+
+    def within(self, lat: float, lon: float, radius_nm: float) -> List[Tuple[Waypoint, float]]:
+        """Waypoints within radius_nm of (lat, lon) with their distances, nearest first"""
+        # Small cells for small circles; larger ones keep wide queries to fewer cells
+        grid = self.spatial_grid(LATERAL_SEPARATION_NM if radius_nm <= 5 * LATERAL_SEPARATION_NM
+                                 else WIDE_QUERY_CELL_NM)
+        max_dlat = radius_nm / NM_PER_DEGREE_LAT  # Cheap reject: no nearer than the latitude difference
+        found = []
+        # No two points are farther apart than half the circumference
+        for name in grid.candidates(lat, lon, min(radius_nm, HALF_CIRCUMFERENCE_NM)):
+            wp = self.waypoints[name]
+            if abs(wp.latitude - lat) > max_dlat:
+                continue
+            distance = haversine(lat, lon, wp.latitude, wp.longitude)
+            if distance <= radius_nm:
+                found.append((wp, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[Waypoint, float]]:
+        """The k waypoints nearest to (lat, lon) with their distances, nearest first"""
+        # Widen the search until the circle holds k waypoints: none outside it can be nearer
+        radius = LATERAL_SEPARATION_NM
+        while k < len(self.waypoints) and radius < HALF_CIRCUMFERENCE_NM:
+            found = self.within(lat, lon, radius)
+            if len(found) >= k:
+                return found[:k]
+            radius *= 2
+        found = [(wp, haversine(lat, lon, wp.latitude, wp.longitude))
+                 for wp in self.waypoints.values()]
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    def near_waypoint_pairs(self) -> Dict[str, Dict[str, float]]:
+        """
+        Table of every pair of distinct waypoints closer than LATERAL_SEPARATION_NM,
+        as name -> {other_name: distance_nm}. Both directions are stored.
+        """
+        if self._near_pairs is None:
+            self.spatial_grid()
+            self._near_pairs = {}
+            for wp in self.waypoints.values():
+                self._add_near_pairs(wp)
+        return self._near_pairs
+
+    def _add_near_pairs(self, waypoint) -> None:
+        if self._near_pairs is None:
+            return
+        for other_name in self._grids[LATERAL_SEPARATION_NM].candidates(waypoint.latitude, waypoint.longitude,
+                                                LATERAL_SEPARATION_NM):
+            if other_name == waypoint.name:
+                continue
+            other = self.waypoints[other_name]
+            distance = haversine(waypoint.latitude, waypoint.longitude,
+                                 other.latitude, other.longitude)
+            if distance < LATERAL_SEPARATION_NM:
+                self._near_pairs.setdefault(waypoint.name, {})[other_name] = distance
+                self._near_pairs.setdefault(other_name, {})[waypoint.name] = distance
+
+    def _forget_near_pairs(self, name) -> None:
+        if self._near_pairs is None:
+            return
+        for other_name in self._near_pairs.pop(name, {}):
+            self._near_pairs[other_name].pop(name, None)
@@ -0,0 +1,87 @@
+from array import array
+from typing import Dict, List
+
+# Edge direction flags
+BIDIRECTIONAL, ONEWAY = 1, 0
+
+class CompiledGraph:
+    """
+    Frozen integer-indexed snapshot of an Airspace.
+
+    Waypoint names are interned to ids 0..n-1 in waypoint insertion order;
+    coordinates live in contiguous float arrays and adjacency in CSR form:
+    the edges leaving waypoint u are offsets[u]:offsets[u + 1] of sources,
+    targets, distances, airways and directions, in the order the routes
+    were added.
+    The reverse CSR lists, for each waypoint, the edges arriving at it.
+    Edges to waypoints unknown to the airspace are dropped.
+    """
+
+    __slots__ = (
+        'version', 'names', 'ids', 'lat', 'lon',
+        'offsets', 'sources', 'targets', 'distances', 'airways', 'directions', 'airway_names',
+        'rev_offsets', 'rev_sources', 'rev_edges',
+    )
+
+    def __init__(self, airspace, version: int = 0):
+        self.version = version
+        self.names: List[str] = list(airspace.waypoints)
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.lat = array('d', (wp.latitude for wp in airspace.waypoints.values()))
+        self.lon = array('d', (wp.longitude for wp in airspace.waypoints.values()))
+
+        ids = self.ids
+        airway_ids: Dict[str, int] = {}
+        offsets, sources, targets, distances, airways, directions = [0], [], [], [], [], []
+        for source, name in enumerate(self.names):
+            for to_wp, distance, airway, direction in airspace.routes.get(name, ()):
+                target = ids.get(to_wp)
+                if target is None:
+                    continue
+                sources.append(source)
+                targets.append(target)
+                distances.append(distance)
+                airways.append(airway_ids.setdefault(airway, len(airway_ids)))
+                directions.append(BIDIRECTIONAL if direction == "BIDIRECTIONAL" else ONEWAY)
+            offsets.append(len(targets))
+        self.offsets = array('i', offsets)
+        self.sources = array('i', sources)
+        self.targets = array('i', targets)
+        self.distances = array('d', distances)
+        self.airways = array('i', airways)
+        self.directions = array('b', directions)
+        self.airway_names: List[str] = list(airway_ids)
+
+        # Reverse CSR: edges sorted by target, stable so sources stay ascending
+        counts = [0] * (len(self.names) + 1)
+        for target in targets:
+            counts[target + 1] += 1
+        for i in range(len(self.names)):
+            counts[i + 1] += counts[i]
+        by_target = sorted(range(len(targets)), key=targets.__getitem__)
+        self.rev_offsets = array('i', counts)
+        self.rev_edges = array('i', by_target)
+        self.rev_sources = array('i', [sources[edge] for edge in by_target])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def edges(self, node: int) -> range:
+        """Indices of the edges leaving node"""
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def in_edges(self, node: int) -> range:
+        """Positions in rev_sources/rev_edges of the edges arriving at node"""
+        return range(self.rev_offsets[node], self.rev_offsets[node + 1])
+
+    def memory_bytes(self) -> int:
+        """Size of the array buffers (names and the id table are not included)"""
+        return sum(
+            getattr(self, field).buffer_info()[1] * getattr(self, field).itemsize
+            for field in ('lat', 'lon', 'offsets', 'sources', 'targets', 'distances', 'airways',
+                          'directions', 'rev_offsets', 'rev_sources', 'rev_edges')
+        )
@@ -0,0 +1,61 @@
+import numpy as np
+from .geo import EARTH_RADIUS_NM
+
+def haversine_array(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """geo.haversine over arrays of coordinates in degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64))
+                              for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_NM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+class EdgeLengths:
+    """
+    Great-circle length of every edge of a CompiledGraph, computed once per
+    version and looked up by (source id, target id).
+
+    These are the lengths flight timelines are computed with, from the
+    waypoint coordinates, not the distances the routes were filed with.
+    Legs that are not edges of the graph are measured on the fly.
+    """
+
+    __slots__ = ('version', 'lat', 'lon', 'keys', 'lengths')
+
+    def __init__(self, graph):
+        self.version = graph.version
+        self.lat = np.frombuffer(graph.lat, dtype=np.float64)
+        self.lon = np.frombuffer(graph.lon, dtype=np.float64)
+        sources = np.frombuffer(graph.sources, dtype=np.intc).astype(np.int64)
+        targets = np.frombuffer(graph.targets, dtype=np.intc).astype(np.int64)
+        keys = sources * len(graph) + targets
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.lengths = haversine_array(self.lat[sources[order]], self.lon[sources[order]],
+                                       self.lat[targets[order]], self.lon[targets[order]])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Length in NM of each leg sources[i] -> targets[i] (graph ids, -1 gives NaN)"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        result = np.full(len(sources), np.nan)
+        known = (sources >= 0) & (targets >= 0)
+        if not known.any():
+            return result
+        keys = sources[known] * len(self.lat) + targets[known]
+        found = np.zeros(len(keys), dtype=bool)
+        lengths = np.empty(len(keys))
+        if len(self.keys):
+            at = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            found = self.keys[at] == keys
+            lengths[found] = self.lengths[at[found]]
+        missing = ~found
+        if missing.any():
+            s, t = sources[known][missing], targets[known][missing]
+            lengths[missing] = haversine_array(self.lat[s], self.lon[s], self.lat[t], self.lon[t])
+        result[known] = lengths
+        return result
+
+    def memory_bytes(self) -> int:
+        return self.keys.nbytes + self.lengths.nbytes
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 
 @dataclass
@@ -14,11 +14,30 @@ class Flight:
     current_position: tuple = None  # (latitude, longitude)
     current_waypoint_idx: int = 0   # Index of the current/next waypoint in route
     estimated_times: Dict[str, datetime] = None  # Estimated time at each waypoint
+    # (route, estimated_times, ETA at each position) as calculate_estimated_times left them
+    _passes: tuple = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         if self.estimated_times is None:
             self.estimated_times = {}
             
+    @property
+    def position_times(self) -> List[Optional[datetime]]:
+        """
+        ETA at each route position, None where there is none, every pass
+        over a repeated waypoint included, as calculate_estimated_times
+        computed them. Once route or estimated_times is replaced only
+        estimated_times is left, which holds one time per waypoint, the last
+        pass's: a waypoint the route comes back over has it at its last
+        position only.
+        """
+        passes = self._passes
+        if passes is not None and passes[0] is self.route and passes[1] is self.estimated_times:
+            return passes[2]
+        times = self.estimated_times or {}
+        last = {wp: idx for idx, wp in enumerate(self.route)}
+        return [times.get(wp) if last[wp] == idx else None for idx, wp in enumerate(self.route)]
+
     def update_position(self, current_time: datetime) -> None:
         """
         Update the flight's position based on the current time.
@@ -40,14 +59,18 @@ class Flight:
         """
         current_time = self.entry_time
         self.estimated_times[self.route[0]] = current_time
+        positions = [current_time]
         
         for i in range(len(self.route) - 1):
             wp1, wp2 = self.route[i], self.route[i + 1]
             distance = waypoint_distances.get((wp1, wp2)) or waypoint_distances.get((wp2, wp1))
             if distance is None:
+                positions.append(None)
                 continue
                 
             # Calculate time to next waypoint (distance/speed gives hours, multiply by 3600 for seconds)
             travel_time = timedelta(seconds=(distance / self.speed) * 3600)
             current_time += travel_time
             self.estimated_times[wp2] = current_time
+            positions.append(current_time)
+        self._passes = (self.route, self.estimated_times, positions)
@@ -0,0 +1,502 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .timebase import from_epoch, to_epoch
+
+NO_TIME = np.nan  # Epoch seconds of a missing entry time or ETA
+DECODED_ROWS = 4096  # Rows whose route and timeline are kept decoded, least recently used dropped
+COMPACT_ROWS = 1024  # Fewest rows left by amendments and removals worth compacting away
+_REMOVED = -1  # Entry of the list a removal left, until the list is packed
+
+def _grow(column: np.ndarray, size: int) -> np.ndarray:
+    """column with room for at least size entries, doubling its capacity"""
+    if size <= len(column):
+        return column
+    grown = np.empty(max(size, 2 * len(column), 16), dtype=column.dtype)
+    grown[:len(column)] = column
+    return grown
+
+def bulk_etas(offsets: np.ndarray, lengths: np.ndarray, speeds: np.ndarray,
+              entry_times: np.ndarray) -> np.ndarray:
+    """
+    ETA in epoch seconds at every position of many routes at once, as
+    Flight.calculate_estimated_times times one route: route i holds
+    positions offsets[i]:offsets[i + 1], flown at speeds[i] knots from
+    entry_times[i] (epoch seconds). lengths[p] is the length in NM of the
+    leg arriving at position p (ignored at the first position of a route);
+    where it is NaN the position gets no ETA and the clock does not move,
+    as with a leg missing from the distances given to a Flight. Each leg
+    time is rounded to the microsecond like the timedelta a Flight adds.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    starts = offsets[:-1]
+    row = np.repeat(np.arange(len(counts)), counts)
+    first = np.zeros(len(lengths), dtype=bool)
+    first[starts[counts > 0]] = True
+    with np.errstate(divide='ignore', invalid='ignore'):
+        travel = lengths / np.asarray(speeds, dtype=np.float64)[row] * 3600
+    skipped = np.isnan(travel) & ~first
+    micros = np.where(skipped | first, 0, np.round(travel * 1e6)).astype(np.int64)
+    flown = np.zeros(len(micros) + 1, dtype=np.int64)
+    np.cumsum(micros, out=flown[1:])
+    etas = np.asarray(entry_times, dtype=np.float64)[row] + (flown[1:] - np.repeat(flown[starts], counts)) / 1e6
+    etas[skipped] = NO_TIME
+    return etas
+
+class FlightTable:
+    """
+    Columnar store of flights.
+
+    Each flight is a row: callsign id, speed, flight level and entry time
+    (epoch seconds) in arrays. Routes are one flat array of waypoint ids,
+    flight i owning route_ids[route_offsets[i]:route_offsets[i + 1]], with
+    the ETA at each route position (epoch seconds, NaN where the timeline
+    skipped it) alongside in etas. Callsigns and waypoint names are
+    interned in callsigns and names. extend_plans() adds flight plans in
+    bulk, their timelines computed for all of them at once; a route that
+    comes back over a waypoint keeps the ETA of each pass.
+
+    The table behaves as the API's flight list: iterating, indexing and
+    append/remove/replace work on FlightView objects, one per row, which
+    read the arrays on demand. Flights are found, removed and replaced
+    through a callsign -> rows index. Rows are never overwritten, so a view
+    (and any list of views) stays valid after its flight is amended or
+    removed. Once the rows no longer listed are as many as the listed ones
+    (and at least COMPACT_ROWS), the listed rows are gathered into new
+    columns and their views moved along; views of the others move to a
+    table of their own. Views are moved by the thread changing the table,
+    so work in other threads should take snapshot(), which copies the
+    listed rows into a new table, or copies of the flights it needs. The
+    route and timeline of the DECODED_ROWS rows used last are kept decoded,
+    as sweeps visit each flight many times in a short while; they are
+    shared, so callers must not modify them.
+    """
+
+    def __init__(self, flights: Iterable = ()):
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.callsigns: List[str] = []
+        self.callsign_ids: Dict[str, int] = {}
+        self._rows = 0
+        self._legs = 0
+        self._callsign = np.empty(0, dtype=np.int32)
+        self._speed = np.empty(0, dtype=np.float64)
+        self._flight_level = np.empty(0, dtype=np.int32)
+        self._entry_time = np.empty(0, dtype=np.float64)
+        self._route_offsets = np.zeros(1, dtype=np.int64)
+        self._route_ids = np.empty(0, dtype=np.int32)
+        self._etas = np.empty(0, dtype=np.float64)
+        self._views: List['FlightView'] = []
+        self._live: List[int] = []  # Rows of the current flights in list order, or _REMOVED
+        self._positions: Dict[int, int] = {}  # Listed row -> its index in _live
+        self._holes = 0  # _REMOVED entries in _live
+        self._by_callsign: Dict[int, List[int]] = {}  # Callsign id -> listed rows, in list order
+        self._decoded: 'OrderedDict[int, tuple]' = OrderedDict()  # row -> decode(row)
+        self.extend(flights)
+
+    # Columns, trimmed to the rows and legs in use
+    @property
+    def callsign(self) -> np.ndarray:
+        return self._callsign[:self._rows]
+
+    @property
+    def speed(self) -> np.ndarray:
+        return self._speed[:self._rows]
+
+    @property
+    def flight_level(self) -> np.ndarray:
+        return self._flight_level[:self._rows]
+
+    @property
+    def entry_time(self) -> np.ndarray:
+        return self._entry_time[:self._rows]
+
+    @property
+    def route_offsets(self) -> np.ndarray:
+        return self._route_offsets[:self._rows + 1]
+
+    @property
+    def route_ids(self) -> np.ndarray:
+        return self._route_ids[:self._legs]
+
+    @property
+    def etas(self) -> np.ndarray:
+        return self._etas[:self._legs]
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Rows of the current flights, in list order"""
+        self._pack()
+        return np.array(self._live, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator['FlightView']:
+        views = self._views
+        return (views[row] for row in self._live if row != _REMOVED)
+
+    def __getitem__(self, index: int) -> 'FlightView':
+        self._pack()
+        return self._views[self._live[index]]
+
+    def __contains__(self, flight) -> bool:
+        return (isinstance(flight, FlightView) and flight.table is self
+                and flight.row in self._positions)
+
+    def _list(self, row: int, position: int) -> None:
+        """Index row as the flight at position of _live"""
+        self._positions[row] = position
+        rows = self._by_callsign.setdefault(int(self._callsign[row]), [])
+        idx = len(rows)
+        while idx and self._positions[rows[idx - 1]] > position:
+            idx -= 1
+        rows.insert(idx, row)
+
+    def _unlist(self, row: int) -> int:
+        """Drop row from the index; returns its position in _live"""
+        position = self._positions.pop(row)
+        callsign_id = int(self._callsign[row])
+        rows = self._by_callsign[callsign_id]
+        rows.remove(row)
+        if not rows:
+            del self._by_callsign[callsign_id]
+        return position
+
+    def _reindex(self) -> None:
+        """Rebuild the index from _live, which has no holes"""
+        self._positions = {row: idx for idx, row in enumerate(self._live)}
+        self._by_callsign = by_callsign = {}
+        for row, callsign_id in zip(self._live, self._callsign[self._live].tolist()):
+            by_callsign.setdefault(callsign_id, []).append(row)
+
+    def _pack(self) -> None:
+        """Close the holes removals left in _live"""
+        if self._holes:
+            self._live = [row for row in self._live if row != _REMOVED]
+            self._positions = {row: idx for idx, row in enumerate(self._live)}
+            self._holes = 0
+
+    def _intern(self, name: str) -> int:
+        wp_id = self.name_ids.get(name)
+        if wp_id is None:
+            wp_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return wp_id
+
+    def _add_row(self, flight) -> 'FlightView':
+        """Store flight (a Flight or a view of any table) as a new row"""
+        if isinstance(flight, FlightView):  # Its ETAs per position, not per waypoint
+            source = flight.table
+            first = source._route_offsets[flight.row]
+            etas = source._etas[first:source._route_offsets[flight.row + 1]]
+        else:
+            etas = [to_epoch(t) for t in flight.position_times]
+        return self.add_row(flight.callsign, flight.route, flight.speed, flight.flight_level,
+                            flight.entry_time, etas)
+
+    def add_row(self, callsign: str, route: Sequence[str], speed: float, flight_level: int,
+                entry_time: Optional[datetime], etas: Sequence[float]) -> 'FlightView':
+        """
+        Store a flight given by its fields and ETA at each route position
+        (epoch seconds, NaN for none) as a new row, not yet in the list;
+        returns its view
+        """
+        row, start = self._rows, self._legs
+        route = list(route)
+        self._rows += 1
+        self._legs += len(route)
+        for field in ('_callsign', '_speed', '_flight_level', '_entry_time'):
+            setattr(self, field, _grow(getattr(self, field), self._rows))
+        self._route_offsets = _grow(self._route_offsets, self._rows + 1)
+        self._route_ids = _grow(self._route_ids, self._legs)
+        self._etas = _grow(self._etas, self._legs)
+
+        callsign_id = self.callsign_ids.get(callsign)
+        if callsign_id is None:
+            callsign_id = self.callsign_ids[callsign] = len(self.callsigns)
+            self.callsigns.append(callsign)
+        self._callsign[row] = callsign_id
+        self._speed[row] = speed
+        self._flight_level[row] = flight_level
+        self._entry_time[row] = to_epoch(entry_time)
+        self._route_offsets[row + 1] = self._legs
+        self._route_ids[start:self._legs] = [self._intern(wp) for wp in route]
+        self._etas[start:self._legs] = etas
+        view = FlightView(self, row)
+        self._views.append(view)
+        return view
+
+    def append(self, flight) -> 'FlightView':
+        """Add flight at the end; returns its view, which stands for it from then on"""
+        view = self._add_row(flight)
+        self._live.append(view.row)
+        self._list(view.row, len(self._live) - 1)
+        return view
+
+    def extend(self, flights: Iterable) -> None:
+        for flight in flights:
+            self.append(flight)
+
+    def extend_plans(self, plans: Iterable[Tuple[str, Sequence[str], float, int, datetime]],
+                     airspace) -> List['FlightView']:
+        """
+        Append flight plans given as (callsign, route, speed, flight_level,
+        entry_time), with the timelines calculate_estimated_times would give
+        them over the airspace coordinates (legs to waypoints it does not
+        know are skipped), computed in one pass. Returns their views.
+        """
+        plans = list(plans)
+        routes = [plan[1] for plan in plans]
+        callsign_ids = []
+        for callsign, _, _, _, _ in plans:
+            callsign_id = self.callsign_ids.get(callsign)
+            if callsign_id is None:
+                callsign_id = self.callsign_ids[callsign] = len(self.callsigns)
+                self.callsigns.append(callsign)
+            callsign_ids.append(callsign_id)
+        speeds = [plan[2] for plan in plans]
+        levels = [plan[3] for plan in plans]
+        entries = [to_epoch(plan[4]) for plan in plans]
+        ends = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum([len(route) for route in routes], out=ends[1:])
+
+        # Waypoint ids in this table and in the compiled graph, once per distinct name
+        flat = [wp for route in routes for wp in route]
+        graph_ids = airspace.compiled().ids
+        distinct = dict.fromkeys(flat)
+        table_id = {wp: self._intern(wp) for wp in distinct}
+        graph_id = {wp: graph_ids.get(wp, -1) for wp in distinct}
+        name_ids = list(map(table_id.__getitem__, flat))
+        wp_graph = np.fromiter(map(graph_id.__getitem__, flat), dtype=np.int64, count=len(flat))
+
+        count, legs = len(routes), len(flat)
+        leg_lengths = np.full(legs, np.nan)  # Leg arriving at each position; across routes unused
+        if legs > 1:
+            leg_lengths[1:] = airspace.edge_lengths().lookup(wp_graph[:-1], wp_graph[1:])
+        etas = bulk_etas(ends, leg_lengths, np.asarray(speeds, dtype=np.float64),
+                         np.asarray(entries, dtype=np.float64))
+
+        row, start = self._rows, self._legs
+        self._rows += count
+        self._legs += legs
+        for field in ('_callsign', '_speed', '_flight_level', '_entry_time'):
+            setattr(self, field, _grow(getattr(self, field), self._rows))
+        self._route_offsets = _grow(self._route_offsets, self._rows + 1)
+        self._route_ids = _grow(self._route_ids, self._legs)
+        self._etas = _grow(self._etas, self._legs)
+        self._callsign[row:self._rows] = callsign_ids
+        self._speed[row:self._rows] = speeds
+        self._flight_level[row:self._rows] = levels
+        self._entry_time[row:self._rows] = entries
+        self._route_offsets[row + 1:self._rows + 1] = start + ends[1:]
+        self._route_ids[start:self._legs] = name_ids
+        self._etas[start:self._legs] = etas
+
+        views = [FlightView(self, r) for r in range(row, self._rows)]
+        self._views.extend(views)
+        for r in range(row, self._rows):
+            self._live.append(r)
+            self._list(r, len(self._live) - 1)
+        return views
+
+    def remove(self, view: 'FlightView') -> None:
+        if view not in self:
+            raise ValueError(f"{view!r} is not in the table")
+        self._live[self._unlist(view.row)] = _REMOVED
+        self._holes += 1
+        self._compact_if_sparse()
+
+    def replace(self, old: 'FlightView', flight) -> 'FlightView':
+        """Put flight in old's place in the list; returns its view"""
+        if old not in self:
+            raise ValueError(f"{old!r} is not in the table")
+        position = self._unlist(old.row)
+        view = self._add_row(flight)
+        self._live[position] = view.row
+        self._list(view.row, position)
+        self._compact_if_sparse()
+        return view
+
+    def find(self, callsign: str) -> Optional['FlightView']:
+        """First current flight with this callsign"""
+        rows = self._by_callsign.get(self.callsign_ids.get(callsign))
+        return self._views[rows[0]] if rows else None
+
+    def _compact_if_sparse(self) -> None:
+        listed = len(self._positions)
+        if self._rows - listed >= max(COMPACT_ROWS, listed):
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Drop the rows no longer listed: the listed ones are gathered into
+        new columns in list order and their views moved to them; views of
+        the others move to a table holding just their rows
+        """
+        self._pack()
+        live = np.array(self._live, dtype=np.int64)
+        unlisted = np.ones(self._rows, dtype=bool)
+        unlisted[live] = False
+        views = self._views
+
+        dead_rows = np.flatnonzero(unlisted)
+        dead = self._gather(dead_rows)
+        dead._views = [views[row] for row in dead_rows.tolist()]
+        for row, view in enumerate(dead._views):
+            view.table, view.row = dead, row
+
+        kept = self._gather(live)
+        for field in ('_rows', '_legs', '_callsign', '_speed', '_flight_level', '_entry_time',
+                      '_route_offsets', '_route_ids', '_etas'):
+            setattr(self, field, getattr(kept, field))
+        self._views = [views[row] for row in self._live]
+        for row, view in enumerate(self._views):
+            view.row = row
+        self._live = list(range(len(self._views)))
+        self._reindex()
+        self._decoded = OrderedDict()
+
+    def snapshot(self) -> 'FlightTable':
+        """
+        The current flights as a table of their own, for work running while
+        this one changes, in this process or (pickled) in others: their rows
+        gathered in list order into new columns, with views of its own. The
+        rows left by amendments and removals are not carried along.
+        """
+        table = self._gather(self.rows)
+        table._views = [FlightView(table, row) for row in range(table._rows)]
+        table._live = list(range(table._rows))
+        table._reindex()
+        return table
+
+    def _gather(self, rows: np.ndarray) -> 'FlightTable':
+        """New table holding rows, in that order, in new columns; none of them listed yet"""
+        offsets = self._route_offsets
+        starts = offsets[rows]
+        counts = offsets[rows + 1] - starts
+        ends = np.cumsum(counts)
+        legs = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - counts), counts)
+
+        table = FlightTable.__new__(FlightTable)
+        table.names, table.name_ids = list(self.names), dict(self.name_ids)
+        table.callsigns, table.callsign_ids = list(self.callsigns), dict(self.callsign_ids)
+        table._rows, table._legs = len(rows), len(legs)
+        for field in ('_callsign', '_speed', '_flight_level', '_entry_time'):
+            setattr(table, field, getattr(self, field)[rows])
+        table._route_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        table._route_offsets[1:] = ends
+        table._route_ids = self._route_ids[legs]
+        table._etas = self._etas[legs]
+        table._views = []
+        table._live = []
+        table._positions = {}
+        table._holes = 0
+        table._by_callsign = {}
+        table._decoded = OrderedDict()
+        return table
+
+    def decode(self, row: int) -> tuple:
+        """
+        (route, timeline, position times) of a row: its route and
+        estimated_times as a Flight holds them (the timeline keeping the
+        last pass of a repeated waypoint), and the ETA at each route
+        position, None where there is none
+        """
+        cache = self._decoded
+        decoded = cache.get(row)
+        if decoded is not None:
+            try:
+                cache.move_to_end(row)
+            except KeyError:  # Evicted meanwhile by another thread
+                pass
+            return decoded
+        offsets = self._route_offsets
+        start, end = offsets[row], offsets[row + 1]
+        names = self.names
+        route = [names[wp] for wp in self._route_ids[start:end].tolist()]
+        positions = [from_epoch(seconds) for seconds in self._etas[start:end].tolist()]
+        times = {wp: t for wp, t in zip(route, positions) if t is not None}
+        decoded = cache[row] = (route, times, positions)
+        while len(cache) > DECODED_ROWS:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+        return decoded
+
+    def records(self) -> List[dict]:
+        """The current flights as GET /flights lists them"""
+        names, callsigns = self.names, self.callsigns
+        offsets = self._route_offsets
+        records = []
+        for row in self.rows.tolist():
+            start, end = offsets[row], offsets[row + 1]
+            route = [names[wp] for wp in self._route_ids[start:end].tolist()]
+            positions = [from_epoch(seconds) for seconds in self._etas[start:end].tolist()]
+            timeline = {wp: t.isoformat() for wp, t in zip(route, positions) if t is not None}
+            entry_time = from_epoch(float(self._entry_time[row]))
+            records.append({
+                "callsign": callsigns[self._callsign[row]],
+                "route": route,
+                "speed": float(self._speed[row]),
+                "flight_level": int(self._flight_level[row]),
+                "entry_time": entry_time.isoformat() if entry_time else None,
+                "timeline": timeline,
+                "position_times": [t.isoformat() if t else None for t in positions],
+            })
+        return records
+
+    def memory_bytes(self) -> int:
+        """Size of the column buffers in use (interned strings and views are not included)"""
+        per_row = sum(column.itemsize for column in (
+            self._callsign, self._speed, self._flight_level, self._entry_time, self._route_offsets))
+        per_leg = self._route_ids.itemsize + self._etas.itemsize
+        return self._rows * per_row + self._legs * per_leg
+
+class FlightView:
+    """
+    One row of a FlightTable, read like a Flight (read-only). route,
+    estimated_times and position_times are decoded from the arrays on
+    demand and only kept while the row is among the table's recently used.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: FlightTable, row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def callsign(self) -> str:
+        return self.table.callsigns[self.table._callsign[self.row]]
+
+    @property
+    def speed(self) -> float:
+        return float(self.table._speed[self.row])
+
+    @property
+    def flight_level(self) -> int:
+        return int(self.table._flight_level[self.row])
+
+    @property
+    def entry_time(self) -> Optional[datetime]:
+        return from_epoch(float(self.table._entry_time[self.row]))
+
+    @property
+    def route(self) -> List[str]:
+        return self.table.decode(self.row)[0]
+
+    @property
+    def estimated_times(self) -> Dict[str, datetime]:
+        return self.table.decode(self.row)[1]
+
+    @property
+    def position_times(self) -> List[Optional[datetime]]:
+        """ETA at each route position, None where there is none; a repeated waypoint keeps every pass"""
+        return self.table.decode(self.row)[2]
+
+    def __repr__(self) -> str:
+        return f"FlightView({self.callsign!r}, row={self.row})"
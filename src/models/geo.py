@@ -0,0 +1,38 @@
+from math import radians, sin, cos, sqrt, atan2, asin, acos
+
+EARTH_RADIUS_NM = 3440.065  # Earth's radius in nautical miles
+NM_PER_DEGREE_LAT = 60.0
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points in nautical miles using Haversine formula"""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return EARTH_RADIUS_NM * c
+
+def bearing(lat1, lon1, lat2, lon2):
+    """Initial great-circle bearing in radians"""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlon = lon2 - lon1
+    return atan2(sin(dlon) * cos(lat2), cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(dlon))
+
+def arc_distance(lat, lon, lat1, lon1, lat2, lon2):
+    """
+    Distance in nautical miles from (lat, lon) to the great-circle arc from
+    (lat1, lon1) to (lat2, lon2): the cross-track distance where the point
+    lies abeam the arc, else the distance to the nearer end
+    """
+    to_point = haversine(lat1, lon1, lat, lon) / EARTH_RADIUS_NM
+    length = haversine(lat1, lon1, lat2, lon2) / EARTH_RADIUS_NM
+    if to_point == 0 or length == 0:
+        return to_point * EARTH_RADIUS_NM
+    offset = bearing(lat1, lon1, lat, lon) - bearing(lat1, lon1, lat2, lon2)
+    if cos(offset) <= 0:  # Behind the start
+        return to_point * EARTH_RADIUS_NM
+    cross = asin(max(-1.0, min(1.0, sin(to_point) * sin(offset))))
+    along = acos(max(-1.0, min(1.0, cos(to_point) / cos(cross))))
+    if along >= length:
+        return haversine(lat2, lon2, lat, lon)
+    return abs(cross) * EARTH_RADIUS_NM
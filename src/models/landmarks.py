@@ -0,0 +1,175 @@
+from array import array
+from typing import List, Optional
+import hashlib
+import heapq
+import os
+import pickle
+import random
+
+INF = float('inf')
+
+def shortest_distances(graph, source: int, reverse: bool = False) -> array:
+    """
+    Dijkstra over a CompiledGraph: distance from source to every waypoint,
+    or from every waypoint to source when reverse is set. INF if unreachable.
+    """
+    n = len(graph)
+    dist = array('d', [INF]) * n
+    dist[source] = 0.0
+    settled = bytearray(n)
+    if reverse:
+        offsets, neighbors = graph.rev_offsets, graph.rev_sources
+        edge_of = graph.rev_edges
+    else:
+        offsets, neighbors = graph.offsets, graph.targets
+        edge_of = None
+    distances = graph.distances
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        for k in range(offsets[node], offsets[node + 1]):
+            neighbor = neighbors[k]
+            nd = d + distances[edge_of[k] if edge_of is not None else k]
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                heapq.heappush(heap, (nd, neighbor))
+    return dist
+
+def graph_fingerprint(graph) -> str:
+    """Hash of the waypoint names and the weighted adjacency of a CompiledGraph"""
+    digest = hashlib.sha1()
+    digest.update('\0'.join(graph.names).encode('utf-8'))
+    for field in (graph.offsets, graph.targets, graph.distances):
+        digest.update(field.tobytes())
+    return digest.hexdigest()
+
+class LandmarkTable:
+    """
+    Exact shortest distances from and to K landmark waypoints, for the ALT
+    lower bound d(v, t) >= max(d(L, t) - d(L, v), d(v, L) - d(t, L)).
+
+    Landmarks are picked farthest-first so they sit on the edges of the
+    network. Distances are stored waypoint-major: entry v * K + i belongs
+    to waypoint v and landmark i.
+    """
+
+    __slots__ = ('fingerprint', 'version', 'landmarks', 'dist_from', 'dist_to')
+
+    def __init__(self, graph, count: int, seed: int = 0):
+        self.fingerprint = graph_fingerprint(graph)
+        self.version = graph.version
+        n = len(graph)
+        count = min(count, n)
+        self.landmarks: List[int] = []
+        from_rows, to_rows = [], []
+        if count:
+            # Start from the waypoint farthest from a random one, then keep adding
+            # the waypoint farthest from every landmark chosen so far
+            probe = shortest_distances(graph, random.Random(seed).randrange(n))
+            closest = array('d', [INF]) * n
+            candidate = max(range(n), key=lambda v: probe[v] if probe[v] < INF else -1.0)
+            while len(self.landmarks) < count:
+                self.landmarks.append(candidate)
+                from_rows.append(shortest_distances(graph, candidate))
+                to_rows.append(shortest_distances(graph, candidate, reverse=True))
+                row = from_rows[-1]
+                for v in range(n):
+                    if row[v] < closest[v]:
+                        closest[v] = row[v]
+                chosen = set(self.landmarks)
+                # Waypoints no landmark reaches (isolated ones, other components) are skipped
+                candidate = max((v for v in range(n) if v not in chosen and closest[v] < INF),
+                                key=closest.__getitem__, default=None)
+                if candidate is None:
+                    break
+
+        k = len(self.landmarks)
+        self.dist_from = array('d', bytes(8 * n * k))
+        self.dist_to = array('d', bytes(8 * n * k))
+        for i in range(k):
+            self.dist_from[i::k] = from_rows[i]
+            self.dist_to[i::k] = to_rows[i]
+
+    def __len__(self) -> int:
+        return len(self.landmarks)
+
+    def heuristic(self, goal: int):
+        """Function v -> ALT lower bound of d(v, goal); INF when goal is unreachable from v"""
+        k = len(self.landmarks)
+        dist_from, dist_to = self.dist_from, self.dist_to
+        base = goal * k
+        # Only landmarks with finite distances at the goal give a valid bound
+        from_terms = [(i, dist_from[base + i]) for i in range(k) if dist_from[base + i] < INF]
+        to_terms = [(i, dist_to[base + i]) for i in range(k) if dist_to[base + i] < INF]
+
+        def bound(v: int) -> float:
+            offset = v * k
+            best = 0.0
+            for i, goal_from in from_terms:
+                d = goal_from - dist_from[offset + i]
+                if d > best:
+                    best = d
+            for i, goal_to in to_terms:
+                d = dist_to[offset + i] - goal_to
+                if d > best:
+                    best = d
+            return best
+
+        return bound
+
+    def heuristic_from(self, source: int):
+        """Function v -> ALT lower bound of d(source, v); INF when v is unreachable from source"""
+        k = len(self.landmarks)
+        dist_from, dist_to = self.dist_from, self.dist_to
+        base = source * k
+        from_terms = [(i, dist_from[base + i]) for i in range(k) if dist_from[base + i] < INF]
+        to_terms = [(i, dist_to[base + i]) for i in range(k) if dist_to[base + i] < INF]
+
+        def bound(v: int) -> float:
+            offset = v * k
+            best = 0.0
+            for i, source_from in from_terms:
+                d = dist_from[offset + i] - source_from
+                if d > best:
+                    best = d
+            for i, source_to in to_terms:
+                d = source_to - dist_to[offset + i]
+                if d > best:
+                    best = d
+            return best
+
+        return bound
+
+    def memory_bytes(self) -> int:
+        return (len(self.dist_from) + len(self.dist_to)) * 8
+
+    @classmethod
+    def load_or_build(cls, graph, count: int, cache_dir: Optional[str] = None,
+                      seed: int = 0) -> 'LandmarkTable':
+        """Table for graph, read from / written to cache_dir keyed by the graph fingerprint"""
+        if cache_dir is None:
+            return cls(graph, count, seed)
+        fingerprint = graph_fingerprint(graph)
+        path = os.path.join(cache_dir, f"landmarks-{fingerprint}-k{count}-s{seed}.pkl")
+        try:
+            with open(path, 'rb') as f:
+                table = pickle.load(f)
+            if isinstance(table, cls) and table.fingerprint == fingerprint:
+                table.version = graph.version
+                return table
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        table = cls(graph, count, seed)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            # A read-only deployment still gets the table, just not the cache
+            print(f"Warning: could not cache landmarks in {cache_dir}: {e}")
+        return table
@@ -0,0 +1,50 @@
+from math import ceil, cos, radians
+from typing import Dict, Iterator, List, Tuple
+
+from .geo import NM_PER_DEGREE_LAT
+
+class WaypointGrid:
+    """
+    Uniform lat/lon grid over waypoint names.
+
+    Cells are cell_nm tall; a query of radius r only visits the cells that
+    can hold a point within r of the query, so lookups cost O(local density).
+    Longitude wraps around the antimeridian.
+    """
+
+    def __init__(self, cell_nm: float):
+        self.cell_deg = cell_nm / NM_PER_DEGREE_LAT
+        self.n_cols = int(ceil(360.0 / self.cell_deg))
+        self.cells: Dict[Tuple[int, int], List[str]] = {}
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(lat // self.cell_deg), int(((lon + 180.0) % 360.0) // self.cell_deg)
+
+    def insert(self, name: str, lat: float, lon: float) -> None:
+        self.cells.setdefault(self._cell(lat, lon), []).append(name)
+
+    def remove(self, name: str, lat: float, lon: float) -> None:
+        bucket = self.cells.get(self._cell(lat, lon))
+        if bucket and name in bucket:
+            bucket.remove(name)
+
+    def candidates(self, lat: float, lon: float, radius_nm: float) -> Iterator[str]:
+        """Names in every cell that may contain a point within radius_nm of (lat, lon)"""
+        lat_cells = int(ceil(radius_nm / NM_PER_DEGREE_LAT / self.cell_deg))
+        # Meridians converge towards the poles: widen the longitude span, to
+        # every column when the area searched reaches a pole
+        max_lat = abs(lat) + (lat_cells + 1) * self.cell_deg
+        row, col = self._cell(lat, lon)
+        lon_cells = self.n_cols if max_lat >= 90.0 else int(ceil(lat_cells / cos(radians(max_lat)))) + 1
+        if 2 * lon_cells + 1 >= self.n_cols:
+            cols = range(self.n_cols)
+        else:
+            cols = [c % self.n_cols for c in range(col - lon_cells, col + lon_cells + 1)]
+        # No rows beyond the poles
+        first_row = max(row - lat_cells, int(-90.0 // self.cell_deg))
+        last_row = min(row + lat_cells, int(90.0 // self.cell_deg))
+        for r in range(first_row, last_row + 1):
+            for c in cols:
+                bucket = self.cells.get((r, c))
+                if bucket:
+                    yield from bucket
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+EPOCH = datetime(1970, 1, 1)  # Times are naive UTC throughout
+MICROSECOND = timedelta(microseconds=1)
+
+def naive_utc(t: datetime) -> datetime:
+    """t as naive UTC: an aware t is converted, a naive one is taken to be UTC already"""
+    if t.tzinfo is None:
+        return t
+    return t.astimezone(timezone.utc).replace(tzinfo=None)
+
+def to_epoch(t: Optional[datetime]) -> float:
+    """Epoch seconds of t (see naive_utc), NaN for None"""
+    if t is None:
+        return float('nan')
+    return (naive_utc(t) - EPOCH).total_seconds()
+
+def from_epoch(seconds: float) -> Optional[datetime]:
+    """Inverse of to_epoch, exact to the microsecond"""
+    if seconds != seconds:  # NaN
+        return None
+    return EPOCH + timedelta(microseconds=round(seconds * 1e6))
+
+def to_micros(t: datetime) -> int:
+    """Epoch microseconds of t (see naive_utc)"""
+    return (naive_utc(t) - EPOCH) // MICROSECOND
+
+def from_micros(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=us)
@@ -0,0 +1,68 @@
+from array import array
+import numpy as np
+
+def _to_array(typecode: str, values: np.ndarray) -> array:
+    result = array(typecode)
+    result.frombytes(values.astype(np.dtype(typecode)).tobytes())
+    return result
+
+class TurnTable:
+    """
+    Bearings and turn angles of a CompiledGraph, computed once per version.
+
+    bearings[e] is the initial great-circle bearing of edge e in degrees.
+    For every pair of consecutive edges, e_in arriving where e_out leaves,
+    angles[base[e_in] + e_out] is the turn between their bearings (the
+    smaller angle between them, 0..180), and allowed[...] whether it is
+    within max_turn, decided before angles are rounded to single precision.
+    The pairs of e_in are laid out in the order of the edges leaving its
+    target, so the lookup is a single index.
+    """
+
+    __slots__ = ('version', 'max_turn', 'bearings', 'base', 'angles', 'allowed')
+
+    def __init__(self, graph, max_turn: float):
+        self.version = graph.version
+        self.max_turn = max_turn
+        lat = np.radians(np.frombuffer(graph.lat, dtype=np.float64))
+        lon = np.radians(np.frombuffer(graph.lon, dtype=np.float64))
+        offsets = np.frombuffer(graph.offsets, dtype=np.intc).astype(np.int64)
+        sources = np.frombuffer(graph.sources, dtype=np.intc)
+        targets = np.frombuffer(graph.targets, dtype=np.intc)
+
+        lat1, lat2 = lat[sources], lat[targets]
+        dlon = lon[targets] - lon[sources]
+        bearings = np.degrees(np.arctan2(
+            np.sin(dlon) * np.cos(lat2),
+            np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)))
+
+        # One run of pairs per arriving edge, as long as its target's out-degree
+        firsts = offsets[targets]
+        counts = offsets[targets + 1] - firsts
+        starts = np.zeros(len(targets) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        arriving = np.repeat(np.arange(len(targets)), counts)
+        leaving = np.arange(starts[-1]) - np.repeat(starts[:-1] - firsts, counts)
+        angles = np.abs(bearings[leaving] - bearings[arriving])
+        angles = np.minimum(angles, 360 - angles)
+
+        self.bearings = _to_array('d', bearings)
+        self.base = _to_array('i', starts[:-1] - firsts)
+        self.angles = _to_array('f', angles)
+        self.allowed = bytearray((angles <= max_turn).astype(np.uint8).tobytes())
+
+    def __len__(self) -> int:
+        return len(self.angles)
+
+    def turn(self, arriving: int, leaving: int) -> float:
+        """Turn in degrees from edge arriving onto edge leaving, which must start at its target"""
+        return self.angles[self.base[arriving] + leaving]
+
+    def turn_ok(self, arriving: int, leaving: int) -> bool:
+        """Whether that turn is within max_turn"""
+        return bool(self.allowed[self.base[arriving] + leaving])
+
+    def memory_bytes(self) -> int:
+        return (sum(field.buffer_info()[1] * field.itemsize
+                    for field in (self.bearings, self.base, self.angles))
+                + len(self.allowed))
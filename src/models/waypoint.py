@@ -1,35 +1,51 @@
-from dataclasses import dataclass
 from enum import Enum
-from typing import Tuple, Dict, Set
+from typing import Tuple, Dict, Set, Optional
+import sys
 
 class WaypointType(Enum):
     VOR = "VOR"  # VHF Omnidirectional Range
     NDB = "NDB"  # Non-Directional Beacon
     FIX = "FIX"  # Fixed point
 
-@dataclass
 class Waypoint:
-    name: str
-    latitude: float
-    longitude: float
-    type: WaypointType
-    adjacent: Dict[str, float] = None  # Dictionary of adjacent waypoint names and their distances
-    connected_by: Set[str] = None      # Set of airways that connect to this waypoint
+    """
+    A named point of the airspace.
+
+    Slotted, with the name interned, as global databases hold hundreds of
+    thousands of them. id is the index Airspace.add_waypoint gives it (its
+    id in the compiled graph too), -1 until then. A waypoint belongs to one
+    airspace. Waypoints are equal when both id and name are; the hash is
+    the name's alone, so it does not change when the id is assigned.
+    adjacent and connected_by are created on first use.
+    """
+
+    __slots__ = ('name', 'latitude', 'longitude', 'type', 'id', '_adjacent', '_connected_by')
 
     def __init__(self, name, latitude, longitude, wp_type):
-        self.name = name
+        self.name = sys.intern(name)
         self.latitude = latitude
         self.longitude = longitude
         self.type = wp_type  # VOR, NDB, FIX, etc.
+        self.id = -1
+        self._adjacent: Optional[Dict[str, float]] = None
+        self._connected_by: Optional[Set[str]] = None
 
     def __repr__(self):
         return f"Waypoint({self.name}, {self.latitude}, {self.longitude}, {self.type})"
 
-    def __post_init__(self):
-        if self.adjacent is None:
-            self.adjacent = {}
-        if self.connected_by is None:
-            self.connected_by = set()
+    @property
+    def adjacent(self) -> Dict[str, float]:
+        """Adjacent waypoint names and their distances"""
+        if self._adjacent is None:
+            self._adjacent = {}
+        return self._adjacent
+
+    @property
+    def connected_by(self) -> Set[str]:
+        """Airways that connect to this waypoint"""
+        if self._connected_by is None:
+            self._connected_by = set()
+        return self._connected_by
 
     def add_adjacent(self, waypoint_name: str, distance: float, airway: str):
         """Add an adjacent waypoint with its distance and connecting airway"""
@@ -43,7 +59,8 @@ class Waypoint:
     def __eq__(self, other):
         if not isinstance(other, Waypoint):
             return False
-        return self.name == other.name
+        # Names are interned: comparing them costs no more than the ids
+        return self.id == other.id and self.name == other.name
 
     def __hash__(self):
         return hash(self.name)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic traffic over the real airspace graph, and synthetic
+airspaces of any size, for scaling tests and benchmarks
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from math import ceil, pi, sqrt
+from typing import List, Optional
+
+from models.waypoint import Waypoint, WaypointType
+from models.flight import Flight
+from models.airspace import Airspace
+from models.geo import bearing, haversine
+
+AIRSPACE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'data', 'airspace_data.json')
+BASE_TIME = datetime(2025, 1, 19)
+
+# Quy tắc bán vòng: hướng đông (0-179°) bay mực lẻ, hướng tây bay mực chẵn
+EASTBOUND_LEVELS = [270, 290, 310, 330, 350, 370, 390]
+WESTBOUND_LEVELS = [280, 300, 320, 340, 360, 380, 400]
+LEVEL_WEIGHTS = [1, 3, 5, 6, 5, 3, 1]   # Cruise levels cluster around FL330
+SPEEDS = [(420, 460), (440, 490), (470, 510)]   # Turboprop/narrow-body/wide-body (kts)
+SPEED_WEIGHTS = [1, 6, 3]
+MIN_LEGS, MAX_LEGS = 2, 8
+PEAK_SHARE = 0.6   # Share of flights entering in the morning/evening banks
+
+def load_airspace(path: str = AIRSPACE_FILE) -> Airspace:
+    """Airspace from airspace_data.json, loaded the same way as the API"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return airspace_from_data(json.load(f))
+
+def airspace_from_data(data: dict) -> Airspace:
+    """Airspace from the parsed contents of an airspace_data.json"""
+    airspace = Airspace()
+    items = data['waypoints'] if isinstance(data['waypoints'], list) else [
+        dict(info, name=name) for name, info in data['waypoints'].items()
+    ]
+    for info in items:
+        airspace.add_waypoint(Waypoint(name=info['name'], latitude=info['lat'],
+                                       longitude=info['lon'], wp_type=WaypointType.FIX))
+    for edge in data.get('edges', []):
+        if edge['source'] in airspace.waypoints and edge['target'] in airspace.waypoints:
+            airspace.add_route(edge['source'], edge['target'], edge.get('distance_nm', 0),
+                               "AUTO", "BIDIRECTIONAL")
+    return airspace
+
+def airspace_data(airspace: Airspace) -> dict:
+    """Inverse of airspace_from_data, for airspaces with bidirectional routes only"""
+    edges = [{'source': name, 'target': to_wp, 'distance_nm': distance}
+             for name, routes in airspace.routes.items()
+             for to_wp, distance, _, _ in routes if name < to_wp]
+    waypoints = [{'name': wp.name, 'lat': wp.latitude, 'lon': wp.longitude}
+                 for wp in airspace.waypoints.values()]
+    return {'waypoints': waypoints, 'edges': edges}
+
+def generate_airspace(count: int, seed: int = 0, spacing_deg: float = 0.1,
+                      origin: tuple = (-10.0, 90.0)) -> Airspace:
+    """
+    Airspace of count waypoints on a jittered lattice spacing_deg apart,
+    linked to their east and north neighbours (and sometimes diagonally) by
+    bidirectional routes, with a few links missing.
+    """
+    rnd = random.Random(seed)
+    airspace = Airspace()
+    side = int(ceil(sqrt(count)))
+    jitter = spacing_deg * 0.3
+    for k in range(count):
+        row, col = divmod(k, side)
+        airspace.add_waypoint(Waypoint(
+            name=f"W{k:06d}",
+            latitude=origin[0] + row * spacing_deg + rnd.uniform(-jitter, jitter),
+            longitude=origin[1] + col * spacing_deg + rnd.uniform(-jitter, jitter),
+            wp_type=WaypointType.FIX
+        ))
+
+    def link(k1, k2):
+        wp1, wp2 = airspace.waypoints[f"W{k1:06d}"], airspace.waypoints[f"W{k2:06d}"]
+        distance = haversine(wp1.latitude, wp1.longitude, wp2.latitude, wp2.longitude)
+        airspace.add_route(wp1.name, wp2.name, round(distance, 1), f"S{k1 % 97}", "BIDIRECTIONAL")
+
+    for k in range(count):
+        row, col = divmod(k, side)
+        if col + 1 < side and k + 1 < count and rnd.random() < 0.9:
+            link(k, k + 1)
+        if k + side < count and rnd.random() < 0.9:
+            link(k, k + side)
+        if col + 1 < side and k + side + 1 < count and rnd.random() < 0.2:
+            link(k, k + side + 1)
+    return airspace
+
+def _random_route(airspace: Airspace, rnd: random.Random, origins: List[str]) -> List[str]:
+    """Random walk along airway edges, never revisiting a waypoint"""
+    route = [rnd.choice(origins)]
+    legs = rnd.randint(MIN_LEGS, MAX_LEGS)
+    while len(route) <= legs:
+        options = [to_wp for to_wp, _, _, _ in airspace.routes.get(route[-1], ())
+                   if to_wp not in route]
+        if not options:
+            break
+        route.append(rnd.choice(options))
+    return route
+
+def _entry_offset(rnd: random.Random, hours: float) -> float:
+    """Minutes after BASE_TIME: uniform background traffic plus two banks"""
+    span = hours * 60
+    if rnd.random() < PEAK_SHARE:
+        centre = span * rnd.choice((0.3, 0.75))
+        return min(max(rnd.gauss(centre, span * 0.06), 0), span)
+    return rnd.uniform(0, span)
+
+def generate_flights(airspace: Airspace, count: int, seed: int = 0, hours: float = 24,
+                     start: datetime = BASE_TIME) -> List[Flight]:
+    """
+    count flights with random routes along the airspace edges, semicircular
+    flight levels, type-dependent speeds and entry times spread over `hours`.
+    The same seed always gives the same traffic.
+    """
+    rnd = random.Random(seed)
+    origins = sorted(name for name, edges in airspace.routes.items() if edges)
+    if not origins:
+        return []
+
+    flights = []
+    for k in range(count):
+        route = _random_route(airspace, rnd, origins)
+        first, last = airspace.waypoints[route[0]], airspace.waypoints[route[-1]]
+        eastbound = 0 <= bearing(first.latitude, first.longitude,
+                                 last.latitude, last.longitude) < pi
+        levels = EASTBOUND_LEVELS if eastbound else WESTBOUND_LEVELS
+        low, high = rnd.choices(SPEEDS, SPEED_WEIGHTS)[0]
+        flight = Flight(
+            callsign=f"SYN{k:05d}",
+            route=route,
+            speed=float(rnd.randint(low, high)),
+            flight_level=rnd.choices(levels, LEVEL_WEIGHTS)[0],
+            entry_time=start + timedelta(minutes=round(_entry_offset(rnd, hours), 1))
+        )
+        distances = {}
+        for i in range(len(route) - 1):
+            wp1, wp2 = airspace.waypoints[route[i]], airspace.waypoints[route[i + 1]]
+            distances[(route[i], route[i + 1])] = haversine(
+                wp1.latitude, wp1.longitude, wp2.latitude, wp2.longitude
+            )
+        flight.calculate_estimated_times(distances)
+        flights.append(flight)
+    return flights
+
+def flight_plan(flight: Flight) -> dict:
+    """Flight in the request format of POST /flights"""
+    return {
+        'callsign': flight.callsign,
+        'route': flight.route,
+        'speed': flight.speed,
+        'flight_level': flight.flight_level,
+        'entry_time': flight.entry_time.isoformat(),
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic flight plans as JSON")
+    parser.add_argument('count', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--airspace', default=AIRSPACE_FILE)
+    args = parser.parse_args(argv)
+
+    airspace = load_airspace(args.airspace)
+    flights = generate_flights(airspace, args.count, args.seed, args.hours)
+    json.dump([flight_plan(flight) for flight in flights], sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -165,5 +165,945 @@ def test_conflicts():
     
     return conflicts
 
+def test_sweep_matches_all_pairs():
+    """So sánh engine sweep-line với vòng lặp all-pairs (tham chiếu)"""
+    test_flights = create_conflict_test_flights()
+
+    # Nhân bản flights theo thời gian để có cả cặp ở xa và cặp chồng lấn
+    flights = []
+    for shift in range(4):
+        for flight in create_conflict_test_flights():
+            flight.callsign = f"{flight.callsign}_{shift}"
+            flight.entry_time += timedelta(minutes=7 * shift)
+            flight.estimated_times = {
+                wp: t + timedelta(minutes=7 * shift)
+                for wp, t in flight.estimated_times.items()
+            }
+            flights.append(flight)
+    flights.extend(test_flights)
+
+    reference = detect_conflicts(flights, mode="all_pairs")
+    assert detect_conflicts(flights, mode="sweep") == reference
+    print(f"✅ Sweep-line khớp all-pairs ({len(reference)} xung đột)")
+
+def conflict_key(conflict):
+    """Khóa so sánh một xung đột, không phụ thuộc thứ tự"""
+    return tuple(sorted((k, str(v)) for k, v in conflict.items()))
+
+def synthetic_traffic(count=250, size=400, seed=1, hours=2):
+    """Airspace lưới tổng hợp và flights dày đặc trên đó"""
+    from synthetic_traffic import generate_airspace, generate_flights
+    airspace = generate_airspace(size, seed=seed)
+    return airspace, generate_flights(airspace, count, seed=seed, hours=hours)
+
+def test_store_matches_detect_conflicts():
+    """ConflictStore sau các lần thêm/xóa/sửa flight so với tính lại từ đầu"""
+    from algorithms.conflict_store import ConflictStore
+    airspace, flights = synthetic_traffic()
+    store = ConflictStore(flights[:100], airspace)
+    current = list(flights[:100])
+    for flight in flights[100:]:
+        store.add_flight(flight)
+        current.append(flight)
+    for flight in current[::7]:
+        store.remove_flight(flight)
+    current = [flight for flight in current if flight not in current[::7]]
+    for idx in range(0, len(current), 5):
+        old = current[idx]
+        new = Flight(old.callsign, list(old.route), old.speed, old.flight_level,
+                     old.entry_time + timedelta(minutes=3),
+                     estimated_times={wp: t + timedelta(minutes=3)
+                                      for wp, t in old.estimated_times.items()})
+        store.update_flight(old, new)
+        current[idx] = new
+
+    reference = detect_conflicts(current, airspace=airspace)
+    assert sorted(map(conflict_key, store.conflicts())) == sorted(map(conflict_key, reference))
+    print(f"✅ ConflictStore khớp detect_conflicts ({len(reference)} xung đột)")
+
+def near_pairs_by_scan(airspace):
+    """Mọi cặp waypoint cách nhau dưới 10 NM, tính bằng duyệt tuyến tính"""
+    from models.geo import haversine
+    waypoints = list(airspace.waypoints.values())
+    pairs = {}
+    for i, wp1 in enumerate(waypoints):
+        for wp2 in waypoints[i + 1:]:
+            distance = haversine(wp1.latitude, wp1.longitude, wp2.latitude, wp2.longitude)
+            if distance < 10:
+                pairs.setdefault(wp1.name, {})[wp2.name] = distance
+                pairs.setdefault(wp2.name, {})[wp1.name] = distance
+    return pairs
+
+def test_near_pairs_match_linear_scan():
+    """Bảng cặp waypoint gần nhau so với duyệt tuyến tính, cả sau khi dời waypoint"""
+    import random
+    rnd = random.Random(11)
+    airspace = Airspace()
+    # Các cụm dày đặc, có cụm nằm hai bên kinh tuyến 180 và gần cực
+    centers = [(10.0, 106.0), (0.0, 179.95), (0.0, -179.95), (85.0, 20.0)]
+    for k in range(800):
+        lat, lon = centers[k % len(centers)]
+        lon = (lon + rnd.uniform(-0.5, 0.5) + 180) % 360 - 180
+        airspace.add_waypoint(Waypoint(f"W{k}", lat + rnd.uniform(-0.5, 0.5), lon, WaypointType.FIX))
+    assert airspace.near_waypoint_pairs() == near_pairs_by_scan(airspace)
+    for k in range(0, 800, 9):
+        lat, lon = centers[rnd.randrange(len(centers))]
+        airspace.add_waypoint(Waypoint(f"W{k}", lat + rnd.uniform(-0.5, 0.5),
+                                       lon + rnd.uniform(-0.05, 0.05), WaypointType.FIX))
+    expected = near_pairs_by_scan(airspace)
+    assert airspace.near_waypoint_pairs() == expected
+    count = sum(map(len, expected.values())) // 2
+    print(f"✅ Bảng cặp waypoint gần nhau khớp duyệt tuyến tính ({count} cặp)")
+
+def test_segment_hits_match_leg_loops():
+    """Head-on/overtake từ SegmentIndex so với vòng lặp từng cặp chặng (tham chiếu)"""
+    from algorithms.conflict_detection import (
+        _head_on_conflicts, _overtake_conflicts, segment_hits
+    )
+    from algorithms.segment_index import SegmentIndex
+    airspace, flights = synthetic_traffic(count=300, size=100)
+    index = SegmentIndex(flights)
+    for flight in flights[:50]:
+        index.remove_flight(flight)
+    for flight in flights[:50]:
+        index.add_flight(flight)
+    fresh = SegmentIndex(flights[50:] + flights[:50])
+    assert ({key: sorted((id(o.flight), o.position) for o in occ) for key, occ in index.segments()} ==
+            {key: sorted((id(o.flight), o.position) for o in occ) for key, occ in fresh.segments()})
+
+    hits = segment_hits(index, {id(f): i for i, f in enumerate(flights)})
+    found = 0
+    for i in range(len(flights)):
+        for j in range(i + 1, len(flights)):
+            expected = (_head_on_conflicts(flights[i], flights[j]) +
+                        _overtake_conflicts(flights[i], flights[j]))
+            assert [hit[3] for hit in sorted(hits.get((i, j), []), key=lambda hit: hit[:3])] == expected
+            found += len(expected)
+    assert found
+    print(f"✅ SegmentIndex khớp vòng lặp từng cặp chặng ({found} xung đột)")
+
+def closest_approach_by_sampling(f1, f2, airspace, steps=200):
+    """Khoảng cách nhỏ nhất (NM) giữa hai flight bay cùng lúc, lấy mẫu dày theo thời gian"""
+    import numpy as np
+    from algorithms.conflict_detection import timeline
+    from models.geo import EARTH_RADIUS_NM
+    from models.timebase import to_epoch
+
+    def legs(flight):
+        timed = [(airspace.waypoints[wp], to_epoch(t)) for wp, t in timeline(flight)]
+        return list(zip(timed, timed[1:]))
+
+    def position(leg, t):
+        (wp0, t0), (wp1, t1) = leg
+        frac = (t - t0) / (t1 - t0)
+        dlon = (wp1.longitude - wp0.longitude + 180.0) % 360.0 - 180.0
+        return (np.radians(wp0.latitude + (wp1.latitude - wp0.latitude) * frac),
+                np.radians(wp0.longitude + dlon * frac))
+
+    best = float('inf')
+    for leg1 in legs(f1):
+        for leg2 in legs(f2):
+            ta, tb = max(leg1[0][1], leg2[0][1]), min(leg1[1][1], leg2[1][1])
+            if ta >= tb:
+                continue
+            t = np.linspace(ta, tb, steps)
+            lat1, lon1 = position(leg1, t)
+            lat2, lon2 = position(leg2, t)
+            a = (np.sin((lat2 - lat1) / 2) ** 2 +
+                 np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+            best = min(best, float((2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(a))).min()))
+    return best
+
+def test_cpa_matches_sampled_approach():
+    """detect_conflicts_cpa so với lấy mẫu khoảng cách từng cặp, và với head-on của pair_conflicts"""
+    from algorithms.conflict_detection import candidate_pairs, pair_conflicts
+    from algorithms.cpa_detection import detect_conflicts_cpa
+    airspace, flights = synthetic_traffic(count=600, size=100)
+    conflicts = detect_conflicts_cpa(flights, airspace)
+    found = {(c['flight1'], c['flight2']): c for c in conflicts}
+
+    near_pairs = airspace.near_waypoint_pairs()
+    for i, j in candidate_pairs(flights):
+        f1, f2 = flights[i], flights[j]
+        distance = closest_approach_by_sampling(f1, f2, airspace)
+        conflict = found.pop((f1.callsign, f2.callsign), None)
+        if conflict is None:
+            # Phép chiếu phẳng của CPA chỉ lệch haversine một chút quanh ngưỡng 10 NM
+            assert distance > 9.9
+            assert not any(c['type'] == 'head-on'
+                           for c in pair_conflicts(f1, f2, None, near_pairs))
+        else:
+            assert abs(conflict['distance_nm'] - distance) < 0.1
+            assert conflict['start_time'] <= conflict['time'] <= conflict['end_time']
+    # Không có cặp nào ngoài các cặp ứng viên của sweep
+    assert not found
+    print(f"✅ detect_conflicts_cpa khớp lấy mẫu khoảng cách từng cặp ({len(conflicts)} xung đột)")
+
+def test_parallel_and_sweep_match_all_pairs():
+    """Sweep-line và bản song song so với all-pairs, cả sau khi airspace thay đổi"""
+    from algorithms import parallel_detection
+    from algorithms.parallel_detection import detect_conflicts_parallel
+    airspace, flights = synthetic_traffic()
+    reference = detect_conflicts(flights, mode="all_pairs", airspace=airspace)
+    assert detect_conflicts(flights, mode="sweep", airspace=airspace) == reference
+    assert detect_conflicts_parallel(flights, airspace, workers=2) == reference
+    # Pool được giữ lại giữa các lần gọi
+    pool = parallel_detection._pool
+    assert detect_conflicts_parallel(flights, airspace, workers=2) == reference
+    assert parallel_detection._pool is pool
+
+    # Dời waypoint sát nhau: bảng cặp gần nhau đổi, worker phải nhận bảng mới
+    for name in sorted(airspace.waypoints)[:40:2]:
+        wp = airspace.waypoints[name]
+        airspace.add_waypoint(Waypoint(name, wp.latitude + 0.08, wp.longitude, WaypointType.FIX))
+    changed = detect_conflicts(flights, mode="all_pairs", airspace=airspace)
+    assert changed != reference
+    assert detect_conflicts_parallel(flights, airspace, workers=2) == changed
+    assert detect_conflicts_parallel(flights, airspace, workers=1) == changed
+    print(f"✅ Sweep-line và song song khớp all-pairs ({len(reference)} xung đột)")
+
+def test_conflict_cache_survives_cancellation():
+    """Request đang tính bị hủy: request đang chờ phải tự tính tiếp, không treo"""
+    import asyncio
+    import threading
+    from algorithms.conflict_cache import ConflictCache
+
+    async def scenario():
+        cache = ConflictCache()
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "slow"
+
+        first = asyncio.ensure_future(cache.get("key", slow))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(cache.get("key", lambda: "fresh"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        return await asyncio.wait_for(second, 5)
+
+    assert asyncio.run(scenario()) == "fresh"
+
+    async def shared():
+        cache = ConflictCache()
+        calls = []
+
+        def compute():
+            calls.append(cache.version)
+            return len(calls)
+
+        first = await asyncio.gather(*(cache.get("key", compute) for _ in range(5)))
+        again = await cache.get("key", compute)
+        cache.bump()
+        return first, again, await cache.get("key", compute)
+
+    # Năm request đồng thời dùng chung một lần tính; bump() làm kết quả cũ hết hạn
+    assert asyncio.run(shared()) == ([1] * 5, 1, 2)
+    print("✅ ConflictCache dùng chung kết quả và không treo khi request đang tính bị hủy")
+
+def lateral_conflicts_by_scan(f1, f2, airspace):
+    """Luật lateral gốc: haversine cho mọi cặp mốc thời gian của hai flight (tham chiếu)"""
+    from algorithms.conflict_detection import timeline
+    from models.geo import haversine
+    conflicts = []
+    entries2 = timeline(f2)
+    for wp1, t1 in timeline(f1):
+        for wp2, t2 in entries2:
+            if wp1 == wp2 or wp1 not in airspace.waypoints or wp2 not in airspace.waypoints:
+                continue
+            time_diff = abs((t1 - t2).total_seconds()) / 60
+            if time_diff < 5 and abs(f1.flight_level - f2.flight_level) * 100 < 1000:
+                a, b = airspace.waypoints[wp1], airspace.waypoints[wp2]
+                distance = haversine(a.latitude, a.longitude, b.latitude, b.longitude)
+                if distance < 10:
+                    conflicts.append({
+                        'type': 'lateral',
+                        'flight1': f1.callsign,
+                        'flight2': f2.callsign,
+                        'wp1': wp1,
+                        'wp2': wp2,
+                        'time': t1,
+                        'flight_level1': f1.flight_level,
+                        'flight_level2': f2.flight_level,
+                        'time_diff_minutes': time_diff,
+                        'distance_nm': round(distance, 2)
+                    })
+    return conflicts
+
+def test_lateral_and_stream_match_reference():
+    """Luật lateral dùng bảng cặp gần nhau và bản stream so với tham chiếu"""
+    from algorithms.conflict_detection import _lateral_conflicts, iter_conflicts
+    airspace, flights = synthetic_traffic(count=150)
+    near_pairs = airspace.near_waypoint_pairs()
+    found = 0
+    for i in range(len(flights)):
+        for j in range(i + 1, len(flights)):
+            expected = lateral_conflicts_by_scan(flights[i], flights[j], airspace)
+            assert _lateral_conflicts(flights[i], flights[j], near_pairs) == expected
+            found += len(expected)
+    assert found
+
+    reference = detect_conflicts(flights, airspace=airspace)
+    streamed = list(iter_conflicts(flights, airspace))
+    assert sorted(map(conflict_key, streamed)) == sorted(map(conflict_key, reference))
+    print(f"✅ Lateral ({found} xung đột) và stream ({len(streamed)} xung đột) khớp tham chiếu")
+
+def test_interval_queries_match_linear_filter():
+    """IntervalTree.overlapping và ConflictStore.query so với lọc tuyến tính"""
+    import random
+    from algorithms.conflict_store import ConflictStore, conflict_matches
+    from algorithms.interval_tree import IntervalTree
+    rnd = random.Random(13)
+    tree, intervals = IntervalTree(), {}
+    for step in range(3000):
+        key = rnd.randrange(400)
+        if rnd.random() < 0.3:
+            tree.remove(key)
+            intervals.pop(key, None)
+        else:
+            start = rnd.uniform(0, 1000)
+            intervals[key] = (start, start + rnd.choice((0, rnd.uniform(0, 50))))
+            tree.add(key, *intervals[key], key)
+        if step % 10 == 0:
+            lo = rnd.choice((None, rnd.uniform(-10, 1010)))
+            hi = rnd.choice((None, rnd.uniform(-10, 1010)))
+            if lo is not None and hi is not None and lo > hi:
+                lo, hi = hi, lo
+            expected = {k for k, (s, e) in intervals.items()
+                        if (hi is None or s <= hi) and (lo is None or e >= lo)}
+            found = tree.overlapping(lo, hi)
+            assert sorted(found) == sorted(expected)
+    assert len(tree) == len(intervals)
+
+    airspace, flights = synthetic_traffic()
+    store = ConflictStore(flights[:200], airspace)
+    for flight in flights[200:]:
+        store.add_flight(flight)
+    for flight in flights[::9]:
+        store.remove_flight(flight)
+    everything = store.conflicts()
+    base = datetime(2025, 1, 19)
+    callsigns = [flights[k].callsign for k in (1, 2, 9, 40)]
+    queries = 0
+    for lo in (None, 0, 30, 61, 95):
+        for hi in (None, 31, 62, 130):
+            start = base + timedelta(minutes=lo) if lo is not None else None
+            end = base + timedelta(minutes=hi) if hi is not None else None
+            if start is not None and end is not None and start > end:
+                continue
+            for callsign in [None] + callsigns:
+                for min_fl, max_fl in ((None, None), (300, None), (None, 330), (320, 340)):
+                    filters = (start, end, callsign, min_fl, max_fl)
+                    expected = [c for c in everything if conflict_matches(c, *filters)]
+                    assert (sorted(map(conflict_key, store.query(*filters))) ==
+                            sorted(map(conflict_key, expected)))
+                    queries += 1
+    print(f"✅ IntervalTree và ConflictStore.query khớp lọc tuyến tính ({queries} truy vấn)")
+
+def test_reservations_match_segment_scan():
+    """ReservationTable so với duyệt SegmentIndex, bỏ qua mọi flight cùng callsign"""
+    import random
+    from algorithms.reservation_table import ReservationTable
+    from algorithms.segment_index import SegmentIndex
+    from models.timebase import to_epoch
+    airspace, flights = synthetic_traffic(count=400, size=100)
+    own = flights[0]
+    # Bản sửa đổi của chính flight (đối tượng khác, cùng callsign) và một flight chưa có ETA
+    amended = Flight(own.callsign, list(own.route), own.speed, own.flight_level, own.entry_time,
+                     estimated_times=dict(own.estimated_times))
+    untimed = Flight("NOETA", list(flights[1].route), 450, flights[1].flight_level,
+                     flights[1].entry_time)
+    index = SegmentIndex(flights + [amended, untimed])
+    table = ReservationTable(index, own)
+    buffer = 600.0
+
+    rnd = random.Random(17)
+    segments = [key for key, _ in index.segments()]
+    own_segments = list(zip(own.route, own.route[1:]))
+    checked = 0
+    for _ in range(500):
+        from_wp, to_wp = rnd.choice(own_segments if rnd.random() < 0.25 else segments)
+        level = rnd.choice((280, 310, 330, 350, flights[1].flight_level))
+        if rnd.random() < 0.2:
+            enter = exit = None
+        else:
+            enter = to_epoch(datetime(2025, 1, 19)) + rnd.uniform(0, 7200)
+            exit = enter + rnd.uniform(0, 900)
+        expected = 0
+        for occ in index.occupancies(from_wp, to_wp):
+            if occ.flight.callsign == own.callsign or abs(occ.flight_level - level) >= 10:
+                continue
+            if (enter is None or not occ.timed or
+                    (to_epoch(occ.hi) > enter - buffer and to_epoch(occ.lo) < exit + buffer)):
+                expected += 1
+        assert table.conflicts(from_wp, to_wp, level, enter, exit) == expected
+        assert table.is_free(from_wp, to_wp, level, enter, exit) == (expected == 0)
+        checked += expected > 0
+    assert checked
+    print(f"✅ ReservationTable khớp duyệt SegmentIndex ({checked} đoạn bị chiếm)")
+
+def route_length(airspace, path):
+    """Độ dài (NM) của một đường theo các route ngắn nhất giữa hai waypoint liên tiếp"""
+    return sum(min(d for to_wp, d, _, _ in airspace.routes[a] if to_wp == b)
+               for a, b in zip(path, path[1:]))
+
+def test_joint_level_search_matches_per_level():
+    """Tìm kiếm chung (waypoint, mực bay) so với chạy A* riêng từng mực bay"""
+    import copy
+    import random
+    from algorithms.pathfinding import candidate_levels, find_alternative_route, level_search
+    from algorithms.segment_index import SegmentIndex
+    airspace, flights = synthetic_traffic(count=1500, size=400, seed=4)
+    index = SegmentIndex(flights)
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(19)
+    changed = 0
+    for _ in range(30):
+        flight = rnd.choice(flights)
+        start, goal = rnd.sample(names, 2)
+        before = copy.deepcopy(flight)
+        levels = candidate_levels(flight.flight_level, 5, 25)
+        costs = []
+        for level, cost in levels.items():
+            found = level_search(airspace, start, goal, flight, {level: 0}, index)
+            if found:
+                costs.append(route_length(airspace, found[0]) + cost)
+        suggestion = find_alternative_route(airspace, flight, start, goal, None,
+                                            segment_index=index)
+        assert flight == before  # flight không bị sửa
+        if not costs:
+            continue
+        assert suggestion.level_change == suggestion.flight_level - flight.flight_level
+        joint = route_length(airspace, suggestion.path) + levels[suggestion.flight_level]
+        assert abs(joint - min(costs)) < 1e-6
+        changed += suggestion.level_change != 0
+    print(f"✅ Tìm kiếm chung waypoint/mực bay khớp từng mực bay ({changed} lần đổi mực)")
+
+def distances_by_dijkstra(airspace, source, reverse=False):
+    """Khoảng cách ngắn nhất từ source (hoặc tới source khi reverse) theo airspace.routes"""
+    import heapq
+    edges = {name: [] for name in airspace.routes}
+    for name, routes in airspace.routes.items():
+        for to_wp, distance, _, _ in routes:
+            if reverse:
+                edges[to_wp].append((name, distance))
+            else:
+                edges[name].append((to_wp, distance))
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for other, distance in edges[node]:
+            if d + distance < dist.get(other, float('inf')):
+                dist[other] = d + distance
+                heapq.heappush(heap, (d + distance, other))
+    return dist
+
+def test_landmark_bounds_stay_below_distances():
+    """Cận ALT không bao giờ vượt quá khoảng cách thật, cả với route một chiều và vùng tách rời"""
+    import random
+    from models.landmarks import INF
+    from synthetic_traffic import generate_airspace
+    airspace = generate_airspace(300, seed=6)
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(23)
+    for _ in range(40):
+        a, b = rnd.sample(names, 2)
+        airspace.add_route(a, b, rnd.uniform(5, 80), "ONE", "ONEWAY")
+    for k in range(5):
+        airspace.add_waypoint(Waypoint(f"ISL{k}", 40.0 + k * 0.1, 10.0, WaypointType.FIX))
+    for k in range(4):
+        airspace.add_route(f"ISL{k}", f"ISL{k + 1}", 6.0, "ISL", "ONEWAY")
+    airspace.enable_landmarks(6)
+    graph, table = airspace.compiled(), airspace.landmarks()
+
+    names = sorted(airspace.waypoints)
+    checked = 0
+    for target in rnd.sample(names, 15) + ["ISL2"]:
+        to_target = distances_by_dijkstra(airspace, target, reverse=True)
+        from_target = distances_by_dijkstra(airspace, target)
+        bound_to = table.heuristic(graph.ids[target])
+        bound_from = table.heuristic_from(graph.ids[target])
+        for name in names:
+            v = graph.ids[name]
+            for bound, exact in ((bound_to(v), to_target.get(name, INF)),
+                                 (bound_from(v), from_target.get(name, INF))):
+                assert bound <= exact + 1e-6
+                checked += 1
+    print(f"✅ Cận ALT không vượt khoảng cách thật ({checked} cặp)")
+
+def test_route_cache_invalidation_matches_recompute():
+    """RouteCache sau add/update flight: mục còn lại phải khớp tìm lại từ đầu, mục bị xóa phụ thuộc đoạn đổi"""
+    import random
+    from algorithms.pathfinding import find_alternative_route
+    from algorithms.reservation_table import ReservationTable
+    from algorithms.route_cache import RouteCache
+    from algorithms.segment_index import SegmentIndex, segment_key
+    airspace, flights = synthetic_traffic(count=1500, size=400, seed=4)
+    index = SegmentIndex(flights[:1000])
+    cache = RouteCache(10000)
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(29)
+
+    def search(index, flight, start, goal):
+        reservations = ReservationTable(index, flight)
+        suggestion = find_alternative_route(airspace, flight, start, goal, None,
+                                            segment_index=index, reservations=reservations)
+        return (suggestion.path, suggestion.flight_level) if suggestion else None, reservations.segments
+
+    queries = [(flight, *rnd.sample(names, 2)) for flight in rnd.sample(flights[:1000], 60)]
+    for flight, start, goal in queries:
+        result, segments = search(index, flight, start, goal)
+        cache.put((flight.callsign, start, goal), result, segments)
+
+    frozen = index.snapshot()
+    before = {key: list(occ) for key, occ in frozen.segments()}
+    dropped = 0
+    for step, flight in enumerate(flights[1000:1010]):
+        if step % 2:
+            index.add_flight(flight)
+            dropped += cache.invalidate_flight(flight)
+        else:
+            old = rnd.choice(flights[:1000])
+            index.remove_flight(old)
+            index.add_flight(flight)
+            dropped += cache.invalidate_flight(old) + cache.invalidate_flight(flight)
+    assert dropped
+    # Snapshot không bị ảnh hưởng bởi các thay đổi sau đó
+    assert {key: list(occ) for key, occ in frozen.segments()} == before
+
+    kept = 0
+    for flight, start, goal in queries:
+        key = (flight.callsign, start, goal)
+        result, segments = search(index, flight, start, goal)
+        if key in cache:
+            assert cache.lookup(key) == result
+            kept += 1
+    assert kept
+    print(f"✅ RouteCache chỉ xóa mục phụ thuộc đoạn bị đổi ({dropped} xóa, {kept} còn đúng)")
+
+def test_parallel_reroutes_match_serial():
+    """suggest_routes_parallel so với tìm tuần tự, và kiểm tra đầu vào của POST /suggest_paths"""
+    import random
+    from algorithms.parallel_reroute import pool_size, suggest_routes, suggest_routes_parallel
+    from algorithms.segment_index import SegmentIndex
+    from models.flight_table import FlightTable
+    airspace, flights = synthetic_traffic(count=1500, size=400, seed=4)
+    table = FlightTable(flights)
+    rnd = random.Random(31)
+    names = sorted(airspace.waypoints)
+    tasks = [(flight.callsign, *rnd.sample(names, 2)) for flight in rnd.sample(flights, 24)]
+    serial = suggest_routes(airspace, SegmentIndex(table), {f.callsign: f for f in table}, tasks)
+    parallel = suggest_routes_parallel(airspace, table, tasks, workers=2)
+    # Bỏ cột thời gian (phần tử cuối), còn lại phải giống hệt
+    assert [r[:-1] for r in parallel] == [r[:-1] for r in serial]
+    assert pool_size(len(tasks), 2) == 2 and pool_size(1, 8) == 1 and pool_size(0, 8) == 0
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # Cảnh báo deprecation của starlette.testclient
+        from fastapi.testclient import TestClient
+    import api
+    client = TestClient(api.app)
+    for body in ({"callsigns": [{"callsign": {"x": 1}}]}, {"callsigns": [["VN1"]]},
+                 {"callsigns": [{"callsign": "VN1", "start": 5}]}, {"callsigns": {"VN1": 1}},
+                 {"callsigns": ["VN1"], "workers": True}, {"callsigns": ["VN1"], "workers": 0}):
+        assert client.post("/suggest_paths", json=body).status_code == 400
+    response = client.post("/suggest_paths", json={"callsigns": ["NOPE"]})
+    assert response.json()["results"] == [{"callsign": "NOPE", "error": "Flight not found"}]
+    print(f"✅ Reroute song song khớp tìm tuần tự ({len(tasks)} flights), đầu vào sai trả 400")
+
+def loopless_routes(airspace, start, goal):
+    """Độ dài của mọi đường không lặp từ start tới goal (duyệt vét cạn)"""
+    lengths = []
+
+    def extend(node, visited, flown):
+        if node == goal:
+            lengths.append(flown)
+            return
+        for to_wp, distance, _, _ in airspace.routes[node]:
+            if to_wp not in visited:
+                visited.add(to_wp)
+                extend(to_wp, visited, flown + distance)
+                visited.remove(to_wp)
+
+    extend(start, {start}, 0.0)
+    return sorted(lengths)
+
+def test_k_shortest_matches_brute_force():
+    """k_shortest_routes so với liệt kê vét cạn trên airspace nhỏ không có traffic"""
+    import random
+    from algorithms.k_shortest import k_shortest_routes
+    from synthetic_traffic import generate_airspace
+    airspace = generate_airspace(20, seed=3)
+    probe = Flight("PROBE", [], 450.0, 330, datetime(2025, 1, 19))
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(3)
+    for _ in range(20):
+        start, goal = rnd.sample(names, 2)
+        expected = loopless_routes(airspace, start, goal)[:5]
+        options = k_shortest_routes(airspace, probe, start, goal, 5)
+        assert len(options) == len(expected)
+        for option, length in zip(options, expected):
+            assert abs(option.distance_nm - length) < 1e-6
+            assert len(set(option.path)) == len(option.path)
+    print("✅ k_shortest_routes khớp liệt kê vét cạn (20 truy vấn)")
+
+def turn_by_bearings(airspace, a, b, c):
+    """Góc rẽ (độ) tại b khi bay a -> b -> c, tính trực tiếp từ geo.bearing"""
+    from math import degrees
+    from models.geo import bearing
+    wps = airspace.waypoints
+    first = degrees(bearing(wps[a].latitude, wps[a].longitude, wps[b].latitude, wps[b].longitude))
+    second = degrees(bearing(wps[b].latitude, wps[b].longitude, wps[c].latitude, wps[c].longitude))
+    angle = abs(second - first)
+    return min(angle, 360 - angle)
+
+def shortest_within_turn_limit(airspace, start, goal, max_turn):
+    """Dijkstra trên (waypoint trước, waypoint) theo airspace.routes, bỏ các góc rẽ > max_turn"""
+    import heapq
+    dist = {(None, start): 0.0}
+    heap = [(0.0, start, None)]
+    while heap:
+        d, node, prev = heapq.heappop(heap)
+        if node == goal:
+            return d
+        if d > dist[(prev, node)]:
+            continue
+        for to_wp, distance, _, _ in airspace.routes[node]:
+            if prev is not None and turn_by_bearings(airspace, prev, node, to_wp) > max_turn:
+                continue
+            if d + distance < dist.get((node, to_wp), float('inf')):
+                dist[(node, to_wp)] = d + distance
+                heapq.heappush(heap, (d + distance, to_wp, node))
+    return None
+
+def test_turn_limit_matches_reference():
+    """max_turn của các search so với Dijkstra có giới hạn góc rẽ, và TurnTable so với geo.bearing"""
+    import random
+    from algorithms.bidirectional import bidirectional_search
+    from algorithms.k_shortest import k_shortest_routes
+    from algorithms.pathfinding import a_star_search
+    from algorithms.segment_index import SegmentIndex
+    from synthetic_traffic import generate_airspace
+    airspace = generate_airspace(200, seed=4)
+    graph = airspace.compiled()
+    turns = airspace.turns(90)
+    for arriving in range(len(graph.targets)):
+        node = graph.targets[arriving]
+        for leaving in graph.edges(node):
+            expected = turn_by_bearings(airspace, graph.names[graph.sources[arriving]],
+                                        graph.names[node], graph.names[graph.targets[leaving]])
+            assert abs(turns.turn(arriving, leaving) - expected) < 1e-3
+            assert turns.turn_ok(arriving, leaving) == (expected <= 90) or abs(expected - 90) < 1e-9
+
+    probe = Flight("PROBE", [], 450.0, 330, datetime(2025, 1, 19))
+    no_traffic = SegmentIndex()
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(4)
+    longer = 0
+    for _ in range(40):
+        start, goal = rnd.sample(names, 2)
+        expected = shortest_within_turn_limit(airspace, start, goal, 90)
+        unlimited = shortest_within_turn_limit(airspace, start, goal, 180)
+        for search in (a_star_search, bidirectional_search):
+            path = search(airspace, start, goal, probe, [], segment_index=no_traffic, max_turn=90)
+            if expected is None:
+                assert path is None
+                continue
+            assert abs(route_length(airspace, path) - expected) < 1e-6
+            assert all(turn_by_bearings(airspace, *path[i:i + 3]) <= 90 + 1e-6
+                       for i in range(len(path) - 2))
+        options = k_shortest_routes(airspace, probe, start, goal, 3, segment_index=no_traffic,
+                                    max_turn=90)
+        assert all(option.max_turn_deg <= 90 + 1e-3 for option in options)
+        if expected is not None:
+            assert abs(options[0].distance_nm - expected) < 1e-6
+        if expected is None or expected > unlimited + 1e-6:
+            longer += 1
+    assert longer > 0  # Giới hạn 90 độ thực sự loại bỏ một số đường
+    print(f"✅ Giới hạn góc rẽ khớp Dijkstra tham chiếu (40 truy vấn, {longer} bị giới hạn)")
+
+def test_bidirectional_matches_a_star():
+    """bidirectional_search so với a_star_search, có traffic có giờ và không giờ; đếm số lần fallback"""
+    import random
+    from algorithms.bidirectional import bidirectional_search
+    from algorithms.pathfinding import SearchStats, a_star_search
+    from algorithms.segment_index import SegmentIndex
+    airspace, flights = synthetic_traffic(count=300, size=900, seed=2)
+    # Một số flight không có ETA: chặn chặng của chúng ở mọi thời điểm
+    untimed = [Flight(f"{f.callsign}U", f.route, f.speed, f.flight_level, None) for f in flights[:40]]
+    index = SegmentIndex(flights + untimed)
+
+    names = sorted(airspace.waypoints)
+    rnd = random.Random(5)
+    fallbacks = {}
+    for timed in (True, False):
+        stats = SearchStats()
+        for _ in range(40):
+            start, goal = rnd.sample(names, 2)
+            flight = rnd.choice(flights)
+            if not timed:
+                flight = Flight(flight.callsign, [], 0, flight.flight_level, None)
+            uni = a_star_search(airspace, start, goal, flight, None, segment_index=index)
+            bi = bidirectional_search(airspace, start, goal, flight, segment_index=index,
+                                      stats=stats)
+            assert (uni is None) == (bi is None)
+            if uni is not None:
+                assert abs(route_length(airspace, uni) - route_length(airspace, bi)) < 1e-6
+        fallbacks[timed] = stats.fallbacks
+    # Không có giờ thì chiều ngược kiểm tra traffic chính xác như chiều xuôi
+    assert fallbacks[False] <= 2
+    print(f"✅ bidirectional_search khớp a_star_search (80 truy vấn, fallback: "
+          f"{fallbacks[True]}/40 có giờ, {fallbacks[False]}/40 không giờ)")
+
+def test_flight_table_matches_list():
+    """FlightTable sau các lần thêm/xóa/sửa (có gom hàng) so với một list flight"""
+    import random
+    import models.flight_table as flight_table
+    from models.flight_table import FlightTable
+    airspace, flights = synthetic_traffic(count=120, seed=7)
+    # Trùng callsign: find() trả về flight đứng trước trong list
+    flights += [Flight(f.callsign, f.route[::-1], f.speed, f.flight_level + 10, f.entry_time,
+                       estimated_times=dict(f.estimated_times)) for f in flights[:20]]
+
+    def fields(flight):
+        return (flight.callsign, list(flight.route), flight.speed, flight.flight_level,
+                flight.entry_time, list(flight.position_times))
+
+    saved_rows = flight_table.COMPACT_ROWS
+    flight_table.COMPACT_ROWS = 8
+    try:
+        table = FlightTable()
+        expected = []  # (view, fields) theo thứ tự list
+        seen = []      # Mọi view từng tạo, kể cả đã xóa/sửa: vẫn phải đọc đúng
+        rnd = random.Random(7)
+        compactions = 0
+        for step in range(1500):
+            rows = table._rows
+            op = rnd.random()
+            if op < 0.4 or not expected:
+                flight = rnd.choice(flights)
+                if rnd.random() < 0.2:
+                    views = table.extend_plans([(flight.callsign, flight.route, flight.speed,
+                                                 flight.flight_level, flight.entry_time)], airspace)
+                    view = views[0]
+                else:
+                    view = table.append(flight)
+                expected.append((view, fields(view)))
+                seen.append((view, fields(view)))
+            elif op < 0.7:
+                view, _ = expected.pop(rnd.randrange(len(expected)))
+                table.remove(view)
+                assert view not in table
+            else:
+                idx = rnd.randrange(len(expected))
+                view = table.replace(expected[idx][0], rnd.choice(flights))
+                expected[idx] = (view, fields(view))
+                seen.append((view, fields(view)))
+            compactions += table._rows < rows
+            assert table._rows - len(table) < max(flight_table.COMPACT_ROWS, len(table))
+
+            assert len(table) == len(expected)
+            assert [view for view in table] == [view for view, _ in expected]
+            if step % 25 == 0:
+                assert [table[i] for i in range(len(table))] == [view for view, _ in expected]
+                for callsign in {f.callsign for f in flights}:
+                    first = next((view for view, data in expected if data[0] == callsign), None)
+                    assert table.find(callsign) is first
+                assert all(view in table for view, _ in expected)
+                assert all(fields(view) == data for view, data in seen)
+                copy = table.snapshot()
+                assert [fields(view) for view in copy] == [data for _, data in expected]
+                assert copy.records() == table.records()
+    finally:
+        flight_table.COMPACT_ROWS = saved_rows
+    assert compactions > 0
+    print(f"✅ FlightTable khớp list flight (1500 thao tác, {compactions} lần gom hàng, "
+          f"{len(seen)} view vẫn đúng)")
+
+def test_bulk_etas_match_flight():
+    """FlightTable.extend_plans so với Flight.calculate_estimated_times, kể cả các lần bay qua trước"""
+    from models.flight_table import FlightTable
+    from models.geo import haversine
+    airspace, flights = synthetic_traffic(count=500)
+
+    def distances(route):
+        wps = airspace.waypoints
+        return {(wp1, wp2): haversine(wps[wp1].latitude, wps[wp1].longitude,
+                                      wps[wp2].latitude, wps[wp2].longitude)
+                for wp1, wp2 in zip(route, route[1:]) if wp1 in wps and wp2 in wps}
+
+    # Thêm đường bay quay lại waypoint cũ và đường bay qua waypoint không có trong airspace
+    for flight, tail in ((flights[0], flights[0].route[-2::-1]), (flights[1], ["NOWHERE"])):
+        flight.route = flight.route + tail
+        flight.estimated_times = {}
+        flight.calculate_estimated_times(distances(flight.route))
+    views = FlightTable().extend_plans([(f.callsign, f.route, f.speed, f.flight_level, f.entry_time)
+                                        for f in flights], airspace)
+    for flight, view in zip(flights, views):
+        assert view.route == flight.route
+        assert view.estimated_times == flight.estimated_times
+        assert view.position_times == flight.position_times
+    assert flights[0].position_times[0] == flights[0].entry_time
+
+    # Xung đột ở lần bay qua đầu tiên của một đường bay đi rồi quay lại
+    route = flights[2].route
+    loop = Flight("LOOP", route + route[-2::-1], 450.0, 330, flights[2].entry_time)
+    shadow = Flight("SHADOW", route[:2], 450.0, 330, flights[2].entry_time)
+    for flight in (loop, shadow):
+        flight.calculate_estimated_times(distances(flight.route))
+    for mode in ("all_pairs", "sweep"):
+        found = detect_conflicts([loop, shadow], mode=mode)
+        assert any(c['type'] == 'overtake' and c['start_time'] == loop.entry_time for c in found)
+        assert sum(c['type'] == 'crossing' and c['time_diff_minutes'] == 0 for c in found) == 2
+        table = FlightTable([loop, shadow])
+        assert sorted(map(conflict_key, detect_conflicts(list(table), mode=mode))) == \
+            sorted(map(conflict_key, found))
+    print(f"✅ ETA hàng loạt khớp calculate_estimated_times ({len(views)} flights, mọi lần bay qua)")
+
+def test_positions_match_interpolation():
+    """flight_positions so với nội suy từng flight, và /positions với giờ có múi giờ"""
+    import warnings
+    import numpy as np
+    from algorithms.positions import flight_positions
+    from models.flight_table import FlightTable
+    airspace, flights = synthetic_traffic(count=3000)
+    table = FlightTable(flights)
+    checked = 0
+    for minutes in (10, 35, 60, 95):
+        t = datetime(2025, 1, 19) + timedelta(minutes=minutes)
+        found = flight_positions(table, airspace, t)
+        expected = {}
+        for idx, flight in enumerate(flights):
+            timed = [(eta, airspace.waypoints[wp]) for wp, eta in zip(flight.route, flight.position_times)
+                     if eta is not None and wp in airspace.waypoints]
+            if not timed or not timed[0][0] <= t <= timed[-1][0]:
+                continue
+            j = next((j for j, (eta, _) in enumerate(timed) if eta > t), len(timed) - 1)
+            i = max(j - 1, 0)
+            (t0, wp0), (t1, wp1) = timed[i], timed[j]
+            frac = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+            expected[idx] = (wp0.latitude + (wp1.latitude - wp0.latitude) * frac,
+                             wp0.longitude + (wp1.longitude - wp0.longitude) * frac)
+        assert sorted(found['flight'].tolist()) == sorted(expected)
+        for idx, lat, lon in zip(found['flight'].tolist(), found['lat'], found['lon']):
+            assert np.allclose((lat, lon), expected[idx])
+        checked += len(expected)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from fastapi.testclient import TestClient
+        import api
+    with TestClient(api.app) as client:
+        loaded = client.get("/flights").json()
+        etas = sorted(t for flight in loaded for t in flight["timeline"].values())
+        utc = datetime.fromisoformat(etas[len(etas) // 2])
+        naive = client.get("/positions", params={"t": utc.isoformat()}).json()
+        local = client.get("/positions", params={"t": (utc + timedelta(hours=7)).isoformat() + "+07:00"})
+        assert naive and local.json() == naive
+    print(f"✅ flight_positions khớp nội suy từng flight ({checked} vị trí), /positions đổi giờ về UTC")
+
+def test_waypoint_ids_equality_and_hash():
+    """Waypoint: tên được intern, id theo thứ tự thêm, so sánh theo id và tên, hash theo tên"""
+    import sys
+    from synthetic_traffic import generate_airspace
+    airspace = generate_airspace(100, seed=9)
+    graph = airspace.compiled()
+    for name, wp in airspace.waypoints.items():
+        assert airspace.waypoint(wp.id) is wp and graph.ids[name] == wp.id
+        assert wp.name is sys.intern(name)
+    assert sorted(wp.id for wp in airspace.waypoints.values()) == list(range(len(airspace.waypoints)))
+
+    # Hash không đổi khi được gán id: set tạo trước khi thêm vẫn tìm thấy
+    fresh = Waypoint("".join(["NEW", "WP"]), 10.0, 106.0, WaypointType.VOR)
+    assert fresh.name is sys.intern("NEWWP") and fresh.id == -1
+    before = {fresh}
+    airspace.add_waypoint(fresh)
+    assert fresh in before and fresh.id == len(airspace.waypoints) - 1
+    assert not hasattr(fresh, '__dict__')
+
+    # Thay waypoint cùng tên giữ id cũ; bản chưa thêm (id -1) thì khác
+    twin = Waypoint("NEWWP", 10.5, 106.5, WaypointType.FIX)
+    assert twin != fresh and hash(twin) == hash(fresh)
+    airspace.add_waypoint(twin)
+    assert twin.id == fresh.id and twin == fresh and airspace.waypoint(twin.id) is twin
+    assert airspace.compiled().ids["NEWWP"] == twin.id
+    assert len({twin, fresh}) == 1 and twin != "NEWWP"
+    other = next(wp for wp in airspace.waypoints.values() if wp is not twin)
+    assert other != twin and {twin: 1}.get(other) is None
+
+    # Thêm lại vào cùng airspace thì được, sang airspace khác thì không
+    airspace.add_waypoint(twin)
+    try:
+        Airspace().add_waypoint(twin)
+        assert False, "waypoint đã thuộc airspace khác"
+    except ValueError:
+        pass
+
+    twin.add_adjacent(other.name, 12.5, "A1")
+    assert twin.adjacent == {other.name: 12.5} and twin.connected_by == {"A1"}
+    print("✅ Waypoint intern tên, id theo airspace, eq/hash nhất quán")
+
+def test_nearest_within_match_linear_scan():
+    """Airspace.nearest/within so với duyệt tuyến tính, cả gần cực; bán kính không hữu hạn trả 400"""
+    import random
+    import warnings
+    from models.geo import haversine
+    rnd = random.Random(7)
+    airspace = Airspace()
+    for k in range(3000):
+        lat = rnd.uniform(-90, 90) if k % 3 else rnd.uniform(80, 90) * rnd.choice((-1, 1))
+        airspace.add_waypoint(Waypoint(f"W{k}", lat, rnd.uniform(-180, 180), WaypointType.FIX))
+    waypoints = list(airspace.waypoints.values())
+    for _ in range(100):
+        lat, lon = rnd.uniform(-90, 90), rnd.uniform(-180, 180)
+        if rnd.random() < 0.3:
+            lat = rnd.choice((-89.9, 89.9))
+        radius = rnd.choice((5, 30, 120, 600, 3000))
+        scan = sorted((haversine(lat, lon, wp.latitude, wp.longitude), wp.name) for wp in waypoints)
+        inside = {name for distance, name in scan if distance <= radius}
+        assert {wp.name for wp, _ in airspace.within(lat, lon, radius)} == inside
+        nearest = airspace.nearest(lat, lon, 10)
+        assert [distance for _, distance in nearest] == [distance for distance, _ in scan[:10]]
+    assert len(airspace.within(0.0, 0.0, 1e12)) == len(waypoints)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from fastapi.testclient import TestClient
+        import api
+    with TestClient(api.app) as client:
+        for radius in ("inf", "nan", "-1"):
+            response = client.get("/waypoints/within", params={"lat": 0, "lon": 0, "radius_nm": radius})
+            assert response.status_code == 400
+        assert client.get("/waypoints/within", params={"lat": 0, "lon": 0, "radius_nm": 1e12}).json()
+    print("✅ nearest/within khớp duyệt tuyến tính (100 truy vấn), bán kính sai trả 400")
+
 if __name__ == "__main__":
-    test_conflicts() 
\ No newline at end of file
+    test_conflicts()
+    test_sweep_matches_all_pairs()
+    test_store_matches_detect_conflicts()
+    test_near_pairs_match_linear_scan()
+    test_segment_hits_match_leg_loops()
+    test_cpa_matches_sampled_approach()
+    test_parallel_and_sweep_match_all_pairs()
+    test_conflict_cache_survives_cancellation()
+    test_lateral_and_stream_match_reference()
+    test_interval_queries_match_linear_filter()
+    test_reservations_match_segment_scan()
+    test_joint_level_search_matches_per_level()
+    test_landmark_bounds_stay_below_distances()
+    test_route_cache_invalidation_matches_recompute()
+    test_parallel_reroutes_match_serial()
+    test_k_shortest_matches_brute_force()
+    test_turn_limit_matches_reference()
+    test_bidirectional_matches_a_star()
+    test_flight_table_matches_list()
+    test_bulk_etas_match_flight()
+    test_positions_match_interpolation()
+    test_waypoint_ids_equality_and_hash()
+    test_nearest_within_match_linear_scan()